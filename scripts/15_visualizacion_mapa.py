@@ -1,9 +1,11 @@
+import time
+import numpy as np
 import pandas as pd
 import folium
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
 import branca.colormap as cm
+from capas_mapa import CapaPuntos, puntos_geojson
+from mapa_raster import renderizar_heatmap
 
 # --- CONFIGURACIÓN ---
 ARCHIVO_GEO_READY = "../datos/ranking_fase6_geo_ready.csv"
@@ -46,28 +48,20 @@ def visualizar_resultados():
                'darkpurple', 'white', 'pink', 'lightblue', 'lightgreen', 
                'gray', 'black', 'lightgray']
 
-    # A. PINTAR LAS "MANCHAS" (SECCIONES INDIVIDUALES) - coloreadas por Score
-    for idx, (_, row) in enumerate(df_pintar.iterrows()):
-        # Asignar color basado en el índice secuencial
-        color = colores[idx % len(colores)]
-        
-        # Tooltip con información clave
-        texto = f"""
-        <b>Sección:</b> {row['Seccion']}<br>
-        <b>Renta:</b> {row['Renta_Hogar']:,.0f}€<br>
-        <b>Presión Cuidados:</b> {row['Presion_Cuidados']:.2f}<br>
-        <b>Score:</b> {row['Score_Global']:.3f}
-        """
-        
-        folium.CircleMarker(
-            location=[row['LATITUD'], row['LONGITUD']],
-            radius=4,
-            color=color,
-            fill=True,
-            fill_color=color,
-            fill_opacity=0.6,
-            popup=folium.Popup(texto, max_width=300)
-        ).add_to(mapa)
+    # A. PINTAR LAS "MANCHAS" (SECCIONES INDIVIDUALES)
+    # Una sola FeatureCollection por columnas + circleMarker en canvas; el popup
+    # se monta en el navegador con las propiedades (antes: CircleMarker + Popup por fila)
+    t0 = time.perf_counter()
+    campos = ['Seccion', 'Renta_Hogar', 'Presion_Cuidados', 'Score_Global']
+    datos = puntos_geojson(df_pintar, campos, color=np.arange(len(df_pintar)) % len(colores))
+    CapaPuntos(
+        datos, 'Secciones top 10%', campos,
+        alias=['Sección:', 'Renta:', 'Presión Cuidados:', 'Score:'],
+        decimales=[None, 0, 2, 3], sufijos=['', '€', '', ''],
+        colores=colores, radio=4
+    ).add_to(mapa)
+    print(f"    ✓ Capa de puntos: {len(df_pintar):,} secciones en {time.perf_counter() - t0:.2f} s "
+          f"(carga en el navegador: ver consola)")
 
     # B. PINTAR LOS "CENTROIDES" (MARCADORES GRANDES)
     # Iteramos sobre el resumen de los top clusters
@@ -96,44 +90,26 @@ def visualizar_resultados():
         ).add_to(mapa).add_child(folium.Popup(texto_cluster, max_width=300))
 
     # Guardar HTML
+    t0 = time.perf_counter()
     mapa.save(OUTPUT_HTML)
+    print(f"    ✓ HTML escrito en {time.perf_counter() - t0:.2f} s "
+          f"({os.path.getsize(OUTPUT_HTML) / (1024 * 1024):.1f} MB)")
     print(f"✅ MAPA INTERACTIVO GENERADO: {OUTPUT_HTML}")
     print("   (Ábrelo en tu navegador web)")
 
-    # 3. MAPA ESTÁTICO (MATPLOTLIB) - PARA EL POWERPOINT
+    # 3. MAPA ESTÁTICO (RASTER) - PARA EL POWERPOINT
+    # Centroides agregados por celda (máximo Score) y PNG escrito directamente
     print(">>> Generando gráfico estático...")
-    plt.figure(figsize=(10, 8))
-    
-    # Scatter plot de lat/lon
-    # Coloreamos por Score_Global (mapa de calor)
-    sns.scatterplot(
-        data=df_pintar, 
-        x='LONGITUD', 
-        y='LATITUD', 
-        hue='Score_Global', 
-        palette='YlOrRd', 
-        s=10, 
-        legend=False
+    renderizar_heatmap(
+        OUTPUT_PNG, df_pintar['Score_Global'],
+        lon=df_pintar['LONGITUD'], lat=df_pintar['LATITUD'],
+        agregacion='max', celda_px=4,
+        titulo=f'Top {top_n_clusters} Clusters de Demanda (L-SOMA)',
+        # Anotar los centros
+        etiquetas=[(c['Lon_Centro'], c['Lat_Centro'], int(c['Cluster_ID']))
+                   for _, c in df_resumen.head(10).iterrows()],
+        leyenda='Score_Global'
     )
-    
-    plt.title(f'Top {top_n_clusters} Clusters de Demanda (L-SOMA)', fontsize=14)
-    plt.xlabel('Longitud')
-    plt.ylabel('Latitud')
-    plt.grid(True, linestyle='--', alpha=0.5)
-    
-    # Anotar los centros
-    for _, cluster in df_resumen.head(10).iterrows():
-        plt.text(
-            cluster['Lon_Centro'], 
-            cluster['Lat_Centro'], 
-            str(int(cluster['Cluster_ID'])), 
-            fontsize=12, 
-            weight='bold',
-            color='black',
-            bbox=dict(facecolor='white', alpha=0.7, edgecolor='none')
-        )
-
-    plt.savefig(OUTPUT_PNG, dpi=300)
     print(f"✅ MAPA ESTÁTICO GENERADO: {OUTPUT_PNG}")
 
 if __name__ == "__main__":
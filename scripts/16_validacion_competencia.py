@@ -1,11 +1,12 @@
 import pandas as pd
-import requests
-import time
 import os
+from cache_respuestas import CacheRespuestas
+from extraccion_osm import indice_osm
 
 # --- CONFIGURACIÓN ---
 ARCHIVO_CLUSTERS = "../datos/ranking_fase7_clusters.csv"
 OUTPUT_COMPETENCIA = "../datos/ranking_fase8_competencia.csv"
+RADIO_COMPETENCIA_M = 2000
 
 def auditar_competencia():
     print("--- FASE 8: AUDITORÍA DE COMPETENCIA (OPENSTREETMAP) ---")
@@ -16,68 +17,25 @@ def auditar_competencia():
         return
     df_clusters = pd.read_csv(ARCHIVO_CLUSTERS, sep=';')
     
-    # Analizaremos los Top 50 Clusters para no saturar la API
-    df_top = df_clusters.head(50).copy()
-    print(f">>> Analizando competencia en los Top {len(df_top)} Clusters...")
+    # Una sola extracción OSM (PBF local, JSON o 1 consulta bbox) + KD-tree para TODOS los clusters
+    df_top = df_clusters.copy()
+    print(f">>> Analizando competencia en {len(df_top)} Clusters (extracción OSM masiva)...")
+    cache = CacheRespuestas()
 
-    # 2. FUNCIÓN DE CONSULTA A OVERPASS API (OSM)
-    def contar_residencias_cercanas(lat, lon, radio_m=2000):
-        # Query en lenguaje Overpass QL
-        # Buscamos nodos o formas con etiqueta amenity=nursing_home o social_facility=assisted_living
-        overpass_url = "http://overpass-api.de/api/interpreter"
-        overpass_query = f"""
-        [out:json];
-        (
-          node["amenity"="nursing_home"](around:{radio_m},{lat},{lon});
-          way["amenity"="nursing_home"](around:{radio_m},{lat},{lon});
-          rel["amenity"="nursing_home"](around:{radio_m},{lat},{lon});
-          node["social_facility"="assisted_living"](around:{radio_m},{lat},{lon});
-        );
-        out count;
-        """
-        try:
-            response = requests.get(overpass_url, params={'data': overpass_query}, timeout=20)
-            if response.status_code == 200:
-                data = response.json()
-                # El conteo total está en la sección de estadísticas
-                if 'elements' in data and len(data['elements']) > 0:
-                    # A veces 'out count' devuelve un elemento con tags de conteo
-                    return int(data['elements'][0]['tags']['total'])
-                return 0
-            else:
-                return -1 # Error
-        except Exception as e:
-            return -1
-
-    # 3. EJECUCIÓN DEL BARRIDO
-    competencia_detectada = []
-    
-    print("   Consultando API (esto tardará unos segundos por respeto al servidor)...")
-    
-    for idx, row in df_top.iterrows():
-        cluster_id = row['Cluster_ID']
-        lat = row['Lat_Centro']
-        lon = row['Lon_Centro']
-        
-        # Buscamos en radio de 2km desde el centro del cluster
-        num_competidores = contar_residencias_cercanas(lat, lon, radio_m=2000)
-        
-        # Guardar resultado
-        competencia_detectada.append(num_competidores)
-        
-        # Feedback visual
-        barras = "█" * num_competidores if num_competidores > 0 else "."
-        print(f"   Cluster {int(cluster_id)} ({str(row['Toponimos'])[:15]}...): {num_competidores} residencias {barras}")
-        
-        # Pausa para no ser bloqueados (Rate Limiting)
-        time.sleep(1.5)
-
-    df_top['Competencia_OSM'] = competencia_detectada
-    
-    # 4. CÁLCULO DE SATURACIÓN
-    # Ratio: Plazas Estimadas vs Competencia Real
-    # Asumimos que cada residencia competidora tiene ~80 plazas promedio
-    df_top['Oferta_Estimada'] = df_top['Competencia_OSM'] * 80
+    # 2. CONTEOS Y OFERTA EN MEMORIA
+    indice = indice_osm(cache=cache)
+    df_top['Competencia_OSM'] = indice.contar(df_top['Lat_Centro'].values,
+                                              df_top['Lon_Centro'].values,
+                                              radio_m=RADIO_COMPETENCIA_M)
+    df_top['Oferta_Estimada'] = indice.oferta_camas(df_top['Lat_Centro'].values,
+                                                    df_top['Lon_Centro'].values,
+                                                    radio_m=RADIO_COMPETENCIA_M)
+    print(f"   ✓ {len(indice.almacen):,} residencias OSM indexadas, "
+          f"{int((df_top['Competencia_OSM'] > 0).sum())} clusters con competencia")
+    cache.imprimir_resumen()
+    
+    # 3. CÁLCULO DE SATURACIÓN
+    # Ratio: Plazas Estimadas (registro de plazas o constante de config.yaml) vs Demanda
     
     # Capacidad Teórica (Demanda) = Secciones * 90 targets * 10% (captura agresiva para ver techo)
     df_top['Demanda_Total_Cluster'] = df_top['Num_Secciones'] * 90
@@ -96,7 +54,7 @@ def auditar_competencia():
     df_final.to_csv(OUTPUT_COMPETENCIA, sep=';', index=False)
     print(f"✅ AUDITORÍA COMPLETADA: {OUTPUT_COMPETENCIA}")
     
-    # 5. RESULTADOS
+    # 4. RESULTADOS
     print("\n--- TOP 10 OCÉANOS AZULES (ALTA DEMANDA / BAJA COMPETENCIA) ---")
     cols = ['Toponimos', 'Potencia_Total', 'Competencia_OSM', 'Saturacion', 'Score_Oceano_Azul']
     print(df_final[cols].head(10).to_string(index=False))
@@ -1,8 +1,11 @@
 import pandas as pd
 import geopandas as gpd
 import folium
-import matplotlib.pyplot as plt
 import os
+from cache_secciones import GEOPARQUET, cargar_secciones, cusec_a_int
+from topologia import codificar_topojson, bytes_json
+from envolventes_clusters import envolventes_clusters
+from mapa_raster import renderizar_heatmap
 
 # --- CONFIGURACIÓN ---
 ARCHIVO_PUNTOS_TAGGED = "../datos/ranking_fase8_puntos_con_cluster.csv"
@@ -10,6 +13,12 @@ ARCHIVO_SHP = "../datos/seccionado_2024/SECC_CE_20240101.shp"
 OUTPUT_HTML = "../mapa_VIABLES_premium.html"
 OUTPUT_PNG = "../mapa_VIABLES_estatico.png"
 
+# HTML con TopoJSON (arcos compartidos + cuantización) en lugar de GeoJSON
+USAR_TOPOJSON = True
+
+# Contorno de cada cluster (un polígono disuelto por cluster, requiere GeoParquet)
+PINTAR_ENVOLVENTES = True
+
 def generar_mapa_premium():
     print("--- SCRIPT 3: EL MAPA DEL TESORO (SOLO VIABLES) ---")
     
@@ -20,15 +29,21 @@ def generar_mapa_premium():
     df_puntos = df_puntos[df_puntos['Es_Viable'] == True].copy()
     print(f">>> Pintando solo las {len(df_puntos)} secciones de alta rentabilidad.")
 
-    # Carga Shapefile (Misma lógica)
+    # Carga Secciones (GeoParquet en 4326 si existe; si no, Shapefile)
     try:
-        gdf = gpd.read_file(ARCHIVO_SHP)
-        if 'CUSEC' not in gdf.columns:
-             gdf['CUSEC'] = gdf['CPRO'] + gdf['CMUN'] + gdf['CDIS'] + gdf['CSEC']
+        if os.path.exists(GEOPARQUET):
+            # Solo el bbox de las secciones viables, geometría completa
+            bbox = (df_puntos['LONGITUD'].min() - 0.05, df_puntos['LATITUD'].min() - 0.05,
+                    df_puntos['LONGITUD'].max() + 0.05, df_puntos['LATITUD'].max() + 0.05)
+            gdf = cargar_secciones(columnas=[], bbox=bbox, nivel='geometry')
+        else:
+            gdf = gpd.read_file(ARCHIVO_SHP)
+            if 'CUSEC' not in gdf.columns:
+                 gdf['CUSEC'] = gdf['CPRO'] + gdf['CMUN'] + gdf['CDIS'] + gdf['CSEC']
+            gdf['CUSEC'] = cusec_a_int(gdf['CUSEC'])
         
-        # Aseguramos que ambas columnas CUSEC sean del mismo tipo (string)
-        gdf['CUSEC'] = gdf['CUSEC'].astype(str)
-        df_puntos['CUSEC_LIMPIO'] = df_puntos['CUSEC_LIMPIO'].astype(str)
+        # Aseguramos que ambas columnas CUSEC sean del mismo tipo (entero)
+        df_puntos['CUSEC_LIMPIO'] = cusec_a_int(df_puntos['CUSEC_LIMPIO'])
         
         gdf_merged = gdf.merge(df_puntos, left_on='CUSEC', right_on='CUSEC_LIMPIO')
         
@@ -38,11 +53,11 @@ def generar_mapa_premium():
 
     # PNG ESTÁTICO (Distinto color por Cluster ID para distinguir vecinos)
     print(">>> Generando PNG...")
-    fig, ax = plt.subplots(figsize=(15, 12))
-    gdf_merged.plot(ax=ax, column='Cluster_ID', cmap='tab20', legend=False)
-    plt.title("Yacimientos de Demanda Certificada (>85 plazas)")
-    plt.axis('off')
-    plt.savefig(OUTPUT_PNG, dpi=300, bbox_inches='tight')
+    renderizar_heatmap(
+        OUTPUT_PNG, gdf_merged['Cluster_ID'] % 20, geoms=gdf_merged.to_crs(epsg=4326).geometry.values,
+        cmap='tab20', vmin=0, vmax=19, leyenda=None,
+        titulo="Yacimientos de Demanda Certificada (>85 plazas)"
+    )
     print(f"✅ PNG Premium guardado: {OUTPUT_PNG}")
 
     # HTML INTERACTIVO
@@ -62,15 +77,40 @@ def generar_mapa_premium():
             'fillOpacity': 0.7
         }
 
-    folium.GeoJson(
-        gdf_web,
-        style_function=style_function,
-        tooltip=folium.GeoJsonTooltip(
-            fields=['Seccion', 'Renta_Hogar', 'Capacidad_Teorica_Camas'],
-            aliases=['Ubicación:', 'Renta (€):', 'Capacidad (Camas):']
-        )
-    ).add_to(m)
+    campos = ['Seccion', 'Renta_Hogar', 'Capacidad_Teorica_Camas']
+    tooltip = folium.GeoJsonTooltip(
+        fields=campos,
+        aliases=['Ubicación:', 'Renta (€):', 'Capacidad (Camas):']
+    )
+
+    if USAR_TOPOJSON:
+        # Solo lo que usan tooltip y estilo
+        gdf_capa = gdf_web[campos + ['Cluster_ID', 'geometry']]
+        topo = codificar_topojson(gdf_capa, campos + ['Cluster_ID'])
+        geojson_kb, topo_kb = bytes_json(gdf_capa.__geo_interface__) / 1024, bytes_json(topo) / 1024
+        print(f"    Carga útil: GeoJSON {geojson_kb:,.0f} KB -> TopoJSON {topo_kb:,.0f} KB "
+              f"({geojson_kb / topo_kb:.1f}x)")
+        folium.TopoJson(topo, 'objects.capa', style_function=style_function, tooltip=tooltip).add_to(m)
+    else:
+        folium.GeoJson(
+            gdf_web,
+            style_function=style_function,
+            tooltip=tooltip
+        ).add_to(m)
     
+    if PINTAR_ENVOLVENTES and os.path.exists(GEOPARQUET):
+        envolventes = envolventes_clusters(df_puntos['CUSEC_LIMPIO'], df_puntos['Cluster_ID'])
+        folium.GeoJson(
+            envolventes[['Cluster_ID', 'Num_Secciones', 'Area_km2', 'geometry']],
+            name='Contorno de clusters',
+            style_function=lambda f: {'fillOpacity': 0, 'color': 'black', 'weight': 2},
+            tooltip=folium.GeoJsonTooltip(
+                fields=['Cluster_ID', 'Num_Secciones', 'Area_km2'],
+                aliases=['Cluster:', 'Secciones:', 'Área (km²):'], localize=True
+            )
+        ).add_to(m)
+        folium.LayerControl().add_to(m)
+
     m.save(OUTPUT_HTML)
     print(f"✅ HTML Premium guardado: {OUTPUT_HTML}")
 
@@ -3,17 +3,24 @@ import numpy as np
 import geopandas as gpd
 from sklearn.cluster import DBSCAN
 import os
+from cache_secciones import GEOPARQUET, cargar_centroides, cusec_a_int
+from escenarios_share import curva_shares, evaluar_shares, share_para_objetivo
+from informe_excel import escribir_informe
 
 # --- CONFIGURACIÓN ---
 ARCHIVO_INPUT_GEO = "../datos/ranking_fase6_geo_ready.csv"
 ARCHIVO_MATRIZ_P = "../datos/matriz_P_nacional_filtrada.parquet"
 ARCHIVO_SHAPEFILE = "../datos/seccionado_2024/SECC_CE_20240101.shp" # Opcional para recuperar geo
 OUTPUT_EXCEL = "../datos/INFORME_FINAL_MASTER.xlsx"
+OUTPUT_DATA_RAW = "../datos/INFORME_FINAL_MASTER_data_raw.parquet"  # Data_Raw completo
+FILAS_DATA_RAW = None  # None = todas en el Excel; p.ej. 5000 = solo vista previa
 
 # PARÁMETROS DE NEGOCIO
 COLS_TARGET = ['M_80-84', 'M_85-89', 'M_90-94', 'M_95-99', 'M_100 y más']
 MARKET_SHARES = [0.015, 0.02, 0.03, 0.05] # 1.5% (Conservador) a 5% (Agresivo)
 CAMAS_BREAK_EVEN = 85
+# Curva continua Residencias vs Share (rejilla + puntos de corte exactos)
+SHARE_MIN, SHARE_MAX, PASO_SHARE = 0.005, 0.10, 0.0005
 RADIO_CLUSTER = 1.5      # km
 MIN_SECCIONES = 3
 
@@ -61,21 +68,27 @@ def generar_informe_maestro():
     sin_coords = df_merged[df_merged['LATITUD'].isna()]
     n_sin = len(sin_coords)
     
-    if n_sin > 0 and os.path.exists(ARCHIVO_SHAPEFILE):
+    if n_sin > 0 and (os.path.exists(GEOPARQUET) or os.path.exists(ARCHIVO_SHAPEFILE)):
         print(f"   ⚠️ Detectadas {n_sin} secciones sin coordenadas. Intentando recuperar con Shapefile...")
         try:
-            gdf = gpd.read_file(ARCHIVO_SHAPEFILE)
-            # Normalizar CUSEC
-            if 'CUSEC' not in gdf.columns: gdf['CUSEC'] = gdf['CPRO'] + gdf['CMUN'] + gdf['CDIS'] + gdf['CSEC']
-            
-            # Calcular centroides
-            gdf['cent_lat'] = gdf.to_crs(epsg=4326).geometry.centroid.y
-            gdf['cent_lon'] = gdf.to_crs(epsg=4326).geometry.centroid.x
+            if os.path.exists(GEOPARQUET):
+                # Centroides precalculados (sin leer geometrías)
+                gdf = cargar_centroides()
+            else:
+                gdf = gpd.read_file(ARCHIVO_SHAPEFILE)
+                # Normalizar CUSEC
+                if 'CUSEC' not in gdf.columns: gdf['CUSEC'] = gdf['CPRO'] + gdf['CMUN'] + gdf['CDIS'] + gdf['CSEC']
+                gdf['CUSEC'] = cusec_a_int(gdf['CUSEC'])
+                
+                # Calcular centroides (una sola reproyección)
+                centroides = gdf.geometry.centroid.to_crs(epsg=4326)
+                gdf['cent_lat'] = centroides.y
+                gdf['cent_lon'] = centroides.x
             
             # Cruzar para rellenar
             # Asumimos que df_merged tiene columna 'CUSEC' limpia (del paso 13)
             # Si no, la creamos rápido
-            df_merged['CUSEC_JOIN'] = df_merged['Seccion'].astype(str).str.split(' ').str[0].str.strip()
+            df_merged['CUSEC_JOIN'] = cusec_a_int(df_merged['Seccion'])
             
             # Merge update
             merged_recup = df_merged.merge(gdf[['CUSEC', 'cent_lat', 'cent_lon']], 
@@ -116,35 +129,39 @@ def generar_informe_maestro():
         'Score_Global': 'mean'
     })
     
-    escenarios = []
-    
+    # Camas por cluster en cada escenario (para el detalle)
     for share in MARKET_SHARES:
-        col_name = f'Camas_Share_{share*100:.1f}%'
-        agg[col_name] = agg['Poblacion_Target_Real'] * share
-        
-        # Filtro de Viabilidad
-        viables = agg[agg[col_name] >= CAMAS_BREAK_EVEN]
-        
-        total_camas = viables[col_name].sum()
-        num_residencias = int(total_camas / 100)
-        
-        escenarios.append({
-            'Escenario': f"Share {share*100:.1f}%",
-            'Clusters_Viables': len(viables),
-            'Residencias_Potenciales': num_residencias,
-            'Gap_Objetivo_1000': 1000 - num_residencias
-        })
+        agg[f'Camas_Share_{share*100:.1f}%'] = agg['Poblacion_Target_Real'] * share
+
+    # Viabilidad = target_sum * share >= 85: todo sale de las sumas ordenadas
+    targets = agg['Poblacion_Target_Real'].to_numpy()
+    df_escenarios = evaluar_shares(targets, MARKET_SHARES, camas_minimas=CAMAS_BREAK_EVEN)
+    df_escenarios.insert(0, 'Escenario', [f"Share {share*100:.1f}%" for share in MARKET_SHARES])
+    df_escenarios = df_escenarios[['Escenario', 'Clusters_Viables', 'Residencias_Potenciales', 'Gap_Objetivo_1000']]
 
-    df_escenarios = pd.DataFrame(escenarios)
+    df_curva = curva_shares(targets, SHARE_MIN, SHARE_MAX, PASO_SHARE, camas_minimas=CAMAS_BREAK_EVEN)
+    share_1000 = share_para_objetivo(targets, camas_minimas=CAMAS_BREAK_EVEN)
+    print(f"   Curva: {len(df_curva)} puntos entre {SHARE_MIN:.1%} y {SHARE_MAX:.1%} "
+          f"({int(df_curva['Punto_Corte'].sum())} puntos de corte)")
+    print(f"   Share mínimo para 1000 residencias: "
+          f"{'no alcanzable' if np.isnan(share_1000) else f'{share_1000:.3%}'}")
 
     # 6. EXPORTACIÓN
     print(f"\n[RESULTADOS FINALES AUDITADOS]")
     print(df_escenarios.to_string(index=False))
     
-    with pd.ExcelWriter(OUTPUT_EXCEL) as writer:
-        df_escenarios.to_excel(writer, sheet_name='Resumen_Ejecutivo')
-        agg.to_excel(writer, sheet_name='Detalle_Clusters')
-        df_premium.to_excel(writer, sheet_name='Data_Raw')
+    # Streaming (memoria constante) + Parquet con el Data_Raw completo
+    escribir_informe(
+        OUTPUT_EXCEL,
+        {
+            'Resumen_Ejecutivo': df_escenarios,
+            'Detalle_Clusters': agg,
+            'Curva_Share': df_curva,
+            'Data_Raw': df_premium.reset_index(drop=True),
+        },
+        max_filas={'Data_Raw': FILAS_DATA_RAW},
+        sidecars={'Data_Raw': OUTPUT_DATA_RAW}
+    )
         
     print(f"\n✅ INFORME MAESTRO GUARDADO: {OUTPUT_EXCEL}")
 
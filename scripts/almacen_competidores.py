@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+ALMACEN_COMPETIDORES.PY - Almacén Local de Competidores + Saturación Offline
+================================================================================
+El Indice_Saturacion se calculaba una vez por cluster y solo con el radio con
+el que se hizo la consulta. Cambiar search_radius_meters o
+beds_per_competitor_estimate en config.yaml obligaba a volver a llamar a la API.
+
+Aquí los competidores descubiertos (Places, Overpass, ...) se guardan en un
+Parquet deduplicado por place id y se indexan con un KD-tree. Conteos,
+distancia al rival más cercano y saturación para CUALQUIER conjunto de puntos
+y CUALQUIER radio salen offline y vectorizados, incluso para las 32k secciones.
+
+Uso:  python almacen_competidores.py
+      (importa la caché de respuestas y calcula la saturación de todas las
+       secciones y de los clusters de expansión con los parámetros actuales)
+================================================================================
+"""
+
+import os
+import re
+import json
+import sqlite3
+import numpy as np
+import pandas as pd
+import yaml
+from scipy.spatial import cKDTree
+from geodesia import coords_a_xyz, cuerda_a_arco_m
+from registro_residencias import camas_competidores
+
+# Cargar Configuración Centralizada
+with open("../config.yaml", "r") as f:
+    config = yaml.safe_load(f)
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+ARCHIVO_ALMACEN = "../datos/competidores.parquet"
+ARCHIVO_INPUT_GEO = "../datos/ranking_fase6_geo_ready.csv"
+ARCHIVO_MATRIZ_P = "../datos/matriz_P_nacional_filtrada.parquet"
+ARCHIVO_CLUSTERS = "../datos/expansion_clusters_final.csv"
+OUTPUT_SECCIONES = "../datos/saturacion_secciones.csv"
+OUTPUT_CLUSTERS = "../datos/saturacion_clusters_offline.csv"
+
+COLS_TARGET = ['M_80-84', 'M_85-89', 'M_90-94', 'M_95-99', 'M_100 y más']
+RADIO_BUSQUEDA_METROS = config['competition']['search_radius_meters']
+CAMAS_POR_COMPETIDOR = config['competition']['beds_per_competitor_estimate']
+UMBRAL_BLUE_OCEAN = config['competition']['saturation_thresholds']['blue_ocean']
+UMBRAL_BATALLA = config['competition']['saturation_thresholds']['battlefield']
+MARKET_SHARE = config['business']['market_share_target']
+RUTA_CACHE = config['competition']['cache']['path']
+
+COLUMNAS = ['place_id', 'Nombre', 'LATITUD', 'LONGITUD', 'Tipos', 'Fuente']
+
+# Filtro de nombres/tipos único para todos los proveedores (motor_competencia.py)
+BLACKLIST = ["farmacia", "ortopedia", "gimnasio", "club", "asociación", "parking", "ayuntamiento", "pabellón"]
+TIPOS_VALIDOS = ["nursing_home", "assisted_living_complex", "health"]
+NOMBRES_VALIDOS = ["residencia", "geriatri", "mayores", "vivienda", "tercera edad"]
+PREFIJO_OSM = "osm:"        # place_id de los elementos OSM (extraccion_osm.py)
+
+# ==============================================================================
+# ALMACÉN PERSISTENTE
+# ==============================================================================
+
+def clasificar_lugares(nombres, tipos):
+    """
+    Filtro vectorizado de competidores sobre un lote de lugares.
+    nombres: serie de nombres; tipos: serie de tipos unidos por ','.
+    Retorna array con 'DESCARTADO' (blacklist), 'ACEPTADO' o 'IGNORADO'.
+    """
+    nombres = pd.Series(nombres, dtype=object).fillna("").str.lower()
+    tipos = pd.Series(tipos, dtype=object).fillna("")
+    vetado = nombres.str.contains("|".join(map(re.escape, BLACKLIST)), regex=True)
+    por_tipo = tipos.str.contains(r"(?:^|,)(?:" + "|".join(map(re.escape, TIPOS_VALIDOS)) + r")(?:,|$)",
+                                  regex=True)
+    por_nombre = nombres.str.contains("|".join(map(re.escape, NOMBRES_VALIDOS)), regex=True)
+    return np.select([vetado.values, (por_tipo | por_nombre).values],
+                     ["DESCARTADO", "ACEPTADO"], default="IGNORADO")
+
+
+def tabla_lugares(lugares):
+    """Lote de lugares con formato Places -> DataFrame (una columna por campo) con su Estado."""
+    lugares = [l for l in lugares if l.get("location", {}).get("latitude") is not None]
+    nombres = [l.get("displayName", {}).get("text", "Sin nombre") for l in lugares]
+    lat = [l["location"]["latitude"] for l in lugares]
+    lon = [l["location"]["longitude"] for l in lugares]
+    tabla = pd.DataFrame({
+        'place_id': [l.get("id") or f"{n}@{a:.5f},{o:.5f}" for l, n, a, o in zip(lugares, nombres, lat, lon)],
+        'Nombre': nombres,
+        'LATITUD': np.asarray(lat, dtype=float),
+        'LONGITUD': np.asarray(lon, dtype=float),
+        'Tipos': [",".join(l.get("types", [])) for l in lugares],
+        'Direccion': [l.get("formattedAddress", "") for l in lugares],
+    })
+    tabla['Estado'] = clasificar_lugares(tabla['Nombre'], tabla['Tipos'])
+    # Residencias OSM clasificadas por etiqueta (amenity/social_facility): se aceptan
+    # siempre. La BLACKLIST es para los textos libres de Places ("Residencia Club de
+    # Mayores" no es un club). Aquí para que el motor, el almacén y el índice coincidan
+    por_etiqueta = tabla['place_id'].str.startswith(PREFIJO_OSM) & (tabla['Tipos'] != "")
+    tabla.loc[por_etiqueta, 'Estado'] = "ACEPTADO"
+    return tabla
+
+
+def lugares_a_df(lugares, fuente):
+    """Convierte lugares con formato Places (id, displayName, location, types) a filas del almacén."""
+    tabla = tabla_lugares(lugares)
+    tabla = tabla[tabla['Estado'] == "ACEPTADO"].assign(Fuente=fuente)
+    return tabla[COLUMNAS].reset_index(drop=True)
+
+
+def cargar_almacen(ruta=ARCHIVO_ALMACEN):
+    if not os.path.exists(ruta):
+        return pd.DataFrame(columns=COLUMNAS)
+    return pd.read_parquet(ruta)
+
+
+def actualizar_almacen(lugares, fuente, ruta=ARCHIVO_ALMACEN):
+    """Añade lugares al almacén (deduplicando por place_id) y lo guarda."""
+    nuevos = lugares_a_df(lugares, fuente)
+    almacen = pd.concat([cargar_almacen(ruta), nuevos], ignore_index=True)
+    almacen = almacen.drop_duplicates('place_id', keep='last').reset_index(drop=True)
+    almacen.to_parquet(ruta, index=False)
+    return almacen
+
+
+def importar_desde_cache(ruta_cache=RUTA_CACHE, ruta=ARCHIVO_ALMACEN):
+    """Vuelca al almacén todas las respuestas de Places guardadas en la caché SQLite."""
+    if not os.path.exists(ruta_cache):
+        return cargar_almacen(ruta)
+    with sqlite3.connect(ruta_cache) as conn:
+        filas = conn.execute("SELECT json FROM respuestas WHERE proveedor = 'google_places'").fetchall()
+    lugares = [l for (texto,) in filas for l in json.loads(texto).get("places", [])]
+    return actualizar_almacen(lugares, 'google_places', ruta)
+
+
+# ==============================================================================
+# ÍNDICE ESPACIAL
+# ==============================================================================
+
+def clasificar_oceano(i_sat):
+    """Versión vectorizada de clasificar_oceano() con los umbrales de config.yaml."""
+    i_sat = np.asarray(i_sat, dtype=float)
+    return np.select([i_sat < UMBRAL_BLUE_OCEAN, i_sat <= UMBRAL_BATALLA],
+                     ["Blue Ocean", "Batalla"], default="Saturado")
+
+
+class IndiceCompetidores:
+    """KD-tree sobre los competidores del almacén. Todas las consultas son vectorizadas."""
+
+    def __init__(self, almacen, camas=None):
+        self.almacen = almacen.reset_index(drop=True)
+        self.xyz = coords_a_xyz(self.almacen['LATITUD'].values, self.almacen['LONGITUD'].values)
+        self.arbol = cKDTree(self.xyz) if len(self.almacen) else None
+        # Camas por competidor: constante de config salvo que se pase un vector
+        if camas is None:
+            camas = np.full(len(self.almacen), float(CAMAS_POR_COMPETIDOR))
+        self.camas = np.asarray(camas, dtype=float)
+
+    def contar(self, lat, lon, radio_m=RADIO_BUSQUEDA_METROS):
+        """Número de competidores a <= radio_m de cada punto."""
+        if self.arbol is None:
+            return np.zeros(len(lat), dtype=int)
+        return self.arbol.query_ball_point(coords_a_xyz(lat, lon), radio_m / 1000.0,
+                                           return_length=True)
+
+    def oferta_camas(self, lat, lon, radio_m=RADIO_BUSQUEDA_METROS):
+        """Suma de camas de los competidores a <= radio_m de cada punto."""
+        if self.arbol is None:
+            return np.zeros(len(lat))
+        pares = cKDTree(coords_a_xyz(lat, lon)).sparse_distance_matrix(
+            self.arbol, radio_m / 1000.0, output_type='ndarray')
+        return np.bincount(pares['i'], weights=self.camas[pares['j']], minlength=len(lat))
+
+    def rival_mas_cercano(self, lat, lon):
+        """(distancia en metros, índice en el almacén) del competidor más cercano."""
+        if self.arbol is None:
+            return np.full(len(lat), np.inf), np.full(len(lat), -1)
+        cuerda, idx = self.arbol.query(coords_a_xyz(lat, lon), k=1)
+        return cuerda_a_arco_m(cuerda), idx
+
+    def saturacion(self, lat, lon, camas_potenciales, radio_m=RADIO_BUSQUEDA_METROS):
+        """Indice_Saturacion = oferta de camas en el radio / camas potenciales propias."""
+        oferta = self.oferta_camas(lat, lon, radio_m)
+        camas_potenciales = np.asarray(camas_potenciales, dtype=float)
+        return np.divide(oferta, camas_potenciales, out=np.zeros_like(oferta),
+                         where=camas_potenciales > 0)
+
+
+# ==============================================================================
+# EJECUCIÓN
+# ==============================================================================
+
+def ejecutar_saturacion_offline():
+    print("=" * 70)
+    print("   SATURACIÓN OFFLINE (ALMACÉN LOCAL DE COMPETIDORES)")
+    print("=" * 70)
+
+    print("\n>>> Actualizando almacén desde la caché de respuestas...")
+    almacen = importar_desde_cache()
+    print(f"    ✓ {len(almacen):,} competidores únicos en {ARCHIVO_ALMACEN}")
+    # Camas reales del registro de residencias donde haya pareja; constante en el resto
+    camas = camas_competidores(almacen)
+    indice = IndiceCompetidores(almacen, camas=camas)
+    print(f"    Radio: {RADIO_BUSQUEDA_METROS} m | Camas/competidor: media {camas.mean() if len(camas) else 0:.0f} "
+          f"(constante {CAMAS_POR_COMPETIDOR} sin registro)")
+
+    # A. TODAS LAS SECCIONES
+    if os.path.exists(ARCHIVO_INPUT_GEO):
+        print("\n>>> Saturación de todas las secciones...")
+        df = pd.read_csv(ARCHIVO_INPUT_GEO, sep=';')
+        if os.path.exists(ARCHIVO_MATRIZ_P):
+            df_matriz = pd.read_parquet(ARCHIVO_MATRIZ_P)
+            df_matriz['Pct_Target'] = df_matriz[COLS_TARGET].sum(axis=1)
+            df = pd.merge(df, df_matriz[['Pct_Target']], left_on='Seccion', right_index=True, how='left')
+            df['Poblacion_Target_Real'] = df['Poblacion_Total'] * df['Pct_Target'].fillna(0)
+        else:
+            df['Poblacion_Target_Real'] = df['Poblacion_Total'] * 0.06
+        df = df.dropna(subset=['LATITUD', 'LONGITUD']).reset_index(drop=True)
+        lat, lon = df['LATITUD'].values, df['LONGITUD'].values
+
+        # Demanda propia de cada sección = target a <= radio × market share
+        xyz = coords_a_xyz(lat, lon)
+        arbol_secc = cKDTree(xyz)
+        pares = arbol_secc.sparse_distance_matrix(arbol_secc, RADIO_BUSQUEDA_METROS / 1000.0,
+                                                  output_type='ndarray')
+        target = df['Poblacion_Target_Real'].values
+        df['Camas_Potenciales_Radio'] = np.bincount(pares['i'], weights=target[pares['j']],
+                                                    minlength=len(df)) * MARKET_SHARE
+
+        df['Num_Competidores'] = indice.contar(lat, lon)
+        df['Dist_Rival_Cercano_m'], _ = indice.rival_mas_cercano(lat, lon)
+        df['Oferta_Estimada_Camas'] = indice.oferta_camas(lat, lon)
+        df['Indice_Saturacion'] = indice.saturacion(lat, lon, df['Camas_Potenciales_Radio'])
+        df['Tipo_Oceano'] = clasificar_oceano(df['Indice_Saturacion'])
+
+        cols = ['Seccion', 'LATITUD', 'LONGITUD', 'Poblacion_Target_Real', 'Camas_Potenciales_Radio',
+                'Num_Competidores', 'Dist_Rival_Cercano_m', 'Oferta_Estimada_Camas',
+                'Indice_Saturacion', 'Tipo_Oceano']
+        df[cols].to_csv(OUTPUT_SECCIONES, sep=';', index=False)
+        print(f"    ✓ {len(df):,} secciones -> {OUTPUT_SECCIONES}")
+        print(f"    Blue Ocean: {(df['Tipo_Oceano'] == 'Blue Ocean').sum():,} | "
+              f"Batalla: {(df['Tipo_Oceano'] == 'Batalla').sum():,} | "
+              f"Saturado: {(df['Tipo_Oceano'] == 'Saturado').sum():,}")
+
+    # B. CLUSTERS DE EXPANSIÓN
+    if os.path.exists(ARCHIVO_CLUSTERS):
+        print("\n>>> Saturación de clusters de expansión...")
+        df_c = pd.read_csv(ARCHIVO_CLUSTERS, sep=';')
+        lat, lon = df_c['LATITUD'].values, df_c['LONGITUD'].values
+        df_c['Num_Competidores'] = indice.contar(lat, lon)
+        df_c['Dist_Rival_Cercano_m'], _ = indice.rival_mas_cercano(lat, lon)
+        df_c['Oferta_Estimada_Camas'] = indice.oferta_camas(lat, lon)
+        df_c['Indice_Saturacion'] = indice.saturacion(lat, lon, df_c['Camas_Potenciales'])
+        df_c['Tipo_Oceano'] = clasificar_oceano(df_c['Indice_Saturacion'])
+        df_c.to_csv(OUTPUT_CLUSTERS, sep=';', index=False)
+        print(f"    ✓ {len(df_c)} clusters -> {OUTPUT_CLUSTERS}")
+        print(f"    🌊 Blue Oceans: {(df_c['Tipo_Oceano'] == 'Blue Ocean').sum()}")
+
+    print("\n✅ SATURACIÓN OFFLINE COMPLETADA")
+
+
+if __name__ == "__main__":
+    ejecutar_saturacion_offline()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+CACHE_RESPUESTAS.PY - Caché Persistente (SQLite) de Places y Overpass
+================================================================================
+Cada re-ejecución de las validaciones de competencia pagaba y esperaba las
+mismas consultas. Aquí guardamos el JSON crudo de cada respuesta con clave:
+
+    (proveedor, texto de la consulta, centro redondeado, radio)
+
+- TTL configurable: las entradas caducadas se vuelven a pedir
+- Modo offline: ninguna petición sale a la red; un fallo de caché es un ERROR
+  (FalloCacheOffline), no un "0 competidores" silencioso
+- Estadísticas por ejecución: tasa de acierto y coste ahorrado (USD)
+
+Parámetros en config.yaml -> competition.cache.
+Variable de entorno LSOMA_OFFLINE=1 fuerza el modo offline.
+================================================================================
+"""
+
+import os
+import json
+import time
+import sqlite3
+import yaml
+
+# Cargar Configuración Centralizada
+with open("../config.yaml", "r") as f:
+    config = yaml.safe_load(f)
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+_CACHE = config['competition']['cache']
+RUTA_CACHE = _CACHE['path']
+TTL_DIAS = _CACHE['ttl_days']
+OFFLINE = _CACHE['offline'] or os.getenv("LSOMA_OFFLINE", "0") == "1"
+COSTE_POR_PETICION = _CACHE['cost_per_request_usd']
+DECIMALES_CENTRO = 5        # ~1 m: mismo cluster -> misma clave
+
+
+class FalloCacheOffline(Exception):
+    """Consulta no cacheada en modo offline."""
+
+
+class CacheRespuestas:
+    """
+    Uso:
+        cache = CacheRespuestas()
+        data = cache.obtener('google_places', query, lat, lon, radio)
+        if data is None:
+            data = <petición real>
+            cache.guardar('google_places', query, lat, lon, radio, data)
+        cache.imprimir_resumen()
+    """
+
+    def __init__(self, ruta=RUTA_CACHE, ttl_dias=TTL_DIAS, offline=OFFLINE):
+        self.ruta = ruta
+        self.ttl_s = ttl_dias * 86400 if ttl_dias is not None else None
+        self.offline = offline
+        self.aciertos = {}
+        self.fallos = {}
+
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(ruta)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS respuestas (
+                proveedor TEXT NOT NULL,
+                query     TEXT NOT NULL,
+                lat       REAL NOT NULL,
+                lon       REAL NOT NULL,
+                radio     REAL NOT NULL,
+                json      TEXT NOT NULL,
+                creado    REAL NOT NULL,
+                PRIMARY KEY (proveedor, query, lat, lon, radio)
+            )""")
+        self._conn.commit()
+
+    @staticmethod
+    def _clave(proveedor, query, lat, lon, radio):
+        return (proveedor, query, round(float(lat), DECIMALES_CENTRO),
+                round(float(lon), DECIMALES_CENTRO), float(radio))
+
+    def obtener(self, proveedor, query, lat, lon, radio):
+        """JSON cacheado o None. En modo offline, un fallo lanza FalloCacheOffline."""
+        fila = self._conn.execute(
+            "SELECT json, creado FROM respuestas WHERE proveedor=? AND query=? "
+            "AND lat=? AND lon=? AND radio=?", self._clave(proveedor, query, lat, lon, radio)
+        ).fetchone()
+
+        vigente = fila is not None and (self.ttl_s is None or time.time() - fila[1] <= self.ttl_s)
+        if vigente:
+            self.aciertos[proveedor] = self.aciertos.get(proveedor, 0) + 1
+            return json.loads(fila[0])
+
+        self.fallos[proveedor] = self.fallos.get(proveedor, 0) + 1
+        if self.offline:
+            raise FalloCacheOffline(
+                f"[{proveedor}] sin caché para ({lat:.5f}, {lon:.5f}) r={radio}: {query[:60]}")
+        return None
+
+    def guardar(self, proveedor, query, lat, lon, radio, data):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO respuestas VALUES (?, ?, ?, ?, ?, ?, ?)",
+            self._clave(proveedor, query, lat, lon, radio) + (json.dumps(data, ensure_ascii=False), time.time()))
+        self._conn.commit()
+
+    def resumen(self):
+        """Estadísticas de la ejecución: aciertos, fallos, tasa y coste ahorrado."""
+        aciertos = sum(self.aciertos.values())
+        total = aciertos + sum(self.fallos.values())
+        ahorro = sum(n * COSTE_POR_PETICION.get(p, 0.0) for p, n in self.aciertos.items())
+        return {
+            'aciertos': aciertos,
+            'fallos': total - aciertos,
+            'tasa_acierto': aciertos / total if total else 0.0,
+            'coste_ahorrado_usd': ahorro,
+        }
+
+    def imprimir_resumen(self):
+        r = self.resumen()
+        modo = " (OFFLINE)" if self.offline else ""
+        print(f"    💾 Caché{modo}: {r['aciertos']} aciertos / {r['fallos']} fallos "
+              f"({r['tasa_acierto']:.1%}) | Ahorro: ${r['coste_ahorrado_usd']:.2f}")
+
+    def cerrar(self):
+        self._conn.close()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+CACHE_SECCIONES.PY - GeoParquet de Secciones Censales (Preproceso Único)
+================================================================================
+Convierte SECC_CE_20240101.shp en un GeoParquet listo para consumir:
+- EPSG:4326 (lo que piden folium y el resto de mapas)
+- CUSEC como entero (sin problemas de ceros iniciales al cruzar con CSVs)
+- Centroides precalculados (cent_lat / cent_lon) en proyección métrica
+- Varios niveles de geometría simplificada (geom_s0001, geom_s0005, ...)
+  sobre arcos compartidos (topologia.py): las vecinas siguen encajando en
+  todos los niveles, sin huecos ni solapes
+- RANGOS_ZOOM: qué nivel usar en cada zoom web (tolerancia <= 1 píxel),
+  solo con los niveles que de verdad aligeran (vértices medidos al construir)
+
+Los consumidores cargan solo las columnas y el bbox que necesitan con
+cargar_secciones() / cargar_centroides() en lugar de leer el shapefile entero.
+
+Uso:  python cache_secciones.py   (una vez, o cuando cambie el shapefile)
+================================================================================
+"""
+
+import os
+import json
+import math
+import shapely
+import pandas as pd
+import geopandas as gpd
+from topologia import simplificar_topologia
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+SHAPEFILE = "../datos/seccionado_2024/SECC_CE_20240101.shp"
+GEOPARQUET = "../datos/secciones_2024.parquet"
+
+# Tolerancias de simplificación (grados, EPSG:4326) -> nombre de columna
+# 0.001 es la que usaba simplificar_geometria() en mapa_interactivo_folium.py
+TOLERANCIAS = {
+    'geom_s0001': 0.0001,   # Calle / barrio
+    'geom_s0005': 0.0005,   # Ciudad
+    'geom_s001': 0.001,     # Provincia (equivalente al mapa interactivo)
+    'geom_s005': 0.005,     # Comunidad autónoma
+    'geom_s01': 0.01,       # Vista nacional (z7): se funden las secciones de menos de un píxel
+    'geom_s02': 0.02,       # z6 (zoom inicial del mapa)
+    'geom_s05': 0.05,       # z4 o menos
+}
+NIVEL_DEFECTO = 'geom_s001'
+ZOOM_MAX = 20
+
+# Vértices por nivel, medidos en construir_cache(). Un nivel solo entra en
+# RANGOS_ZOOM si tiene al menos REDUCCION_MIN menos vértices que el nivel más
+# fino ya elegido: por debajo del 20%, sus zooms los sirve ese nivel fino.
+VERTICES_NIVELES = GEOPARQUET.replace('.parquet', '_vertices.json')
+REDUCCION_MIN = 0.2
+
+
+def leer_vertices(ruta=VERTICES_NIVELES):
+    """{nivel: vértices} del último construir_cache() ({} si no existe)."""
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta) as f:
+        return json.load(f)
+
+
+def _rangos_zoom(tolerancias=TOLERANCIAS, zoom_max=ZOOM_MAX, vertices=None, reduccion_min=REDUCCION_MIN):
+    """
+    [(nivel, zoom_min, zoom_max)] de grueso a fino: en cada zoom, el nivel más
+    simplificado cuya tolerancia no pasa de un píxel (360 / (256 * 2**z) grados).
+    Por encima del nivel más fino, la geometría completa.
+
+    vertices: {nivel: vértices}. Si se da, se descartan los niveles que no
+    bajan reduccion_min respecto al nivel más fino elegido; sin datos, todos.
+    """
+    vertices = vertices or {}
+    elegidos, previo = [], vertices.get('geometry')
+    for col, tol in sorted(tolerancias.items(), key=lambda kv: kv[1]):
+        n = vertices.get(col)
+        if previo is None or n is None or n <= (1 - reduccion_min) * previo:
+            elegidos.append((col, tol))
+            previo = n
+    rangos, z_min = [], 0
+    for col, tol in reversed(elegidos):
+        z_hasta = math.floor(math.log2(360 / (256 * tol)))
+        if z_hasta >= z_min:
+            rangos.append((col, z_min, z_hasta))
+            z_min = z_hasta + 1
+    rangos.append(('geometry', z_min, zoom_max))
+    return rangos
+
+
+RANGOS_ZOOM = _rangos_zoom(vertices=leer_vertices())
+
+COLS_ATRIBUTOS = ['CPRO', 'CMUN', 'CDIS', 'CSEC', 'NPRO', 'NMUN']
+
+# ==============================================================================
+# FUNCIONES
+# ==============================================================================
+
+def cusec_a_int(serie):
+    """Normaliza cualquier representación de CUSEC ("0100101001 Nombre...",
+    100101001, "0100101001") a entero nullable."""
+    codigo = serie.astype(str).str.split(' ').str[0].str.strip()
+    return pd.to_numeric(codigo, errors='coerce').astype('Int64')
+
+
+def construir_cache(shapefile=SHAPEFILE, salida=GEOPARQUET):
+    """Lee el shapefile una vez y escribe el GeoParquet con centroides y niveles."""
+    print(">>> Cargando shapefile...")
+    gdf = gpd.read_file(shapefile)
+    print(f"    ✓ {len(gdf):,} secciones (CRS original: {gdf.crs})")
+
+    if 'CUSEC' not in gdf.columns:
+        gdf['CUSEC'] = (gdf['CPRO'].astype(str) + gdf['CMUN'].astype(str) +
+                        gdf['CDIS'].astype(str) + gdf['CSEC'].astype(str))
+    gdf['CUSEC'] = cusec_a_int(gdf['CUSEC']).astype('int64')
+
+    # Centroides en la proyección métrica original (el centroide en grados
+    # está sesgado) y después una única reproyección a 4326
+    print(">>> Calculando centroides...")
+    if gdf.crs is not None and gdf.crs.is_geographic:
+        centroides = gdf.to_crs(epsg=25830).geometry.centroid.to_crs(epsg=4326)
+    else:
+        centroides = gdf.geometry.centroid.to_crs(epsg=4326)
+    gdf['cent_lat'] = centroides.y.values
+    gdf['cent_lon'] = centroides.x.values
+
+    gdf = gdf.to_crs(epsg=4326)
+
+    print(">>> Pre-simplificando geometrías (arcos compartidos entre vecinas)...")
+    niveles = simplificar_topologia(gdf.geometry.values, list(TOLERANCIAS.values()))
+    vertices = {'geometry': int(shapely.get_num_coordinates(gdf.geometry.values).sum())}
+    print(f"    geometry: {vertices['geometry']:,} vértices")
+    for (col, tol), geoms in zip(TOLERANCIAS.items(), niveles):
+        gdf[col] = gpd.GeoSeries(geoms, index=gdf.index, crs=gdf.crs)
+        vertices[col] = int(shapely.get_num_coordinates(geoms.astype(object)).sum())
+        vacias = int(shapely.is_empty(geoms.astype(object)).sum())
+        print(f"    ✓ {col} (tolerance={tol}): {vertices[col]:,} vértices, {vacias:,} secciones fundidas")
+
+    rangos = _rangos_zoom(vertices=vertices)
+    usados = {nivel for nivel, _, _ in rangos}
+    for col in TOLERANCIAS:
+        if col not in usados:
+            print(f"    ⚠️ {col} no aligera >= {REDUCCION_MIN:.0%} al nivel más fino: fuera de RANGOS_ZOOM")
+    print("    RANGOS_ZOOM: " + ", ".join(f"{n} z{a}-{b}" for n, a, b in rangos))
+
+    cols = ['CUSEC'] + [c for c in COLS_ATRIBUTOS if c in gdf.columns]
+    cols += ['cent_lat', 'cent_lon', 'geometry'] + list(TOLERANCIAS)
+    gdf = gdf[cols].sort_values('CUSEC').reset_index(drop=True)
+
+    # write_covering_bbox permite filtrar por bbox al leer sin cargar todo
+    gdf.to_parquet(salida, index=False, write_covering_bbox=True)
+    with open(salida.replace('.parquet', '_vertices.json'), 'w') as f:
+        json.dump(vertices, f, indent=2)
+    size_mb = os.path.getsize(salida) / (1024 * 1024)
+    print(f"    ✓ Guardado: {salida} ({size_mb:.1f} MB)")
+    return salida
+
+
+def cargar_secciones(columnas=None, bbox=None, nivel=NIVEL_DEFECTO, path=GEOPARQUET):
+    """
+    Carga secciones desde el GeoParquet en EPSG:4326.
+
+    columnas: atributos a leer además de CUSEC (None = todos los atributos)
+    bbox:     (minx, miny, maxx, maxy) en grados; solo se leen las filas que intersectan
+    nivel:    columna de geometría ('geometry' = completa, o una de TOLERANCIAS)
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No existe {path}. Ejecuta primero cache_secciones.py")
+
+    if columnas is None:
+        columnas = COLS_ATRIBUTOS + ['cent_lat', 'cent_lon']
+    cols = ['CUSEC'] + [c for c in columnas if c not in ('CUSEC', nivel)] + [nivel]
+
+    gdf = gpd.read_parquet(path, columns=cols, bbox=bbox)
+    gdf = gdf.set_geometry(nivel)
+    if nivel != 'geometry':
+        gdf = gdf.rename_geometry('geometry')
+    return gdf
+
+
+def cargar_centroides(path=GEOPARQUET):
+    """Tabla ligera CUSEC -> (cent_lat, cent_lon) sin decodificar geometrías."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No existe {path}. Ejecuta primero cache_secciones.py")
+    return pd.read_parquet(path, columns=['CUSEC', 'cent_lat', 'cent_lon'])
+
+
+# ==============================================================================
+# EJECUCIÓN
+# ==============================================================================
+if __name__ == "__main__":
+    print("=" * 60)
+    print("   CACHE GEOPARQUET DE SECCIONES CENSALES")
+    print("=" * 60)
+    construir_cache()
+    print("=" * 60)
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+CAPAS_MAPA.PY - Capas Externas de Carga Diferida para Mapas Folium
+================================================================================
+folium.GeoJson(gdf.__geo_interface__) incrusta cada capa completa en el HTML:
+decenas de MB que el navegador parsea al abrir aunque solo se vea una capa.
+
+Aquí cada capa se escribe como fichero lateral comprimido (.geojson.gz o
+.topojson.gz) junto al HTML y se descarga SOLO cuando se activa en el
+LayerControl:
+
+- El estilo se evalúa en Python (misma style_function que antes); los estilos
+  distintos viajan una vez en 'estilos' y cada elemento lleva su índice (_e).
+  El tooltip se monta en el navegador con los campos.
+- TopoJSON (topologia.py): arcos compartidos + cuantización, decodificado con
+  topojson.feature() en el navegador. En formato compacto los campos van por
+  columnas y las geometrías ordenadas por estilo ('grupos'), sin _e.
+- En el HTML solo queda una capa L.geoJSON vacía + un fetch.
+- Descompresión con DecompressionStream('gzip'); si el servidor ya envía
+  Content-Encoding: gzip, el fichero llega descomprimido y se lee tal cual.
+
+Los ficheros se sirven por ruta relativa: abrir el HTML desde un servidor
+estático (python -m http.server), no con file://.
+
+CapaPuntos: miles de puntos como UNA FeatureCollection (construida por
+columnas, sin iterrows) pintada con circleMarker sobre canvas y un único
+popup plantillado en el navegador, en lugar de un CircleMarker + Popup HTML
+por fila.
+================================================================================
+"""
+
+import os
+import gzip
+import json
+import numpy as np
+import pandas as pd
+import folium
+from folium.elements import JSCSSMixin
+from jinja2 import Template
+from topologia import CUANTIZACION, codificar_topojson
+
+DECIMALES_TOOLTIP = 3    # toLocaleString() enseña como mucho 3 decimales
+
+
+def paleta_estilos(gdf, style_func):
+    """
+    Evalúa style_func con todas las columnas de cada fila. Retorna (índice de
+    estilo por fila, lista de estilos distintos).
+    """
+    indices, estilos, vistos = [], [], {}
+    for props in gdf.drop(columns=gdf.geometry.name).to_dict('records'):
+        estilo = style_func({'properties': props})
+        clave = json.dumps(estilo, sort_keys=True)
+        if clave not in vistos:
+            vistos[clave] = len(estilos)
+            estilos.append(estilo)
+        indices.append(vistos[clave])
+    return indices, estilos
+
+
+def topojson_estilado(gdf, style_func, campos, tolerancia=None, cuantizacion=CUANTIZACION, compacto=False):
+    """
+    TopoJSON (objeto 'capa') con los campos, el índice de estilo _e y la paleta en 'estilos'.
+
+    compacto: formato de las capas diferidas. Sin geometrías vacías, ordenadas
+    por estilo ('grupos': nº de geometrías de cada estilo, en lugar de _e) y
+    con los campos por columnas en 'propiedades' (sin repetir los nombres en
+    cada geometría; decimales recortados a los que enseña el tooltip).
+    CapaDiferida las reconstruye en el navegador.
+    """
+    indices, estilos = paleta_estilos(gdf, style_func)
+    if not compacto:
+        topo = codificar_topojson(gdf[campos + [gdf.geometry.name]].assign(_e=indices),
+                                  campos + ['_e'], tolerancia=tolerancia, cuantizacion=cuantizacion)
+        topo['estilos'] = estilos
+        return topo
+
+    indices = np.asarray(indices)
+    con_geometria = ~(gdf.geometry.isna() | gdf.geometry.is_empty).to_numpy()
+    orden = np.flatnonzero(con_geometria)[np.argsort(indices[con_geometria], kind='stable')]
+    capa = gdf.iloc[orden]
+    topo = codificar_topojson(capa[[capa.geometry.name]], tolerancia=tolerancia, cuantizacion=cuantizacion)
+    topo['propiedades'] = {
+        c: (capa[c].round(DECIMALES_TOOLTIP) if pd.api.types.is_float_dtype(capa[c]) else capa[c])
+           .astype(object).where(capa[c].notna(), None).tolist()
+        for c in campos
+    }
+    topo['estilos'] = estilos
+    topo['grupos'] = np.bincount(indices[orden], minlength=len(estilos)).tolist()
+    return topo
+
+
+def escribir_capa(gdf, ruta, style_func, campos, tolerancia=None, cuantizacion=CUANTIZACION):
+    """
+    Escribe la capa comprimida con solo los campos del tooltip y la paleta de
+    estilos: TopoJSON compacto si la ruta termina en .topojson.gz, si no GeoJSON.
+    Retorna (bytes en disco, bytes del JSON sin comprimir).
+    """
+    if ruta.endswith('.topojson.gz'):
+        datos = topojson_estilado(gdf, style_func, campos, tolerancia, cuantizacion, compacto=True)
+    else:
+        indices, estilos = paleta_estilos(gdf, style_func)
+        datos = gdf[campos + [gdf.geometry.name]].assign(_e=indices).__geo_interface__
+        for feature in datos['features']:
+            feature.pop('bbox', None)
+        datos.pop('bbox', None)
+        datos['estilos'] = estilos
+
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    texto = json.dumps(datos, separators=(',', ':'), ensure_ascii=False, default=str)
+    with gzip.open(ruta, 'wt', encoding='utf-8', compresslevel=9) as f:
+        f.write(texto)
+    return os.path.getsize(ruta), len(texto.encode('utf-8'))
+
+
+class CapaDiferida(JSCSSMixin, folium.map.Layer):
+    """
+    Capa del LayerControl que descarga su GeoJSON / TopoJSON la primera vez que se muestra.
+    url: fichero único, o lista de niveles {'zmin', 'zmax', 'trozos': [{'url', 'bbox'}]}:
+    se usa el nivel del zoom actual y solo se bajan los trozos cuyo bbox cae en la vista.
+    """
+
+    _template = Template(u"""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.featureGroup();
+            {%- if this.show %}
+            {{ this.get_name() }}.addTo({{ this._parent.get_name() }});
+            {%- endif %}
+
+            (function(capa, mapa, niveles) {
+                var campos = {{ this.campos|tojson }}, alias = {{ this.alias|tojson }};
+                var subcapas = {}, pedidas = {};
+
+                function tooltip(feature, layer) {
+                    var html = campos.map(function(c, i) {
+                        var v = feature.properties[c];
+                        if (typeof v === 'number') { v = v.toLocaleString(); }
+                        return '<b>' + alias[i] + '</b> ' + v;
+                    }).join('<br>');
+                    layer.bindTooltip(html, {sticky: true});
+                }
+
+                // Formato compacto: campos por columnas y geometrías ordenadas por estilo
+                function expandir(geometrias, columnas, grupos) {
+                    var e = 0, fin = grupos[0];
+                    geometrias.forEach(function(g, i) {
+                        while (i >= fin) { e += 1; fin += grupos[e]; }
+                        g.properties = {_e: e};
+                        Object.keys(columnas).forEach(function(c) { g.properties[c] = columnas[c][i]; });
+                    });
+                }
+
+                function descargar(url) {
+                    pedidas[url] = true;
+                    fetch(url)
+                        .then(function(r) { return r.arrayBuffer(); })
+                        .then(function(buf) {
+                            var b = new Uint8Array(buf);
+                            if (b[0] === 0x1f && b[1] === 0x8b) {
+                                var flujo = new Blob([buf]).stream()
+                                    .pipeThrough(new DecompressionStream('gzip'));
+                                return new Response(flujo).text();
+                            }
+                            return new TextDecoder().decode(b);
+                        })
+                        .then(function(texto) {
+                            var datos = JSON.parse(texto), estilos = datos.estilos || [];
+                            if (datos.type === 'Topology') {
+                                var objeto = datos.objects[Object.keys(datos.objects)[0]];
+                                if (datos.propiedades) { expandir(objeto.geometries, datos.propiedades, datos.grupos); }
+                                datos = topojson.feature(datos, objeto);
+                            }
+                            subcapas[url] = L.geoJSON(datos, {
+                                style: function(f) { return estilos[f.properties._e]; },
+                                onEachFeature: tooltip
+                            });
+                            actualizar();
+                        })
+                        .catch(function(e) { delete pedidas[url]; console.error('Capa ' + url, e); });
+                }
+
+                function visibles() {
+                    var z = mapa.getZoom(), vista = mapa.getBounds();
+                    var nivel = niveles.find(function(n) { return z >= n.zmin && z <= n.zmax; })
+                        || niveles[niveles.length - 1];
+                    return nivel.trozos.filter(function(t) {
+                        return !t.bbox || vista.intersects([[t.bbox[1], t.bbox[0]], [t.bbox[3], t.bbox[2]]]);
+                    }).map(function(t) { return t.url; });
+                }
+
+                function actualizar() {
+                    if (!mapa.hasLayer(capa)) { return; }
+                    var urls = visibles();
+                    var listas = urls.every(function(u) { return subcapas[u]; });
+                    urls.forEach(function(u) {
+                        if (subcapas[u]) { capa.addLayer(subcapas[u]); }
+                        else if (!pedidas[u]) { descargar(u); }
+                    });
+                    // El nivel anterior sigue visible hasta que el nuevo está completo
+                    if (listas) {
+                        Object.keys(subcapas).forEach(function(u) {
+                            if (urls.indexOf(u) < 0) { capa.removeLayer(subcapas[u]); }
+                        });
+                    }
+                }
+
+                // Tras el script completo (el LayerControl puede retirar capas ocultas)
+                setTimeout(function() {
+                    actualizar();
+                    capa.on('add', actualizar);
+                    mapa.on('moveend', actualizar);
+                }, 0);
+            })({{ this.get_name() }}, {{ this._parent.get_name() }}, {{ this.niveles|tojson }});
+        {% endmacro %}
+        """)
+
+    default_js = [
+        ("topojson", "https://cdnjs.cloudflare.com/ajax/libs/topojson/1.6.9/topojson.min.js"),
+    ]
+
+    def __init__(self, url, name, campos, alias, show=False):
+        super().__init__(name=name, overlay=True, control=True, show=show)
+        self._name = 'CapaDiferida'
+        self.niveles = ([{'zmin': 0, 'zmax': 99, 'trozos': [{'url': url, 'bbox': None}]}]
+                        if isinstance(url, str) else list(url))
+        self.campos = list(campos)
+        self.alias = list(alias)
+
+
+def puntos_geojson(df, campos, lat='LATITUD', lon='LONGITUD', color=None):
+    """
+    FeatureCollection de puntos construida por columnas. color: array con el
+    índice de color de cada fila (viaja como _c).
+    """
+    coords = np.column_stack([df[lon].to_numpy(float), df[lat].to_numpy(float)]).round(6).tolist()
+    columnas = [df[c].astype(object).where(df[c].notna(), None).tolist() for c in campos]
+    if color is not None:
+        campos, columnas = list(campos) + ['_c'], columnas + [np.asarray(color).tolist()]
+    return {'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': xy},
+         'properties': dict(zip(campos, valores))}
+        for xy, valores in zip(coords, zip(*columnas))
+    ]}
+
+
+class CapaPuntos(folium.map.Layer):
+    """
+    Capa de puntos en canvas con popup común. decimales: None (texto) o nº de
+    decimales por campo; sufijos: texto tras el valor (p. ej. '€').
+    """
+
+    _template = Template(u"""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function() {
+                var t0 = performance.now();
+                var colores = {{ this.colores|tojson }};
+                var campos = {{ this.campos|tojson }}, alias = {{ this.alias|tojson }};
+                var decimales = {{ this.decimales|tojson }}, sufijos = {{ this.sufijos|tojson }};
+                var lienzo = L.canvas({padding: 0.5});
+                var capa = L.geoJSON({{ this.datos|tojson }}, {
+                    pointToLayer: function(feature, latlng) {
+                        var c = colores[feature.properties._c || 0];
+                        return L.circleMarker(latlng, {renderer: lienzo, radius: {{ this.radio }},
+                            color: c, fillColor: c, fill: true, fillOpacity: 0.6});
+                    }
+                });
+                capa.on('click', function(e) {
+                    var p = e.layer.feature.properties;
+                    var html = campos.map(function(c, i) {
+                        var v = p[c];
+                        if (decimales[i] !== null && v !== null) {
+                            v = Number(v).toLocaleString('en-US', {minimumFractionDigits: decimales[i],
+                                                                   maximumFractionDigits: decimales[i]});
+                        }
+                        return '<b>' + alias[i] + '</b> ' + v + sufijos[i];
+                    }).join('<br>');
+                    L.popup({maxWidth: 300}).setLatLng(e.latlng).setContent(html)
+                        .openOn({{ this._parent.get_name() }});
+                });
+                console.log('{{ this.layer_name }}: ' + capa.getLayers().length + ' puntos en ' +
+                            (performance.now() - t0).toFixed(0) + ' ms');
+                return capa;
+            })();
+            {%- if this.show %}
+            {{ this.get_name() }}.addTo({{ this._parent.get_name() }});
+            {%- endif %}
+        {% endmacro %}
+        """)
+
+    def __init__(self, datos, name, campos, alias, decimales=None, sufijos=None,
+                 colores=('#3388ff',), radio=4, show=True):
+        super().__init__(name=name, overlay=True, control=True, show=show)
+        self._name = 'CapaPuntos'
+        self.datos = datos
+        self.campos = list(campos)
+        self.alias = list(alias)
+        self.decimales = list(decimales) if decimales is not None else [None] * len(self.campos)
+        self.sufijos = list(sufijos) if sufijos is not None else [''] * len(self.campos)
+        self.colores = list(colores)
+        self.radio = radio
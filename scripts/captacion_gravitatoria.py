@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+CAPTACION_GRAVITATORIA.PY - Demanda de Captación con Decaimiento por Distancia
+================================================================================
+Hoy la capacidad es una suma "dura" de Poblacion_Target_Real de los miembros
+del cluster × market_share: una sección a 1.6 km no cuenta nada. Aquí cada
+sección aporta a cada sitio candidato según un kernel de distancia:
+
+    W[i, s] = K(d(i, s) / h)   si d(i, s) <= cutoff,   0 en otro caso
+    Demanda_s = Σ_i  W[i, s] · Target_i        (un único producto W.T @ target)
+
+W se construye como matriz dispersa (secciones × candidatos) con una consulta
+de radio sobre KD-tree, así que 32k secciones contra miles de candidatos se
+resuelven en segundos. La demanda es por candidato AISLADO: el reparto entre
+candidatos que compiten por la misma población se hace en la selección de sitios.
+
+Parámetros en config.yaml -> catchment (kernel, bandwidth_km, cutoff_km).
+================================================================================
+"""
+
+import os
+import time
+import numpy as np
+import pandas as pd
+import yaml
+from scipy import sparse
+from scipy.spatial import cKDTree
+from geodesia import coords_a_xyz
+
+# Cargar Configuración Centralizada
+with open("../config.yaml", "r") as f:
+    config = yaml.safe_load(f)
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+ARCHIVO_INPUT_GEO = "../datos/ranking_fase6_geo_ready.csv"
+ARCHIVO_MATRIZ_P = "../datos/matriz_P_nacional_filtrada.parquet"
+ARCHIVO_CANDIDATOS = "../datos/expansion_clusters_final.csv"
+OUTPUT_CAPTACION = "../datos/captacion_candidatos.csv"
+
+COLS_TARGET = ['M_80-84', 'M_85-89', 'M_90-94', 'M_95-99', 'M_100 y más']
+
+KERNEL = config['catchment']['kernel']
+BANDWIDTH_KM = config['catchment']['bandwidth_km']
+CUTOFF_KM = config['catchment']['cutoff_km']
+MARKET_SHARE = config['business']['market_share_target']
+
+# Kernels de decaimiento: función de u = d / h, valen 1 en d = 0
+KERNELS = {
+    'gaussian': lambda u: np.exp(-0.5 * u ** 2),
+    'exponential': lambda u: np.exp(-u),
+    'power': lambda u: 1.0 / (1.0 + u ** 2),
+    'uniform': lambda u: np.ones_like(u),
+}
+
+# ==============================================================================
+# FUNCIONES
+# ==============================================================================
+
+def construir_matriz_pesos(lat_secc, lon_secc, lat_cand, lon_cand,
+                           kernel=KERNEL, bandwidth_km=BANDWIDTH_KM, cutoff_km=CUTOFF_KM):
+    """
+    Matriz dispersa CSR (n_secciones × n_candidatos) de pesos de captación.
+    Solo se almacenan los pares a distancia <= cutoff_km.
+    """
+    if kernel not in KERNELS:
+        raise ValueError(f"Kernel desconocido: {kernel}. Opciones: {list(KERNELS)}")
+
+    xyz_secc = coords_a_xyz(lat_secc, lon_secc)
+    xyz_cand = coords_a_xyz(lat_cand, lon_cand)
+
+    pares = cKDTree(xyz_secc).sparse_distance_matrix(
+        cKDTree(xyz_cand), cutoff_km, output_type='ndarray')
+    pesos = KERNELS[kernel](pares['v'] / bandwidth_km)
+
+    return sparse.csr_matrix((pesos, (pares['i'], pares['j'])),
+                             shape=(len(xyz_secc), len(xyz_cand)))
+
+
+def demanda_captacion(W, target):
+    """Target ponderado que capta cada candidato (vector de n_candidatos)."""
+    return W.T @ np.asarray(target, dtype=float)
+
+
+# ==============================================================================
+# EJECUCIÓN
+# ==============================================================================
+
+def ejecutar_captacion():
+    print("=" * 60)
+    print("   CAPTACIÓN GRAVITATORIA (MATRIZ DISPERSA)")
+    print("=" * 60)
+
+    if not os.path.exists(ARCHIVO_INPUT_GEO) or not os.path.exists(ARCHIVO_CANDIDATOS):
+        print("❌ Faltan archivos previos (fase 6 / expansión).")
+        return
+
+    print("\n>>> Cargando secciones y candidatos...")
+    df = pd.read_csv(ARCHIVO_INPUT_GEO, sep=';')
+    if os.path.exists(ARCHIVO_MATRIZ_P):
+        df_matriz = pd.read_parquet(ARCHIVO_MATRIZ_P)
+        df_matriz['Pct_Target'] = df_matriz[COLS_TARGET].sum(axis=1)
+        df = pd.merge(df, df_matriz[['Pct_Target']], left_on='Seccion', right_index=True, how='left')
+        df['Poblacion_Target_Real'] = df['Poblacion_Total'] * df['Pct_Target'].fillna(0)
+    else:
+        df['Poblacion_Target_Real'] = df['Poblacion_Total'] * 0.06
+    df = df.dropna(subset=['LATITUD', 'LONGITUD'])
+
+    df_cand = pd.read_csv(ARCHIVO_CANDIDATOS, sep=';')
+    print(f"    ✓ {len(df):,} secciones | {len(df_cand):,} candidatos")
+
+    print(f"\n>>> Matriz de pesos (kernel={KERNEL}, h={BANDWIDTH_KM} km, cutoff={CUTOFF_KM} km)...")
+    t0 = time.perf_counter()
+    W = construir_matriz_pesos(df['LATITUD'].values, df['LONGITUD'].values,
+                               df_cand['LATITUD'].values, df_cand['LONGITUD'].values)
+    t1 = time.perf_counter()
+    demanda = demanda_captacion(W, df['Poblacion_Target_Real'].values)
+    t2 = time.perf_counter()
+    print(f"    ✓ {W.nnz:,} pares sección-candidato ({t1 - t0:.2f} s construcción, "
+          f"{(t2 - t1) * 1000:.1f} ms mat-vec)")
+
+    df_cand['Demanda_Captacion'] = demanda
+    df_cand['Camas_Captacion'] = demanda * MARKET_SHARE
+    if 'Camas_Potenciales' in df_cand.columns:
+        ratio = (df_cand['Camas_Captacion'] / df_cand['Camas_Potenciales']).median()
+        print(f"    Camas captación / camas cluster (mediana): {ratio:.2f}x")
+
+    df_cand.to_csv(OUTPUT_CAPTACION, sep=';', index=False)
+    print(f"\n✅ CAPTACIÓN GUARDADA: {OUTPUT_CAPTACION}")
+
+
+if __name__ == "__main__":
+    ejecutar_captacion()
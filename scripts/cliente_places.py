@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+CLIENTE_PLACES.PY - Cliente Asíncrono de Google Places (Text Search)
+================================================================================
+Sustituye el bucle "requests.post + time.sleep(0.1)" por peticiones
+concurrentes controladas:
+- Token bucket: nunca más de rate_limit_qps peticiones/s (ráfagas de 'burst')
+- Semáforo: como mucho max_concurrency peticiones en vuelo
+- Una sola ClientSession con keep-alive (sin handshake TLS por petición)
+- Reintentos en 429 / 5xx / timeouts: en 429 / 503 se espera lo que pida
+  Retry-After; si no lo trae, backoff exponencial + jitter
+- Callback al_completar(): cada resultado se escribe en cuanto llega
+- Caché opcional (cache_respuestas.py): los aciertos no consumen cuota
+
+Parámetros en config.yaml -> competition.places_api.
+Para pruebas locales: arrancar stub_places.py y exportar
+PLACES_URL=http://127.0.0.1:8765/v1/places:searchText
+================================================================================
+"""
+
+import os
+import time
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import asyncio
+import aiohttp
+import yaml
+
+# Cargar Configuración Centralizada
+with open("../config.yaml", "r") as f:
+    config = yaml.safe_load(f)
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+PLACES_URL = os.getenv("PLACES_URL", "https://places.googleapis.com/v1/places:searchText")
+
+_API = config['competition']['places_api']
+TASA_QPS = _API['rate_limit_qps']
+RAFAGA = _API['burst']
+MAX_CONCURRENCIA = _API['max_concurrency']
+MAX_REINTENTOS = _API['max_retries']
+TIMEOUT_S = _API['timeout_seconds']
+BACKOFF_BASE_S = 0.5
+ESPERA_MAX_S = 60.0          # Tope a lo que pida Retry-After
+
+FIELD_MASK = "places.id,places.displayName,places.location,places.types,places.formattedAddress"
+ESTADOS_REINTENTABLES = {429, 500, 502, 503, 504}
+ESTADOS_RETRY_AFTER = {429, 503}
+
+
+class ErrorPlaces(Exception):
+    """La API respondió con un error no recuperable o se agotaron los reintentos."""
+
+
+class LimitadorTokens:
+    """Token bucket: 'tasa' peticiones/s con ráfagas de hasta 'capacidad'."""
+
+    def __init__(self, tasa, capacidad=None):
+        self.tasa = float(tasa)
+        self.capacidad = float(capacidad or tasa)
+        self.tokens = self.capacidad
+        self.ultimo = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def adquirir(self):
+        async with self._lock:
+            while True:
+                ahora = time.monotonic()
+                self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+                self.ultimo = ahora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.tasa)
+
+
+def espera_retry_after(valor, maximo=ESPERA_MAX_S):
+    """
+    Segundos que pide una cabecera Retry-After (segundos o fecha HTTP), con
+    tope 'maximo'. None si no viene o no se entiende.
+    """
+    if not valor:
+        return None
+    try:
+        segundos = float(valor)
+    except ValueError:
+        try:
+            fecha = parsedate_to_datetime(valor)
+        except (TypeError, ValueError):
+            return None
+        if fecha.tzinfo is None:
+            fecha = fecha.replace(tzinfo=timezone.utc)
+        segundos = (fecha - datetime.now(timezone.utc)).total_seconds()
+    return min(max(segundos, 0.0), maximo)
+
+
+def payload_busqueda(lat, lon, radio_m, query, max_resultados=20):
+    """Cuerpo de una petición searchText con locationBias circular."""
+    return {
+        "textQuery": query,
+        "maxResultCount": max_resultados,
+        "locationBias": {
+            "circle": {
+                "center": {"latitude": float(lat), "longitude": float(lon)},
+                "radius": float(radio_m)
+            }
+        }
+    }
+
+
+class ClientePlaces:
+    """
+    Uso:
+        async with ClientePlaces(api_key) as cliente:
+            respuestas = await cliente.buscar_lote(consultas, al_completar=callback)
+    """
+
+    def __init__(self, api_key, url=PLACES_URL, tasa=TASA_QPS, rafaga=RAFAGA,
+                 concurrencia=MAX_CONCURRENCIA, reintentos=MAX_REINTENTOS,
+                 timeout_s=TIMEOUT_S, field_mask=FIELD_MASK, cache=None):
+        self.api_key = api_key
+        self.url = url
+        self.tasa = tasa
+        self.rafaga = rafaga
+        self.concurrencia = concurrencia
+        self.reintentos = reintentos
+        self.timeout_s = timeout_s
+        self.field_mask = field_mask
+        self.cache = cache
+        self.peticiones = 0
+        self.reintentos_usados = 0
+        self._session = None
+
+    async def __aenter__(self):
+        self._limitador = LimitadorTokens(self.tasa, self.rafaga)
+        self._semaforo = asyncio.Semaphore(self.concurrencia)
+        conector = aiohttp.TCPConnector(limit=self.concurrencia, keepalive_timeout=30)
+        self._session = aiohttp.ClientSession(
+            connector=conector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout_s),
+            headers={
+                "Content-Type": "application/json",
+                "X-Goog-Api-Key": self.api_key or "",
+                "X-Goog-FieldMask": self.field_mask,
+            })
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+
+    def _clave_cache(self, payload):
+        circulo = payload["locationBias"]["circle"]
+        query = f"{payload['textQuery']}|{payload.get('maxResultCount', 20)}|{self.field_mask}"
+        return ("google_places", query, circulo["center"]["latitude"],
+                circulo["center"]["longitude"], circulo["radius"])
+
+    async def buscar_texto(self, payload):
+        """POST con límite de tasa y reintentos. Retorna el JSON de la respuesta."""
+        if self.cache is not None:
+            # En modo offline un fallo lanza FalloCacheOffline (no se captura aquí)
+            data = self.cache.obtener(*self._clave_cache(payload))
+            if data is not None:
+                return data
+
+        for intento in range(self.reintentos + 1):
+            espera = None
+            async with self._semaforo:
+                await self._limitador.adquirir()
+                self.peticiones += 1
+                try:
+                    async with self._session.post(self.url, json=payload) as resp:
+                        if resp.status == 200:
+                            data = await resp.json()
+                            if self.cache is not None:
+                                self.cache.guardar(*self._clave_cache(payload), data)
+                            return data
+                        texto = await resp.text()
+                        if resp.status not in ESTADOS_REINTENTABLES:
+                            raise ErrorPlaces(f"HTTP {resp.status}: {texto[:200]}")
+                        error = f"HTTP {resp.status}"
+                        if resp.status in ESTADOS_RETRY_AFTER:
+                            espera = espera_retry_after(resp.headers.get("Retry-After"))
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = f"{type(e).__name__}: {e}"
+
+            if intento < self.reintentos:
+                # Lo que pida el servidor; si no, backoff exponencial con jitter
+                # completo (fuera del semáforo)
+                self.reintentos_usados += 1
+                if espera is None:
+                    espera = random.uniform(0, BACKOFF_BASE_S * 2 ** intento)
+                await asyncio.sleep(espera)
+
+        raise ErrorPlaces(f"Agotados {self.reintentos} reintentos ({error})")
+
+    async def buscar_lote(self, payloads, al_completar=None):
+        """
+        Lanza todas las búsquedas y las procesa según terminan.
+        al_completar(indice, respuesta) se llama en cuanto llega cada una
+        (respuesta = None si falló). Retorna las respuestas en el orden de entrada.
+        """
+        async def _una(i, payload):
+            try:
+                return i, await self.buscar_texto(payload)
+            except ErrorPlaces as e:
+                print(f"    ✗ Consulta {i}: {e}")
+                return i, None
+
+        respuestas = [None] * len(payloads)
+        tareas = [asyncio.ensure_future(_una(i, p)) for i, p in enumerate(payloads)]
+        for futuro in asyncio.as_completed(tareas):
+            i, respuesta = await futuro
+            respuestas[i] = respuesta
+            if al_completar is not None:
+                al_completar(i, respuesta)
+        return respuestas
+
+
+def buscar_centros(api_key, payloads, al_completar=None, **kwargs):
+    """Envoltorio síncrono: ejecuta buscar_lote en un bucle asyncio nuevo.
+    Retorna (respuestas, estadisticas)."""
+    async def _main():
+        async with ClientePlaces(api_key, **kwargs) as cliente:
+            t0 = time.perf_counter()
+            respuestas = await cliente.buscar_lote(payloads, al_completar)
+            stats = {
+                'peticiones': cliente.peticiones,
+                'reintentos': cliente.reintentos_usados,
+                'fallos': sum(r is None for r in respuestas),
+                'segundos': time.perf_counter() - t0,
+            }
+            return respuestas, stats
+    return asyncio.run(_main())
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+ENVOLVENTES_CLUSTERS.PY - Un Polígono por Cluster (Dissolve Topológico)
+================================================================================
+Los mapas pintan cada sección miembro por separado y no había un polígono
+de cluster para medir área, perímetro o contigüidad. Aquí:
+
+1. Geometría completa del GeoParquet (cache_secciones.py) de las secciones
+   etiquetadas; el ruido (Cluster_ID = -1) se descarta
+2. Unión por cluster con shapely.coverage_union_all: las secciones forman una
+   cobertura (bordes compartidos idénticos), así que basta con eliminar las
+   aristas interiores en vez de una unión general. Si el resultado no es
+   válido (o GEOS rechaza bordes mal nodados) se repite con union_all
+3. Clusters repartidos en lotes equilibrados entre procesos (WKB)
+4. Área y perímetro geodésicos (pyproj.Geod, WGS84): valen igual para
+   Península, Baleares y Canarias, sin elegir huso UTM
+5. Caché GeoParquet con clave = hash de (CUSEC, Cluster_ID) + nivel + versión
+   del GeoParquet: si el clustering no cambia, se lee sin recalcular
+
+Salida: ../datos/envolventes_clusters.csv (métricas por cluster, sin geometría)
+Uso:    python envolventes_clusters.py
+================================================================================
+"""
+
+import os
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from concurrent.futures import ProcessPoolExecutor
+from pyproj import Geod
+from cache_secciones import GEOPARQUET, cargar_secciones, cusec_a_int
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+ARCHIVO_PUNTOS_TAGGED = "../datos/ranking_fase8_puntos_con_cluster.csv"
+OUTPUT_CSV = "../datos/envolventes_clusters.csv"
+DIR_CACHE = "../datos/envolventes"
+
+NIVEL = 'geometry'          # Geometría completa (o una de cache_secciones.TOLERANCIAS)
+N_PROCESOS = os.cpu_count() or 1
+LOTES_POR_PROCESO = 4
+GEOD = Geod(ellps='WGS84')
+
+# ==============================================================================
+# DISSOLVE
+# ==============================================================================
+
+def clave_etiquetas(cusec, etiquetas, nivel=NIVEL, path=GEOPARQUET):
+    """Hash del vector de etiquetas (ordenado por CUSEC) + nivel + versión del GeoParquet."""
+    orden = np.argsort(cusec, kind='stable')
+    h = hashlib.sha256()
+    h.update(np.asarray(cusec, dtype=np.int64)[orden].tobytes())
+    h.update(np.asarray(etiquetas, dtype=np.int64)[orden].tobytes())
+    estado = os.stat(path)
+    h.update(f"{nivel}|{estado.st_size}|{estado.st_mtime_ns}".encode())
+    return h.hexdigest()[:16]
+
+
+def union_cobertura(geoms):
+    """Unión de polígonos que forman una cobertura; union_all si no lo son del todo."""
+    try:
+        union = shapely.coverage_union_all(geoms)
+        if shapely.is_valid(union):
+            return union
+    except shapely.errors.GEOSException:   # Bordes que no casan vértice a vértice
+        pass
+    return shapely.union_all(shapely.make_valid(geoms))
+
+
+def _disolver_lote(lote):
+    """[(cluster, wkbs)] -> [(cluster, wkb_union, n_secciones, area_km2, perimetro_km)]"""
+    resultado = []
+    for cid, wkbs in lote:
+        union = union_cobertura(shapely.from_wkb(wkbs))
+        area, perimetro = GEOD.geometry_area_perimeter(union)
+        resultado.append((cid, shapely.to_wkb(union), len(wkbs), abs(area) / 1e6, perimetro / 1e3))
+    return resultado
+
+
+def disolver_clusters(gdf, n_procesos=N_PROCESOS):
+    """
+    GeoDataFrame de secciones (EPSG:4326) con Cluster_ID -> un polígono por
+    cluster con Num_Secciones, Num_Partes, Area_km2, Perimetro_km y Compacidad
+    (Polsby-Popper: 1 = círculo).
+    """
+    etiquetas = gdf['Cluster_ID'].to_numpy()
+    wkbs = shapely.to_wkb(gdf.geometry.values)
+    orden = np.argsort(etiquetas, kind='stable')
+    ids, inicios = np.unique(etiquetas[orden], return_index=True)
+    grupos = list(zip(ids.tolist(), np.split(wkbs[orden], inicios[1:])))
+
+    # Lotes equilibrados: clusters de mayor a menor repartidos por turnos
+    n_lotes = max(1, min(len(grupos), n_procesos * LOTES_POR_PROCESO))
+    grupos.sort(key=lambda g: -len(g[1]))
+    lotes = [grupos[i::n_lotes] for i in range(n_lotes)]
+
+    if n_procesos > 1 and len(lotes) > 1:
+        with ProcessPoolExecutor(max_workers=n_procesos) as pool:
+            filas = [fila for lote in pool.map(_disolver_lote, lotes) for fila in lote]
+    else:
+        filas = [fila for lote in lotes for fila in _disolver_lote(lote)]
+
+    filas.sort(key=lambda f: f[0])
+    cids, geoms, n_secc, areas, perimetros = zip(*filas)
+    geoms = shapely.from_wkb(np.array(geoms, dtype=object))
+    areas, perimetros = np.array(areas), np.array(perimetros)
+    return gpd.GeoDataFrame({
+        'Cluster_ID': np.array(cids, dtype=np.int64),
+        'Num_Secciones': np.array(n_secc),
+        'Num_Partes': shapely.get_num_geometries(geoms),
+        'Area_km2': areas,
+        'Perimetro_km': perimetros,
+        'Compacidad': np.divide(4 * np.pi * areas, perimetros ** 2,
+                                out=np.zeros_like(areas), where=perimetros > 0),
+    }, geometry=geoms, crs='EPSG:4326')
+
+
+def envolventes_clusters(cusec, etiquetas, nivel=NIVEL, dir_cache=DIR_CACHE, n_procesos=N_PROCESOS):
+    """
+    Un polígono por cluster a partir del vector (CUSEC, Cluster_ID), leído de la
+    caché si ese mismo vector ya se disolvió antes.
+    """
+    cusec = cusec_a_int(pd.Series(cusec)).to_numpy(dtype=np.int64, na_value=-1)
+    etiquetas = np.asarray(etiquetas, dtype=np.int64)
+    validas = (cusec >= 0) & (etiquetas >= 0)
+    cusec, etiquetas = cusec[validas], etiquetas[validas]
+
+    clave = clave_etiquetas(cusec, etiquetas, nivel)
+    ruta = os.path.join(dir_cache, f"envolventes_{clave}.parquet")
+    if os.path.exists(ruta):
+        print(f"    ✓ Caché de envolventes: {ruta}")
+        return gpd.read_parquet(ruta)
+
+    t0 = time.perf_counter()
+    secciones = cargar_secciones(columnas=[], nivel=nivel)
+    gdf = secciones.merge(pd.DataFrame({'CUSEC': cusec, 'Cluster_ID': etiquetas}), on='CUSEC')
+    if len(gdf) < len(cusec):
+        print(f"    ⚠️ {len(cusec) - len(gdf)} secciones sin geometría en {GEOPARQUET}")
+
+    envolventes = disolver_clusters(gdf, n_procesos)
+    os.makedirs(dir_cache, exist_ok=True)
+    envolventes.to_parquet(ruta, index=False)
+    print(f"    ✓ {len(envolventes)} clusters disueltos ({len(gdf):,} secciones) en "
+          f"{time.perf_counter() - t0:.1f} s -> {ruta}")
+    return envolventes
+
+
+def clusters_contiguos(envolventes):
+    """Nº de otros clusters que tocan (o solapan) la envolvente de cada cluster."""
+    i, j = envolventes.sindex.query(envolventes.geometry.values, predicate='intersects')
+    distintos = i != j
+    return np.bincount(i[distintos], minlength=len(envolventes))
+
+
+# ==============================================================================
+# EJECUCIÓN
+# ==============================================================================
+
+def ejecutar_envolventes():
+    print("=" * 60)
+    print("   ENVOLVENTES DE CLUSTER (DISSOLVE TOPOLÓGICO)")
+    print("=" * 60)
+
+    if not os.path.exists(ARCHIVO_PUNTOS_TAGGED):
+        print(f"❌ No existe {ARCHIVO_PUNTOS_TAGGED}. Ejecuta primero 15_calculo_masa_critica.py")
+        return None
+
+    print(">>> Cargando secciones etiquetadas...")
+    df = pd.read_csv(ARCHIVO_PUNTOS_TAGGED, sep=';')
+    df['CUSEC_LIMPIO'] = cusec_a_int(df['CUSEC_LIMPIO'])
+    df = df.dropna(subset=['CUSEC_LIMPIO'])
+    print(f"    ✓ {len(df):,} secciones en {df['Cluster_ID'].nunique()} clusters")
+
+    print(">>> Disolviendo secciones por cluster...")
+    envolventes = envolventes_clusters(df['CUSEC_LIMPIO'], df['Cluster_ID'])
+
+    # Métricas de densidad con el área real del cluster
+    totales = df.groupby('Cluster_ID').agg(
+        Poblacion_Total=('Poblacion_Total', 'sum'),
+        Capacidad_Teorica_Camas=('Capacidad_Teorica_Camas', 'sum'),
+    )
+    resumen = pd.DataFrame(envolventes.drop(columns='geometry')).join(totales, on='Cluster_ID')
+    resumen['Clusters_Contiguos'] = clusters_contiguos(envolventes)
+    resumen['Poblacion_km2'] = resumen['Poblacion_Total'] / resumen['Area_km2']
+    resumen['Camas_km2'] = resumen['Capacidad_Teorica_Camas'] / resumen['Area_km2']
+
+    resumen.to_csv(OUTPUT_CSV, sep=';', index=False)
+    print(f"    ✓ Guardado: {OUTPUT_CSV}")
+
+    print("\n>>> Clusters más densos (camas teóricas por km²):")
+    cols = ['Cluster_ID', 'Num_Secciones', 'Area_km2', 'Compacidad', 'Camas_km2']
+    print(resumen.nlargest(10, 'Camas_km2')[cols].to_string(index=False, float_format='{:,.2f}'.format))
+    print("=" * 60)
+    return resumen
+
+
+if __name__ == "__main__":
+    ejecutar_envolventes()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+ESCENARIOS_SHARE.PY - Curva Continua Residencias vs Market Share
+================================================================================
+Con el clustering fijo, un cluster es viable si target_sum * share >= 85
+camas, es decir, si share >= 85 / target_sum. Ordenando una vez las sumas de
+target de los clusters (de mayor a menor):
+
+- Umbral de viabilidad de cada cluster: 85 / target_sum (creciente), ajustado
+  al ulp para que share >= umbral sea exactamente target_sum * share >= 85
+- Para cualquier share: nº de viables = búsqueda binaria en los umbrales;
+  camas = share * suma acumulada de esos clusters
+- Residencias = camas // 100; Gap = objetivo - residencias
+
+Cualquier vector de shares se evalúa en O((n + m) log n) sin recalcular
+columnas ni filtros. Los puntos de corte (shares donde entra un cluster)
+describen la función escalonada exacta.
+================================================================================
+"""
+
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+CAMAS_BREAK_EVEN = 85
+CAMAS_POR_RESIDENCIA = 100
+OBJETIVO_RESIDENCIAS = 1000
+
+# ==============================================================================
+# MOTOR
+# ==============================================================================
+
+def umbrales_exactos(t, camas_minimas):
+    """
+    Menor share (float) con t * share >= camas_minimas para cada t. camas/t
+    redondeado puede quedar un ulp por debajo o por encima del umbral real: se
+    corrige con np.nextafter para que comparar share >= umbral equivalga
+    exactamente a la regla t * share >= camas_minimas.
+    """
+    u = camas_minimas / t
+    while True:
+        bajo = t * u < camas_minimas
+        if not bajo.any():
+            break
+        u[bajo] = np.nextafter(u[bajo], np.inf)
+    while True:
+        previo = np.nextafter(u, -np.inf)
+        sobra = t * previo >= camas_minimas
+        if not sobra.any():
+            break
+        u[sobra] = previo[sobra]
+    return u
+
+
+def _ordenar(targets, camas_minimas):
+    """Sumas de target de mayor a menor, umbrales de share (crecientes) y suma acumulada."""
+    t = np.sort(np.asarray(targets, dtype=float))[::-1]
+    t = t[t > 0]
+    return umbrales_exactos(t, camas_minimas), np.r_[0.0, np.cumsum(t)]
+
+
+def _residencias(camas, camas_residencia):
+    """camas // camas_residencia sin que el ruido de coma flotante (99999.99999...) reste una."""
+    return np.floor(np.round(camas / camas_residencia, 9)).astype(np.int64)
+
+
+def evaluar_shares(targets, shares, camas_minimas=CAMAS_BREAK_EVEN,
+                   camas_residencia=CAMAS_POR_RESIDENCIA, objetivo=OBJETIVO_RESIDENCIAS):
+    """
+    targets: suma de población target por cluster; shares: vector de market shares.
+    Retorna un DataFrame por share con Clusters_Viables, Camas_Totales,
+    Residencias_Potenciales y Gap_Objetivo_1000.
+    """
+    umbrales, acumulado = _ordenar(targets, camas_minimas)
+    shares = np.asarray(shares, dtype=float)
+    n_viables = np.searchsorted(umbrales, shares, side='right')
+    camas = shares * acumulado[n_viables]
+    residencias = _residencias(camas, camas_residencia)
+    return pd.DataFrame({
+        'Share': shares,
+        'Clusters_Viables': n_viables,
+        'Camas_Totales': camas,
+        'Residencias_Potenciales': residencias,
+        'Gap_Objetivo_1000': objetivo - residencias,
+    })
+
+
+def puntos_corte(targets, share_max=1.0, camas_minimas=CAMAS_BREAK_EVEN,
+                 camas_residencia=CAMAS_POR_RESIDENCIA, objetivo=OBJETIVO_RESIDENCIAS):
+    """Shares (<= share_max) en los que un nuevo cluster pasa a ser viable, ya evaluados."""
+    umbrales, _ = _ordenar(targets, camas_minimas)
+    return evaluar_shares(targets, np.unique(umbrales[umbrales <= share_max]),
+                          camas_minimas, camas_residencia, objetivo)
+
+
+def curva_shares(targets, share_min, share_max, paso, camas_minimas=CAMAS_BREAK_EVEN,
+                 camas_residencia=CAMAS_POR_RESIDENCIA, objetivo=OBJETIVO_RESIDENCIAS):
+    """Rejilla regular de shares más los puntos de corte del intervalo, ordenados."""
+    umbrales, _ = _ordenar(targets, camas_minimas)
+    rejilla = np.round(np.arange(share_min, share_max + paso / 2, paso), 10)
+    cortes = umbrales[(umbrales >= share_min) & (umbrales <= share_max)]
+    curva = evaluar_shares(targets, np.union1d(rejilla, cortes), camas_minimas, camas_residencia, objetivo)
+    curva['Punto_Corte'] = np.isin(curva['Share'].to_numpy(), cortes)
+    return curva
+
+
+def share_para_objetivo(targets, objetivo=OBJETIVO_RESIDENCIAS, camas_minimas=CAMAS_BREAK_EVEN,
+                        camas_residencia=CAMAS_POR_RESIDENCIA):
+    """
+    Share mínimo con el que las residencias alcanzan el objetivo (NaN si no
+    lo alcanza ni con share 1). Entre dos umbrales consecutivos los viables no
+    cambian, así que basta con resolver share * acumulado >= camas necesarias
+    en cada tramo.
+    """
+    umbrales, acumulado = _ordenar(targets, camas_minimas)
+    if len(umbrales) == 0:
+        return np.nan
+    camas_necesarias = objetivo * camas_residencia
+    # Tramo k: [umbrales[k], umbrales[k + 1]) con los k + 1 clusters más grandes viables
+    candidato = np.maximum(umbrales, camas_necesarias / acumulado[1:])
+    fin_tramo = np.r_[umbrales[1:], np.inf]
+    validos = (candidato < fin_tramo) & (candidato <= 1.0)
+    if not validos.any():
+        return np.nan
+
+    # La división puede quedar un ulp corta: se sube hasta que evaluar_shares lo confirme
+    share = float(candidato[validos].min())
+    while share <= 1.0:
+        fila = evaluar_shares(targets, [share], camas_minimas, camas_residencia, objetivo)
+        if fila['Residencias_Potenciales'].iloc[0] >= objetivo:
+            return share
+        share = float(np.nextafter(share, np.inf))
+    return np.nan
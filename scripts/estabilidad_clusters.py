@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+ESTABILIDAD_CLUSTERS.PY - Robustez de los Clusters (Bootstrap Paralelo)
+================================================================================
+¿Madrid Centro, Bilbao y Málaga Costa siguen siendo clusters si el
+Score_Global o la renta tienen un poco de ruido? Medimos la estabilidad:
+
+1. Grafo de vecindad a 1.5 km (KD-tree) calculado UNA vez. Se usa como matriz
+   de distancias precalculada para DBSCAN en cada réplica.
+2. Cientos de réplicas en paralelo. Cada réplica perturba Score_Global y
+   Renta_Hogar (ruido lognormal) y desplaza el percentil de corte.
+3. Co-asociación dispersa: para cada arista del grafo contamos en cuántas
+   réplicas sus dos secciones caen en el mismo cluster. Memoria O(aristas)
+   en lugar de la matriz densa de 32k².
+4. Estabilidad de cada cluster de referencia = co-asociación media de sus
+   aristas internas (1 = siempre juntas, 0 = nunca).
+
+Modelo de referencia: parámetros PRIME de expansion_1000_residencias.py.
+================================================================================
+"""
+
+import os
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from scipy import sparse
+from scipy.spatial import cKDTree
+from sklearn.cluster import DBSCAN
+from geodesia import coords_a_xyz
+from expansion_1000_residencias import (COLS_TARGET, MIN_SECCIONES, PARAMS_PRIME, RADIO_CLUSTER_KM,
+                                        coeficiente_renta, mascara_percentil)
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+ARCHIVO_INPUT_GEO = "../datos/ranking_fase6_geo_ready.csv"
+ARCHIVO_MATRIZ_P = "../datos/matriz_P_nacional_filtrada.parquet"
+OUTPUT_ESTABILIDAD = "../datos/estabilidad_clusters.csv"
+OUTPUT_COASOCIACION = "../datos/coasociacion_secciones.npz"
+
+# Parámetros PRIME de expansion_1000_residencias.py (radio, mínimo y filtros también)
+PERCENTIL_SCORE = PARAMS_PRIME['percentil_score']
+PENALIZACION_RENTA = PARAMS_PRIME['penalizacion_renta']
+MARKET_SHARE = PARAMS_PRIME['market_share']
+CAMAS_MINIMAS = PARAMS_PRIME['camas_minimas']
+
+# Perturbaciones
+N_REPLICAS = 200
+SIGMA_SCORE = 0.05          # Ruido multiplicativo lognormal (≈ ±5%)
+SIGMA_RENTA = 0.05
+JITTER_PERCENTIL = 2.0      # Percentil de corte ~ U(85-2, 85+2)
+UMBRAL_ROBUSTO = 0.80
+N_PROCESOS = os.cpu_count() or 1
+SEMILLA = 42
+
+# ==============================================================================
+# FUNCIONES
+# ==============================================================================
+
+def construir_grafo_vecindad(lat, lon, radio_km=RADIO_CLUSTER_KM):
+    """Matriz dispersa simétrica de distancias (km) entre secciones a <= radio_km."""
+    xyz = coords_a_xyz(lat, lon)
+    arbol = cKDTree(xyz)
+    pares = arbol.sparse_distance_matrix(arbol, radio_km, output_type='ndarray')
+    return sparse.csr_matrix((pares['v'], (pares['i'], pares['j'])), shape=(len(xyz), len(xyz)))
+
+
+def etiquetar(score, renta, grafo, percentil, radio_km=RADIO_CLUSTER_KM):
+    """DBSCAN (sobre el grafo precalculado) del modelo PRIME. -1 = fuera/ruido."""
+    mascara = mascara_percentil(score * coeficiente_renta(renta, PENALIZACION_RENTA), percentil)
+    etiquetas = np.full(len(score), -1)
+    if mascara.sum() >= MIN_SECCIONES:
+        sub = grafo[mascara][:, mascara]
+        db = DBSCAN(eps=radio_km, min_samples=MIN_SECCIONES, metric='precomputed')
+        etiquetas[mascara] = db.fit_predict(sub)
+    return etiquetas
+
+
+# Estado compartido por los workers (se envía una vez por proceso)
+_DATOS = {}
+
+def _init_worker(score, renta, grafo, aristas_i, aristas_j):
+    _DATOS.update(score=score, renta=renta, grafo=grafo, ai=aristas_i, aj=aristas_j)
+
+
+def _ejecutar_lote(semillas):
+    """Ejecuta un lote de réplicas y devuelve los contadores acumulados."""
+    score, renta, grafo = _DATOS['score'], _DATOS['renta'], _DATOS['grafo']
+    ai, aj = _DATOS['ai'], _DATOS['aj']
+    n = len(score)
+    co = np.zeros(len(ai), dtype=np.int32)
+    en_cluster = np.zeros(n, dtype=np.int32)
+
+    for semilla in semillas:
+        rng = np.random.default_rng(semilla)
+        score_p = score * rng.lognormal(0.0, SIGMA_SCORE, n)
+        renta_p = renta * rng.lognormal(0.0, SIGMA_RENTA, n)
+        percentil = PERCENTIL_SCORE + rng.uniform(-JITTER_PERCENTIL, JITTER_PERCENTIL)
+
+        etiquetas = etiquetar(score_p, renta_p, grafo, percentil)
+        co += (etiquetas[ai] == etiquetas[aj]) & (etiquetas[ai] >= 0)
+        en_cluster += etiquetas >= 0
+
+    return co, en_cluster
+
+
+def bootstrap_coasociacion(score, renta, grafo, n_replicas=N_REPLICAS, n_procesos=N_PROCESOS,
+                           semilla=SEMILLA):
+    """
+    Ejecuta las réplicas en paralelo.
+    Retorna (aristas_i, aristas_j, frecuencia_coasociacion, frecuencia_en_cluster).
+    """
+    triu = sparse.triu(grafo, k=1).tocoo()
+    ai, aj = triu.row.astype(np.int64), triu.col.astype(np.int64)
+
+    semillas = np.random.SeedSequence(semilla).generate_state(n_replicas)
+    lotes = [lote for lote in np.array_split(semillas, max(1, n_procesos * 4)) if len(lote)]
+
+    co = np.zeros(len(ai), dtype=np.int64)
+    en_cluster = np.zeros(len(score), dtype=np.int64)
+    with ProcessPoolExecutor(max_workers=n_procesos, initializer=_init_worker,
+                             initargs=(score, renta, grafo, ai, aj)) as pool:
+        for co_lote, en_lote in pool.map(_ejecutar_lote, lotes):
+            co += co_lote
+            en_cluster += en_lote
+
+    return ai, aj, co / n_replicas, en_cluster / n_replicas
+
+
+def estabilidad_por_cluster(etiquetas_ref, ai, aj, frec_co, frec_en_cluster):
+    """Co-asociación media de las aristas internas de cada cluster de referencia."""
+    internas = (etiquetas_ref[ai] == etiquetas_ref[aj]) & (etiquetas_ref[ai] >= 0)
+    ids = etiquetas_ref[ai][internas]
+    n_ref = etiquetas_ref.max() + 1
+    suma = np.bincount(ids, weights=frec_co[internas], minlength=n_ref)
+    n_aristas = np.bincount(ids, minlength=n_ref)
+
+    miembros = etiquetas_ref >= 0
+    retencion = (np.bincount(etiquetas_ref[miembros], weights=frec_en_cluster[miembros], minlength=n_ref) /
+                 np.bincount(etiquetas_ref[miembros], minlength=n_ref))
+
+    return pd.DataFrame({
+        'Aristas_Internas': n_aristas,
+        'Estabilidad': np.divide(suma, n_aristas, out=np.zeros(n_ref), where=n_aristas > 0),
+        'Retencion_Secciones': retencion,
+    }, index=pd.Index(np.arange(n_ref), name='Cluster_ID'))
+
+
+# ==============================================================================
+# EJECUCIÓN
+# ==============================================================================
+
+def ejecutar_estabilidad():
+    print("=" * 70)
+    print("   ESTABILIDAD DE CLUSTERS (BOOTSTRAP + CO-ASOCIACIÓN DISPERSA)")
+    print("=" * 70)
+
+    if not os.path.exists(ARCHIVO_INPUT_GEO):
+        print("❌ Falta archivo fase 6.")
+        return
+
+    print("\n>>> Cargando secciones...")
+    df = pd.read_csv(ARCHIVO_INPUT_GEO, sep=';')
+    if os.path.exists(ARCHIVO_MATRIZ_P):
+        df_matriz = pd.read_parquet(ARCHIVO_MATRIZ_P)
+        df_matriz['Pct_Target'] = df_matriz[COLS_TARGET].sum(axis=1)
+        df = pd.merge(df, df_matriz[['Pct_Target']], left_on='Seccion', right_index=True, how='left')
+        df['Poblacion_Target_Real'] = df['Poblacion_Total'] * df['Pct_Target'].fillna(0)
+    else:
+        df['Poblacion_Target_Real'] = df['Poblacion_Total'] * 0.06
+    # Como en la expansión: renta desconocida = sin penalización, score NaN = nunca pasa el corte
+    df = df.dropna(subset=['LATITUD', 'LONGITUD']).reset_index(drop=True)
+    print(f"    ✓ {len(df):,} secciones")
+
+    print(f"\n>>> Grafo de vecindad ({RADIO_CLUSTER_KM} km)...")
+    t0 = time.perf_counter()
+    grafo = construir_grafo_vecindad(df['LATITUD'].values, df['LONGITUD'].values)
+    print(f"    ✓ {(grafo.nnz - len(df)) // 2:,} aristas ({time.perf_counter() - t0:.2f} s)")
+
+    score = df['Score_Global'].to_numpy(dtype=float)
+    renta = df['Renta_Hogar'].to_numpy(dtype=float)
+    etiquetas_ref = etiquetar(score, renta, grafo, PERCENTIL_SCORE)
+    df['Cluster_ID'] = etiquetas_ref
+    print(f"    ✓ Clustering de referencia: {etiquetas_ref.max() + 1} clusters")
+
+    print(f"\n>>> {N_REPLICAS} réplicas en {N_PROCESOS} procesos "
+          f"(σ_score={SIGMA_SCORE}, σ_renta={SIGMA_RENTA}, ±{JITTER_PERCENTIL} percentil)...")
+    t0 = time.perf_counter()
+    ai, aj, frec_co, frec_en_cluster = bootstrap_coasociacion(score, renta, grafo)
+    print(f"    ✓ Completado en {time.perf_counter() - t0:.1f} s")
+
+    # Co-asociación como matriz dispersa triangular superior
+    coasociacion = sparse.coo_matrix((frec_co.astype(np.float32), (ai, aj)), shape=grafo.shape)
+    sparse.save_npz(OUTPUT_COASOCIACION, coasociacion.tocsr())
+
+    # Resumen por cluster de referencia
+    miembros = df[df['Cluster_ID'] >= 0]
+    resumen = miembros.groupby('Cluster_ID').agg({
+        'Seccion': 'count',
+        'Poblacion_Target_Real': 'sum',
+        'LATITUD': 'mean',
+        'LONGITUD': 'mean',
+    }).rename(columns={'Seccion': 'Num_Secciones'})
+    resumen['Toponimos'] = miembros.groupby('Cluster_ID')['Seccion'].apply(lambda x: list(x)[:3])
+    resumen['Camas_Potenciales'] = resumen['Poblacion_Target_Real'] * MARKET_SHARE
+    resumen['Es_Viable'] = resumen['Camas_Potenciales'] >= CAMAS_MINIMAS
+    resumen = resumen.join(estabilidad_por_cluster(etiquetas_ref, ai, aj, frec_co, frec_en_cluster))
+    resumen['Es_Robusto'] = resumen['Estabilidad'] >= UMBRAL_ROBUSTO
+    resumen = resumen.sort_values('Camas_Potenciales', ascending=False)
+
+    resumen.to_csv(OUTPUT_ESTABILIDAD, sep=';')
+
+    viables = resumen[resumen['Es_Viable']]
+    print("\n--- RESULTADOS ---")
+    print(f"   Clusters viables: {len(viables)} | Robustos (≥{UMBRAL_ROBUSTO:.0%}): {viables['Es_Robusto'].sum()}")
+    print("\n--- TOP 10 CLUSTERS VIABLES POR CAPACIDAD ---")
+    pd.options.display.max_colwidth = 50
+    print(viables[['Toponimos', 'Num_Secciones', 'Camas_Potenciales', 'Estabilidad',
+                   'Retencion_Secciones']].head(10).to_string())
+
+    print(f"\n✅ ESTABILIDAD GUARDADA: {OUTPUT_ESTABILIDAD}")
+    print(f"   Co-asociación dispersa: {OUTPUT_COASOCIACION}")
+
+
+if __name__ == "__main__":
+    ejecutar_estabilidad()
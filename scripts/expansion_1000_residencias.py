@@ -17,6 +17,7 @@ import numpy as np
 from sklearn.cluster import DBSCAN
 import os
 from datetime import datetime
+from localizador_sitios import localizar_sitios
 
 # ==============================================================================
 # CONFIGURACIÓN DE RUTAS
@@ -31,6 +32,7 @@ OUTPUT_CLUSTERS = "../datos/expansion_clusters_final.csv"
 # ==============================================================================
 RADIO_CLUSTER_KM = 1.5  # Radio DBSCAN en km (NO MODIFICAR)
 MIN_SECCIONES = 3       # Mínimo de secciones por cluster
+UMBRAL_RENTA = 30000    # Rentas por debajo se penalizan (renta desconocida: sin penalización)
 COLS_TARGET = ['M_80-84', 'M_85-89', 'M_90-94', 'M_95-99', 'M_100 y más']
 
 # ==============================================================================
@@ -100,26 +102,38 @@ def cargar_datos():
     return df_clean
 
 
+def coeficiente_renta(renta, penalizacion):
+    """Coeficiente por sección: 'penalizacion' si renta < UMBRAL_RENTA, 1.0 si no (también si es NaN)."""
+    return np.where(np.asarray(renta, dtype=float) < UMBRAL_RENTA, penalizacion, 1.0)
+
+
+def mascara_percentil(score_ajustado, percentil):
+    """Secciones por encima del percentil de Score_Ajustado (los NaN no cuentan ni pasan)."""
+    score_ajustado = np.asarray(score_ajustado, dtype=float)
+    return score_ajustado > np.nanquantile(score_ajustado, percentil / 100)
+
+
 def aplicar_penalizacion_renta(df, penalizacion):
     """Aplica penalización económica a secciones con renta baja."""
     df = df.copy()
     # Penalización para rentas < 30,000€
-    df['Coef_Penalizacion'] = np.where(df['Renta_Hogar'] < 30000, penalizacion, 1.0)
+    df['Coef_Penalizacion'] = coeficiente_renta(df['Renta_Hogar'], penalizacion)
     df['Score_Ajustado'] = df['Score_Global'] * df['Coef_Penalizacion']
     return df
 
 
-def ejecutar_modelo(df, params):
+def ejecutar_modelo(df, params, ubicar_sitios=True):
     """
     Ejecuta el modelo completo con los parámetros dados.
+    ubicar_sitios: sustituye LATITUD/LONGITUD de los viables por el sitio de
+                   mediana ponderada (innecesario cuando solo se cuentan residencias).
     Retorna: (num_residencias, num_clusters_viables, df_clusters, camas_totales)
     """
     # 1. Aplicar penalización económica
     df = aplicar_penalizacion_renta(df, params['penalizacion_renta'])
     
     # 2. Filtrar por percentil de Score
-    umbral_score = df['Score_Ajustado'].quantile(params['percentil_score'] / 100)
-    df_filtrado = df[df['Score_Ajustado'] > umbral_score].copy()
+    df_filtrado = df[mascara_percentil(df['Score_Ajustado'], params['percentil_score'])].copy()
     
     if len(df_filtrado) < MIN_SECCIONES:
         return 0, 0, pd.DataFrame(), 0
@@ -163,6 +177,16 @@ def ejecutar_modelo(df, params):
         camas_totales = 0
         num_residencias = 0
     
+    # 9. Ubicar el sitio de cada cluster viable (la media lat/lon puede caer en el mar)
+    if ubicar_sitios and len(viables) > 0:
+        miembros = df_clusters[df_clusters['Cluster_ID'].isin(viables.index)]
+        sitios = localizar_sitios(miembros, df_todas=df)
+        viables['LAT_Media'] = viables['LATITUD']
+        viables['LON_Media'] = viables['LONGITUD']
+        viables = viables.join(sitios)
+        viables['LATITUD'] = viables['LAT_Sitio']
+        viables['LONGITUD'] = viables['LON_Sitio']
+    
     return num_residencias, len(viables), viables.reset_index(), camas_totales
 
 
@@ -185,8 +209,8 @@ def calcular_impacto_relajacion(df, params_actuales, parametro):
         params_test[parametro] = params_actuales[parametro] + limite_info['step']
     
     # Ejecutar modelo con parámetro relajado
-    res_actual, _, _, _ = ejecutar_modelo(df, params_actuales)
-    res_nuevo, _, _, _ = ejecutar_modelo(df, params_test)
+    res_actual, _, _, _ = ejecutar_modelo(df, params_actuales, ubicar_sitios=False)
+    res_nuevo, _, _, _ = ejecutar_modelo(df, params_test, ubicar_sitios=False)
     
     ganancia = res_nuevo - res_actual
     
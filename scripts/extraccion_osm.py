@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+EXTRACCION_OSM.PY - Extracción Masiva de Residencias de OpenStreetMap
+================================================================================
+En lugar de una consulta Overpass 'around:' por cluster (50 consultas con
+time.sleep(1.5) y conteos 'out count' adivinados), cargamos UNA vez todas las
+residencias de España:
+
+    amenity=nursing_home  |  social_facility=assisted_living
+
+Fuentes (en orden de preferencia):
+1. Extracto local .osm.pbf (p. ej. spain-latest.osm.pbf de Geofabrik), leído
+   en streaming con pyosmium (no carga el fichero en memoria)
+2. Fichero JSON con formato de respuesta Overpass (sirve como fixture)
+3. Una única consulta Overpass por bounding box (Península+Baleares y Canarias),
+   pasando por la caché de respuestas
+
+El resultado se indexa con IndiceCompetidores (KD-tree): los conteos para
+todos los clusters salen de búsquedas en memoria.
+================================================================================
+"""
+
+import os
+import json
+import requests
+from cache_respuestas import CacheRespuestas
+from almacen_competidores import COLUMNAS, PREFIJO_OSM, IndiceCompetidores, tabla_lugares
+from registro_residencias import camas_competidores
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+ARCHIVO_PBF = "../datos/spain-latest.osm.pbf"
+ARCHIVO_OVERPASS_JSON = "../datos/overpass_residencias_espana.json"
+OUTPUT_COMPETIDORES_OSM = "../datos/competidores_osm.parquet"
+OVERPASS_URL = "http://overpass-api.de/api/interpreter"
+
+# (sur, oeste, norte, este)
+BBOXES_ESPANA = [
+    (35.9, -9.5, 43.9, 4.4),     # Península + Baleares + Ceuta/Melilla
+    (27.6, -18.2, 29.5, -13.4),  # Canarias
+]
+ETIQUETAS = [("amenity", "nursing_home"), ("social_facility", "assisted_living")]
+
+# Tipo "Places" equivalente para reutilizar el mismo filtro de competidores
+TIPO_PLACES = {"nursing_home": "nursing_home", "assisted_living": "assisted_living_complex"}
+
+# ==============================================================================
+# FUENTES
+# ==============================================================================
+
+def query_overpass_bbox(bboxes=BBOXES_ESPANA):
+    """Consulta Overpass QL única con todas las etiquetas y bboxes."""
+    bloques = [f'  nwr["{k}"="{v}"]({s},{w},{n},{e});'
+               for (s, w, n, e) in bboxes for (k, v) in ETIQUETAS]
+    return "[out:json][timeout:600];\n(\n" + "\n".join(bloques) + "\n);\nout center tags;"
+
+
+def descargar_overpass(cache=None):
+    """Descarga (o lee de caché) todas las residencias de España en una petición."""
+    query = query_overpass_bbox()
+    if cache is not None:
+        data = cache.obtener('overpass', query, 0.0, 0.0, 0.0)
+        if data is not None:
+            return data.get("elements", [])
+    response = requests.post(OVERPASS_URL, data={'data': query}, timeout=900)
+    response.raise_for_status()
+    data = response.json()
+    if cache is not None:
+        cache.guardar('overpass', query, 0.0, 0.0, 0.0, data)
+    return data.get("elements", [])
+
+
+def cargar_overpass_json(ruta):
+    """Lee un fichero con formato de respuesta Overpass ({"elements": [...]})."""
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f).get("elements", [])
+
+
+def cargar_pbf(ruta):
+    """
+    Recorre un .osm.pbf en streaming y devuelve elementos con formato Overpass.
+
+    Diferencias con la consulta Overpass ('out center'): la posición de un way
+    es la media simple de sus vértices (no el centro de su bbox; en un way
+    cerrado el primer vértice cuenta dos veces) y las relaciones se ignoran
+    (las residencias mapeadas como multipolígono no aparecen).
+    """
+    try:
+        import osmium
+    except ImportError:
+        raise ImportError("Leer .osm.pbf requiere pyosmium (pip install osmium)")
+
+    class _Residencias(osmium.SimpleHandler):
+        def __init__(self):
+            super().__init__()
+            self.elementos = []
+
+        def _es_residencia(self, tags):
+            return any(tags.get(k) == v for k, v in ETIQUETAS)
+
+        def _guardar(self, tipo, osm_id, tags, lat, lon):
+            self.elementos.append({"type": tipo, "id": osm_id, "lat": lat, "lon": lon,
+                                   "tags": {t.k: t.v for t in tags}})
+
+        def node(self, n):
+            if self._es_residencia(n.tags) and n.location.valid():
+                self._guardar("node", n.id, n.tags, n.location.lat, n.location.lon)
+
+        def way(self, w):
+            if self._es_residencia(w.tags):
+                puntos = [(nd.lat, nd.lon) for nd in w.nodes if nd.location.valid()]
+                if puntos:
+                    lat = sum(p[0] for p in puntos) / len(puntos)
+                    lon = sum(p[1] for p in puntos) / len(puntos)
+                    self._guardar("way", w.id, w.tags, lat, lon)
+
+    handler = _Residencias()
+    # locations=True resuelve coordenadas de los nodos de cada way
+    handler.apply_file(ruta, locations=True)
+    return handler.elementos
+
+
+def elementos_a_lugares(elementos):
+    """Elementos Overpass -> lugares con formato Places (id, displayName, location, types)."""
+    lugares = []
+    for el in elementos:
+        lat = el.get("lat", el.get("center", {}).get("lat"))
+        lon = el.get("lon", el.get("center", {}).get("lon"))
+        if lat is None or lon is None:
+            continue
+        tags = el.get("tags", {})
+        tipos = [TIPO_PLACES[v] for k, v in ETIQUETAS if tags.get(k) == v]
+        lugares.append({
+            "id": f"{PREFIJO_OSM}{el['type']}/{el['id']}",
+            "displayName": {"text": tags.get("name", "Residencia (OSM sin nombre)")},
+            "location": {"latitude": lat, "longitude": lon},
+            "types": tipos,
+        })
+    return lugares
+
+
+def cargar_lugares_osm(ruta_pbf=ARCHIVO_PBF, ruta_json=ARCHIVO_OVERPASS_JSON, cache=None):
+    """Residencias OSM (formato Places) desde la mejor fuente disponible."""
+    if ruta_pbf and os.path.exists(ruta_pbf):
+        print(f"    Fuente: extracto PBF {ruta_pbf} (streaming)")
+        elementos = cargar_pbf(ruta_pbf)
+    elif ruta_json and os.path.exists(ruta_json):
+        print(f"    Fuente: JSON Overpass {ruta_json}")
+        elementos = cargar_overpass_json(ruta_json)
+    else:
+        print("    Fuente: consulta Overpass única por bounding box")
+        elementos = descargar_overpass(cache if cache is not None else CacheRespuestas())
+    print(f"    ✓ {len(elementos):,} elementos OSM")
+    return elementos_a_lugares(elementos)
+
+
+def cargar_competidores_osm(**kwargs):
+    """
+    Residencias OSM deduplicadas. Retorna DataFrame con columnas del almacén.
+    Los elementos clasificados por etiqueta (amenity/social_facility) salen
+    ACEPTADO de tabla_lugares() aunque el nombre esté en la BLACKLIST, igual
+    que en motor_competencia.py con ProveedorOverpass.
+    """
+    tabla = tabla_lugares(cargar_lugares_osm(**kwargs))
+    competidores = tabla[tabla['Estado'] == "ACEPTADO"].assign(Fuente='overpass')
+    competidores = competidores[COLUMNAS].drop_duplicates('place_id').reset_index(drop=True)
+    print(f"    ✓ {len(competidores):,} residencias")
+    return competidores
+
+
+def indice_osm(registro=None, **kwargs):
+    """
+    IndiceCompetidores (KD-tree) sobre las residencias OSM; guarda también el Parquet.
+    registro: registro de plazas para camas_competidores (None = el de config.yaml).
+    """
+    competidores = cargar_competidores_osm(**kwargs)
+    competidores.to_parquet(OUTPUT_COMPETIDORES_OSM, index=False)
+    return IndiceCompetidores(competidores, camas=camas_competidores(competidores, registro))
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+INFORME_EXCEL.PY - Informes Excel en Streaming (Memoria Constante)
+================================================================================
+pd.ExcelWriter (openpyxl) monta todo el libro en memoria celda a celda antes
+de guardarlo: lento y pesado con miles de filas × decenas de columnas.
+Aquí se usa xlsxwriter en modo constant_memory:
+
+- Filas convertidas por bloques, escritas y volcadas a disco (memoria constante)
+- Formatos por tipo de columna (entero, decimal, booleano, fecha, texto)
+  aplicados a la columna entera, no a cada celda
+- Cabecera fija y autofiltro; anchura estimada con una muestra de filas
+- Sidecar Parquet con los datos completos de una hoja, para que el Excel
+  pueda llevar solo una vista previa truncada
+
+El índice se escribe solo si tiene nombre (p.ej. Cluster_ID).
+================================================================================
+"""
+
+import os
+import time
+import pandas as pd
+import xlsxwriter
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+FORMATOS = {
+    'entero': {'num_format': '#,##0'},
+    'decimal': {'num_format': '#,##0.00'},
+    'booleano': {'align': 'center'},
+    'fecha': {'num_format': 'yyyy-mm-dd'},
+    'texto': {},
+}
+FORMATO_CABECERA = {'bold': True, 'bg_color': '#DDEBF7', 'border': 1}
+FILAS_MUESTRA_ANCHO = 200
+FILAS_BLOQUE = 5000        # Filas convertidas a valores nativos de cada vez
+ANCHO_MAX = 50
+
+# ==============================================================================
+# FUNCIONES
+# ==============================================================================
+
+def tipo_columna(serie):
+    """Clave de FORMATOS según el dtype de la columna."""
+    if pd.api.types.is_bool_dtype(serie):
+        return 'booleano'
+    if pd.api.types.is_integer_dtype(serie):
+        return 'entero'
+    if pd.api.types.is_float_dtype(serie):
+        return 'decimal'
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return 'fecha'
+    return 'texto'
+
+
+def _bloque_nativo(bloque):
+    """Bloque de filas con objetos nativos y None en los nulos (celda vacía)."""
+    for col in bloque.columns:
+        serie = bloque[col]
+        if pd.api.types.is_datetime64_any_dtype(serie) and serie.dt.tz is not None:
+            bloque[col] = serie.dt.tz_localize(None)
+    return bloque.astype(object).where(bloque.notna(), None)
+
+
+def escribir_hoja(libro, nombre, df, formatos, max_filas=None, nota=None):
+    """Escribe df fila a fila (en orden, como exige constant_memory); nota solo si se trunca."""
+    if df.index.names != [None]:
+        df = df.reset_index()
+    total = len(df)
+    if max_filas is not None:
+        df = df.head(max_filas)
+
+    hoja = libro.add_worksheet(nombre)
+    cabecera = [str(c) for c in df.columns]
+    muestra = df.head(FILAS_MUESTRA_ANCHO)
+    for c, col in enumerate(df.columns):
+        serie = df[col]
+        largo = muestra[col].astype(str).str.len().max() if len(muestra) else 0
+        ancho = min(max(len(cabecera[c]), int(largo or 0)) + 2, ANCHO_MAX)
+        hoja.set_column(c, c, ancho, formatos[tipo_columna(serie)])
+
+    hoja.write_row(0, 0, cabecera, formatos['cabecera'])
+    if len(df) < total:
+        # A la derecha de la cabecera: la tabla sigue siendo legible como datos
+        hoja.write(0, len(cabecera) + 1, f"Vista previa: {len(df):,} de {total:,} filas. {nota or ''}".strip())
+    hoja.freeze_panes(1, 0)
+    if len(cabecera):
+        hoja.autofilter(0, 0, max(len(df), 1), len(cabecera) - 1)
+
+    # Por bloques: solo FILAS_BLOQUE filas convertidas a objetos a la vez
+    for inicio in range(0, len(df), FILAS_BLOQUE):
+        bloque = _bloque_nativo(df.iloc[inicio:inicio + FILAS_BLOQUE].copy())
+        for r, fila in enumerate(bloque.itertuples(index=False, name=None), start=inicio + 1):
+            hoja.write_row(r, 0, fila)
+    return len(df), total
+
+
+def escribir_informe(ruta, hojas, max_filas=None, sidecars=None):
+    """
+    hojas:    {nombre: DataFrame} en el orden del libro
+    max_filas: {nombre: n} para dejar solo una vista previa de esa hoja
+    sidecars: {nombre: ruta_parquet} con los datos completos de la hoja
+    """
+    max_filas, sidecars = max_filas or {}, sidecars or {}
+    t0 = time.perf_counter()
+
+    for nombre, ruta_parquet in sidecars.items():
+        hojas[nombre].to_parquet(ruta_parquet, index=hojas[nombre].index.names != [None])
+        print(f"    ✓ Sidecar {nombre}: {ruta_parquet} ({os.path.getsize(ruta_parquet) / 1024:,.0f} KB)")
+
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    libro = xlsxwriter.Workbook(ruta, {'constant_memory': True, 'strings_to_urls': False})
+    formatos = {clave: libro.add_format(f) for clave, f in FORMATOS.items()}
+    formatos['cabecera'] = libro.add_format(FORMATO_CABECERA)
+
+    for nombre, df in hojas.items():
+        nota = f"Datos completos en {os.path.basename(sidecars[nombre])}" if nombre in sidecars else None
+        escritas, total = escribir_hoja(libro, nombre, df, formatos, max_filas.get(nombre), nota)
+        print(f"    ✓ Hoja {nombre}: {escritas:,} filas" + (f" (de {total:,})" if escritas < total else ""))
+
+    libro.close()
+    print(f"    ✓ Excel escrito en {time.perf_counter() - t0:.2f} s "
+          f"({os.path.getsize(ruta) / (1024 * 1024):.1f} MB)")
+    return ruta
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+LOCALIZADOR_SITIOS.PY - Ubicación del Sitio por Mediana Ponderada de Demanda
+================================================================================
+Sustituye el centro "media de LATITUD/LONGITUD" de cada cluster (que en
+clusters alargados de costa puede caer en el mar o en un descampado) por la
+SECCIÓN MIEMBRO que minimiza la distancia ponderada por Poblacion_Target_Real:
+
+    sitio_k = argmin_{i en cluster k}  Σ_j  w_j · d(i, j)
+
+Algoritmo (vectorizado sobre TODOS los clusters a la vez):
+1. Mediana geométrica continua por Weiszfeld (bincount por cluster, O(N)/iter)
+2. Las K secciones miembro más cercanas a esa mediana son candidatas
+3. Evaluación exacta del coste de cada candidata -> la mejor es el sitio
+4. Resumen de captación con KD-tree: target y secciones a radio R del sitio
+
+Coste total O(K·N) + KD-tree: miles de clusters en < 1 s, apto para el
+bucle de expansion_1000_residencias.py.
+================================================================================
+"""
+
+import os
+import time
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from geodesia import coords_a_xyz
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+ARCHIVO_INPUT_GEO = "../datos/ranking_fase6_geo_ready.csv"
+ARCHIVO_MATRIZ_P = "../datos/matriz_P_nacional_filtrada.parquet"
+ARCHIVO_PUNTOS_TAGGED = "../datos/ranking_fase8_puntos_con_cluster.csv"
+OUTPUT_SITIOS = "../datos/sitios_clusters.csv"
+
+COLS_TARGET = ['M_80-84', 'M_85-89', 'M_90-94', 'M_95-99', 'M_100 y más']
+RADIO_CAPTACION_KM = 1.5    # Igual que el radio de búsqueda de competencia
+K_CANDIDATOS = 8            # Secciones evaluadas exactamente por cluster
+MAX_ITER_WEISZFELD = 50
+TOL_WEISZFELD_KM = 0.001    # 1 m
+
+# ==============================================================================
+# FUNCIONES
+# ==============================================================================
+
+def _suma_por_grupo(codes, valores, n_grupos):
+    return np.bincount(codes, weights=valores, minlength=n_grupos)
+
+
+def localizar_sitios(df_miembros, df_todas=None, col_cluster='Cluster_ID',
+                     col_peso='Poblacion_Target_Real', radio_km=RADIO_CAPTACION_KM,
+                     k_candidatos=K_CANDIDATOS):
+    """
+    Calcula el sitio óptimo de cada cluster.
+
+    df_miembros: secciones asignadas a cluster (LATITUD, LONGITUD, col_cluster, col_peso)
+    df_todas:    universo de secciones para el resumen de captación (opcional)
+
+    Retorna DataFrame indexado por col_cluster con LAT_Sitio, LON_Sitio,
+    Seccion_Sitio, Dist_Media_Ponderada_km, Dist_Max_km y, si hay df_todas,
+    Target_Captacion / Secciones_Captacion en radio_km alrededor del sitio.
+    """
+    codes, clusters = pd.factorize(df_miembros[col_cluster], sort=True)
+    n_grupos = len(clusters)
+    lat = df_miembros['LATITUD'].to_numpy(dtype=float)
+    lon = df_miembros['LONGITUD'].to_numpy(dtype=float)
+    xyz = coords_a_xyz(lat, lon)
+
+    # Pesos: si un cluster no tiene target (todo 0/NaN) usamos pesos uniformes
+    w = np.clip(df_miembros[col_peso].fillna(0).to_numpy(dtype=float), 0, None)
+    total = _suma_por_grupo(codes, w, n_grupos)
+    w = np.where(total[codes] > 0, w, 1.0)
+    total = _suma_por_grupo(codes, w, n_grupos)
+
+    # 1. WEISZFELD (arranca en la media ponderada)
+    mediana = np.column_stack([_suma_por_grupo(codes, w * xyz[:, k], n_grupos)
+                               for k in range(3)]) / total[:, None]
+    for _ in range(MAX_ITER_WEISZFELD):
+        d = np.linalg.norm(xyz - mediana[codes], axis=1)
+        inv = w / np.maximum(d, 1e-6)
+        den = _suma_por_grupo(codes, inv, n_grupos)
+        nueva = np.column_stack([_suma_por_grupo(codes, inv * xyz[:, k], n_grupos)
+                                 for k in range(3)]) / den[:, None]
+        desplazamiento = np.linalg.norm(nueva - mediana, axis=1).max()
+        mediana = nueva
+        if desplazamiento < TOL_WEISZFELD_KM:
+            break
+
+    # 2. CANDIDATAS: las K secciones miembro más cercanas a la mediana
+    d = np.linalg.norm(xyz - mediana[codes], axis=1)
+    orden = np.lexsort((d, codes))
+    codes_ord = codes[orden]
+    inicio = np.searchsorted(codes_ord, np.arange(n_grupos))
+    rango = np.arange(len(orden)) - inicio[codes_ord]
+    sel = rango < k_candidatos
+    candidatas = np.full((n_grupos, k_candidatos), -1)
+    candidatas[codes_ord[sel], rango[sel]] = orden[sel]
+
+    # 3. COSTE EXACTO de cada candidata: Σ w_j · d(candidata, j)
+    costes = np.full((n_grupos, k_candidatos), np.inf)
+    for s in range(k_candidatos):
+        cand = candidatas[:, s]
+        validos = cand >= 0
+        cand_miembro = cand[codes]
+        ok = cand_miembro >= 0
+        dist = np.zeros(len(codes))
+        dist[ok] = np.linalg.norm(xyz[ok] - xyz[cand_miembro[ok]], axis=1)
+        coste = _suma_por_grupo(codes, w * dist, n_grupos)
+        costes[validos, s] = coste[validos]
+
+    mejor = np.argmin(costes, axis=1)
+    sitio = candidatas[np.arange(n_grupos), mejor]
+    xyz_sitio = xyz[sitio]
+
+    d_sitio = np.linalg.norm(xyz - xyz_sitio[codes], axis=1)
+    resultado = pd.DataFrame({
+        'LAT_Sitio': lat[sitio],
+        'LON_Sitio': lon[sitio],
+        'Dist_Media_Ponderada_km': costes[np.arange(n_grupos), mejor] / total,
+        'Dist_Max_km': pd.Series(d_sitio).groupby(codes).max().to_numpy(),
+    }, index=pd.Index(clusters, name=col_cluster))
+    if 'Seccion' in df_miembros.columns:
+        resultado['Seccion_Sitio'] = df_miembros['Seccion'].to_numpy()[sitio]
+
+    # 4. RESUMEN DE CAPTACIÓN (KD-tree sobre todas las secciones)
+    if df_todas is not None:
+        xyz_todas = coords_a_xyz(df_todas['LATITUD'].to_numpy(dtype=float),
+                                 df_todas['LONGITUD'].to_numpy(dtype=float))
+        w_todas = df_todas[col_peso].fillna(0).to_numpy(dtype=float)
+        pares = cKDTree(xyz_sitio).sparse_distance_matrix(
+            cKDTree(xyz_todas), radio_km, output_type='ndarray')
+        resultado['Target_Captacion'] = _suma_por_grupo(pares['i'], w_todas[pares['j']], n_grupos)
+        resultado['Secciones_Captacion'] = np.bincount(pares['i'], minlength=n_grupos)
+
+    return resultado
+
+
+# ==============================================================================
+# EJECUCIÓN
+# ==============================================================================
+
+def ejecutar_localizador():
+    print("=" * 60)
+    print("   LOCALIZADOR DE SITIOS (MEDIANA PONDERADA)")
+    print("=" * 60)
+
+    if not os.path.exists(ARCHIVO_PUNTOS_TAGGED) or not os.path.exists(ARCHIVO_INPUT_GEO):
+        print("❌ Faltan archivos previos (fase 6 / fase 8).")
+        return
+
+    print("\n>>> Cargando secciones...")
+    df = pd.read_csv(ARCHIVO_INPUT_GEO, sep=';')
+    if os.path.exists(ARCHIVO_MATRIZ_P):
+        df_matriz = pd.read_parquet(ARCHIVO_MATRIZ_P)
+        df_matriz['Pct_Target'] = df_matriz[COLS_TARGET].sum(axis=1)
+        df = pd.merge(df, df_matriz[['Pct_Target']], left_on='Seccion', right_index=True, how='left')
+        df['Poblacion_Target_Real'] = df['Poblacion_Total'] * df['Pct_Target'].fillna(0)
+    else:
+        df['Poblacion_Target_Real'] = df['Poblacion_Total'] * 0.06
+    df = df.dropna(subset=['LATITUD', 'LONGITUD'])
+
+    df_puntos = pd.read_csv(ARCHIVO_PUNTOS_TAGGED, sep=';')
+    df_puntos = df_puntos[df_puntos['Es_Viable'] == True]
+    print(f"    ✓ {len(df):,} secciones | {df_puntos['Cluster_ID'].nunique()} clusters viables")
+
+    print("\n>>> Localizando sitios...")
+    t0 = time.perf_counter()
+    sitios = localizar_sitios(df_puntos, df_todas=df)
+    print(f"    ✓ {len(sitios)} sitios en {time.perf_counter() - t0:.3f} s")
+
+    # Desplazamiento respecto al centro antiguo (media lat/lon)
+    medias = df_puntos.groupby('Cluster_ID')[['LATITUD', 'LONGITUD']].mean()
+    desplaz = np.linalg.norm(coords_a_xyz(medias['LATITUD'], medias['LONGITUD']) -
+                             coords_a_xyz(sitios['LAT_Sitio'], sitios['LON_Sitio']), axis=1)
+    sitios['Desplazamiento_vs_Media_km'] = desplaz
+    print(f"    Desplazamiento medio vs centroide lat/lon: {desplaz.mean():.2f} km "
+          f"(máx {desplaz.max():.2f} km)")
+
+    sitios.to_csv(OUTPUT_SITIOS, sep=';')
+    print(f"\n✅ SITIOS GUARDADOS: {OUTPUT_SITIOS}")
+
+
+if __name__ == "__main__":
+    ejecutar_localizador()
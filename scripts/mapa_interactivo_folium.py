@@ -9,6 +9,25 @@ MAPA INTERACTIVO L-SOMA - CON POLÍGONOS DE SECCIONES CENSALES
 2. Masa Crítica Prime - IDs del informe, filtrado Es_Viable
 3. Frontera Rentabilidad - IDs nuevos (secciones_frontera_competencia)
 4. Competencia - Mismos IDs de Frontera, coloreados por Tipo_Oceano
+
+CAPAS_DIFERIDAS = True: cada capa se guarda como .topojson.gz junto al HTML y
+se descarga al activarla (capas_mapa.py). Servir /reports con un servidor
+estático: cd ../reports && python -m http.server
+
+CAPAS_TOPOJSON = True: arcos compartidos + coordenadas cuantizadas
+(topologia.py). Se parte de la geometría completa y se simplifican los arcos,
+de modo que los vecinos siguen encajando.
+
+MULTIESCALA = True: con el GeoParquet, cada capa diferida se escribe una vez
+por nivel de detalle de cache_secciones.RANGOS_ZOOM y el navegador carga el
+del zoom actual. Desde ZOOM_TROZOS los ficheros van por provincia y solo se
+descargan los que caen en la vista.
+
+Reconstrucción incremental (capas diferidas): cada capa guarda en
+capas/manifiesto.json la huella de sus entradas (contenido de los CSV, de
+la geometría, de este script y de los módulos que la codifican) y de sus
+parámetros. Si no cambia, se reutilizan sus ficheros sin cargar datos; solo
+se rehacen las capas invalidadas y se vuelve a montar el HTML.
 ================================================================================
 """
 
@@ -17,6 +36,12 @@ import geopandas as gpd
 import folium
 from folium import plugins
 import os
+import json
+import hashlib
+import inspect
+from cache_secciones import GEOPARQUET, NIVEL_DEFECTO, RANGOS_ZOOM, TOLERANCIAS, cargar_secciones, cusec_a_int
+from capas_mapa import CapaDiferida, escribir_capa, topojson_estilado
+from topologia import CUANTIZACION, bytes_json, cuantizacion_tolerancia
 
 # ==============================================================================
 # CONFIGURACIÓN
@@ -32,6 +57,24 @@ FRONTERA_COMPETENCIA = "../datos/secciones_frontera_competencia.csv"
 
 OUTPUT_FILE = "../reports/mapa_interactivo_lsoma.html"
 
+# Capas externas (.geojson.gz) cargadas al activarlas; False = todo incrustado en el HTML
+CAPAS_DIFERIDAS = True
+DIR_CAPAS = "capas"  # Relativo al HTML
+
+# TopoJSON en lugar de GeoJSON (tolerancia en grados, la de simplificar_geometria)
+CAPAS_TOPOJSON = True
+TOLERANCIA_ARCOS = 0.001
+
+# Un juego de ficheros por nivel de detalle (requiere CAPAS_DIFERIDAS y GeoParquet)
+MULTIESCALA = True
+ZOOM_TROZOS = 11  # Niveles a partir de este zoom: un fichero por provincia
+
+# Huellas de las capas ya escritas (relativo al HTML) y código que las genera:
+# este script entero (merges datos_*, carga, simplificación y escritura de
+# niveles) y los módulos de los que tira
+MANIFIESTO = f"{DIR_CAPAS}/manifiesto.json"
+FUENTES_CODIGO = ["mapa_interactivo_folium.py", "cache_secciones.py", "capas_mapa.py", "topologia.py"]
+
 # Colores
 COLORES_OCEANO = {
     "Blue Ocean": "#3498db",
@@ -51,8 +94,20 @@ COLORES_CLUSTER = [
 # ==============================================================================
 
 def cargar_y_preparar_shapefile():
-    """Carga el shapefile y prepara la columna CUSEC"""
-    print(">>> Cargando shapefile...")
+    """Carga las secciones (GeoParquet si existe, si no el shapefile) con CUSEC entero.
+    Retorna (gdf, ya_simplificado)."""
+    if os.path.exists(GEOPARQUET):
+        print(">>> Cargando GeoParquet de secciones...")
+        if CAPAS_TOPOJSON and not (CAPAS_DIFERIDAS and MULTIESCALA):
+            # Geometría completa: la simplificación se hace sobre los arcos compartidos
+            gdf = cargar_secciones(columnas=[], nivel='geometry')
+            print(f"    ✓ {len(gdf)} secciones (geometría completa, EPSG:4326)")
+            return gdf, True
+        gdf = cargar_secciones(columnas=[], nivel=NIVEL_DEFECTO)
+        print(f"    ✓ {len(gdf)} secciones (pre-simplificadas, EPSG:4326)")
+        return gdf, True
+
+    print(">>> Cargando shapefile (ejecuta cache_secciones.py para acelerar)...")
     gdf = gpd.read_file(SHAPEFILE)
     
     if 'CUSEC' not in gdf.columns:
@@ -60,34 +115,193 @@ def cargar_y_preparar_shapefile():
                         gdf['CMUN'].astype(str) + 
                         gdf['CDIS'].astype(str) + 
                         gdf['CSEC'].astype(str))
-    gdf['CUSEC'] = gdf['CUSEC'].astype(str)
+    gdf['CUSEC'] = cusec_a_int(gdf['CUSEC'])
     print(f"    ✓ {len(gdf)} secciones en shapefile")
-    return gdf
+    return gdf, False
 
 def simplificar_geometria(gdf, tolerance=0.001):
     """Simplifica geometrías para reducir peso del HTML"""
-    print(">>> Simplificando geometrías...")
     gdf = gdf.to_crs(epsg=4326)
+    if CAPAS_TOPOJSON:
+        return gdf  # codificar_topojson simplifica los arcos
+    print(">>> Simplificando geometrías...")
     gdf['geometry'] = gdf['geometry'].simplify(tolerance=tolerance, preserve_topology=True)
     print(f"    ✓ Geometrías simplificadas (tolerance={tolerance})")
     return gdf
 
-def crear_capa_geojson(gdf, layer_name, style_func, tooltip_fields, tooltip_aliases, show=False):
-    """Crea una capa GeoJSON para Folium"""
+def kb_geojson_equivalente(gdf, campos):
+    """KB del GeoJSON que se incrustaba antes (simplificado por polígono) para medir el ahorro"""
+    simples = gdf[campos].assign(geometry=gdf.geometry.simplify(TOLERANCIA_ARCOS, preserve_topology=True))
+    return bytes_json(gpd.GeoDataFrame(simples, crs=gdf.crs).__geo_interface__) / 1024
+
+def geometrias_nivel(nivel):
+    """Geometrías de un nivel del GeoParquet indexadas por CUSEC (se leen una vez por nivel)"""
+    if nivel not in geometrias_niveles:
+        gdf = cargar_secciones(columnas=[], nivel=nivel)
+        geometrias_niveles[nivel] = gdf.set_index('CUSEC').geometry
+    return geometrias_niveles[nivel]
+
+def escribir_niveles(gdf, slug, style_func, tooltip_fields):
+    """Escribe la capa en cada nivel de RANGOS_ZOOM y devuelve los niveles para CapaDiferida"""
+    atributos = pd.DataFrame(gdf.drop(columns=gdf.geometry.name))
+    niveles = []
+    for nivel, zoom_min, zoom_max in RANGOS_ZOOM:
+        capa = gpd.GeoDataFrame(
+            atributos, crs='EPSG:4326',
+            geometry=geometrias_nivel(nivel).reindex(atributos['CUSEC']).values
+        )
+        if zoom_min >= ZOOM_TROZOS:
+            grupos = [(f"{nivel}_{int(cpro):02d}", parte) for cpro, parte in capa.groupby(capa['CUSEC'] // 10**8)]
+        else:
+            grupos = [(nivel, capa)]
+
+        trozos, peso_nivel, peso_json_nivel = [], 0, 0
+        for nombre, parte in grupos:
+            url = f"{DIR_CAPAS}/{slug}/{nombre}.topojson.gz"
+            ruta = os.path.join(os.path.dirname(OUTPUT_FILE), url)
+            # Rejilla de medio píxel del nivel (la geometría completa, CUANTIZACION)
+            cuantizacion = (cuantizacion_tolerancia(parte.total_bounds, TOLERANCIAS[nivel])
+                            if nivel in TOLERANCIAS else CUANTIZACION)
+            peso, peso_json = escribir_capa(parte, ruta, style_func, tooltip_fields, cuantizacion=cuantizacion)
+            tamanos_capas[url] = peso
+            peso_nivel += peso
+            peso_json_nivel += peso_json
+            bbox = [round(float(v), 5) for v in parte.total_bounds] if len(grupos) > 1 else None
+            trozos.append({'url': url, 'bbox': bbox})
+        niveles.append({'zmin': zoom_min, 'zmax': zoom_max, 'trozos': trozos})
+        geojson = bytes_json(capa.loc[~capa.geometry.is_empty, tooltip_fields + ['geometry']].__geo_interface__)
+        print(f"    ✓ {slug}/{nivel} (zoom {zoom_min}-{zoom_max}): {len(trozos)} fichero(s), "
+              f"GeoJSON {geojson / 1024:,.0f} KB -> TopoJSON {peso_json_nivel / 1024:,.0f} KB "
+              f"({geojson / peso_json_nivel:.1f}x), {peso_nivel / 1024:,.0f} KB gzip")
+    return niveles
+
+def crear_capa_geojson(gdf, layer_name, style_func, tooltip_fields, tooltip_aliases, show=False, slug=None):
+    """Crea una capa para Folium (TopoJSON si CAPAS_TOPOJSON; externa y diferida si CAPAS_DIFERIDAS)"""
+    tolerancia = TOLERANCIA_ARCOS if CAPAS_TOPOJSON else None
+    if CAPAS_DIFERIDAS and slug and MULTIESCALA and os.path.exists(GEOPARQUET):
+        niveles = escribir_niveles(gdf, slug, style_func, tooltip_fields)
+        return CapaDiferida(niveles, layer_name, tooltip_fields, tooltip_aliases, show=show)
+
+    if CAPAS_DIFERIDAS and slug:
+        url = f"{DIR_CAPAS}/{slug}.{'topojson' if CAPAS_TOPOJSON else 'geojson'}.gz"
+        ruta = os.path.join(os.path.dirname(OUTPUT_FILE), url)
+        peso, peso_json = escribir_capa(gdf, ruta, style_func, tooltip_fields, tolerancia=tolerancia)
+        tamanos_capas[url] = peso
+        print(f"    ✓ {url} ({peso_json / 1024:,.0f} KB JSON, {peso / 1024:,.0f} KB gzip, "
+              f"se descarga al activar la capa)")
+        if CAPAS_TOPOJSON:
+            geojson_kb = kb_geojson_equivalente(gdf, tooltip_fields)
+            print(f"    ✓ Carga útil: GeoJSON {geojson_kb:,.0f} KB -> TopoJSON {peso_json / 1024:,.0f} KB "
+                  f"({geojson_kb * 1024 / peso_json:.1f}x)")
+        return CapaDiferida(url, layer_name, tooltip_fields, tooltip_aliases, show=show)
+
     layer = folium.FeatureGroup(name=layer_name, show=show)
-    
+    tooltip = folium.GeoJsonTooltip(fields=tooltip_fields, aliases=tooltip_aliases, localize=True)
+
+    if CAPAS_TOPOJSON:
+        topo = topojson_estilado(gdf, style_func, tooltip_fields, tolerancia=tolerancia)
+        geojson_kb, topo_kb = kb_geojson_equivalente(gdf, tooltip_fields), bytes_json(topo) / 1024
+        print(f"    ✓ Carga útil: GeoJSON {geojson_kb:,.0f} KB -> TopoJSON {topo_kb:,.0f} KB "
+              f"({geojson_kb / topo_kb:.1f}x)")
+        folium.TopoJson(
+            topo, 'objects.capa',
+            style_function=lambda f: topo['estilos'][f['properties']['_e']],
+            tooltip=tooltip
+        ).add_to(layer)
+        return layer
+
     folium.GeoJson(
         gdf.__geo_interface__,
         style_function=style_func,
-        tooltip=folium.GeoJsonTooltip(
-            fields=tooltip_fields,
-            aliases=tooltip_aliases,
-            localize=True
-        )
+        tooltip=tooltip
     ).add_to(layer)
     
     return layer
 
+def huella_fichero(ruta):
+    """SHA-256 del contenido (se calcula una vez por ejecución); 'ausente' si no existe"""
+    if ruta not in huellas_ficheros:
+        if not os.path.exists(ruta):
+            huellas_ficheros[ruta] = 'ausente'
+        else:
+            h = hashlib.sha256()
+            with open(ruta, 'rb') as f:
+                for bloque in iter(lambda: f.read(1 << 20), b''):
+                    h.update(bloque)
+            huellas_ficheros[ruta] = h.hexdigest()
+    return huellas_ficheros[ruta]
+
+def codigo_funcion(funcion):
+    """Código fuente de una función o lambda (para las que no tienen, p. ej. len, su nombre)"""
+    try:
+        return inspect.getsource(funcion)
+    except (OSError, TypeError):
+        return repr(funcion)
+
+def huella_capa(slug, entradas, preparar, style_func, tooltip_fields, tooltip_aliases, resumir=len):
+    """Huella de todo lo que determina los ficheros de una capa (filtro de preparar() incluido)"""
+    geometria = [GEOPARQUET] if os.path.exists(GEOPARQUET) else [SHAPEFILE, SHAPEFILE[:-4] + '.dbf']
+    parametros = {
+        'slug': slug, 'campos': tooltip_fields, 'alias': tooltip_aliases,
+        'estilo': codigo_funcion(style_func),
+        'preparar': codigo_funcion(preparar),
+        'resumen': codigo_funcion(resumir),
+        'ficheros': {r: huella_fichero(r) for r in entradas + geometria + FUENTES_CODIGO},
+        'config': [CAPAS_TOPOJSON, TOLERANCIA_ARCOS, MULTIESCALA, ZOOM_TROZOS, RANGOS_ZOOM,
+                   COLORES_CLUSTER, COLORES_OCEANO],
+    }
+    return hashlib.sha256(json.dumps(parametros, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def leer_manifiesto():
+    ruta = os.path.join(os.path.dirname(OUTPUT_FILE), MANIFIESTO)
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+def guardar_manifiesto():
+    ruta = os.path.join(os.path.dirname(OUTPUT_FILE), MANIFIESTO)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=1)
+
+def capa_incremental(slug, entradas, preparar, layer_name, style_func, tooltip_fields, tooltip_aliases,
+                     show=False, resumir=len):
+    """
+    crear_capa_geojson con caché por capa (solo CAPAS_DIFERIDAS). preparar() devuelve
+    el GeoDataFrame y solo se llama si la huella cambió o faltan ficheros.
+    Retorna (capa, resumir(gdf)); el resumen se guarda para las ejecuciones sin cambios.
+    """
+    huella = huella_capa(slug, entradas, preparar, style_func, tooltip_fields, tooltip_aliases, resumir)
+    previa = manifiesto.get(slug)
+    directorio = os.path.dirname(OUTPUT_FILE)
+
+    if CAPAS_DIFERIDAS and previa:
+        ficheros = [os.path.join(directorio, url) for url in previa['tamanos']]
+        if previa['huella'] == huella and all(os.path.exists(r) for r in ficheros):
+            tamanos_capas.update(previa['tamanos'])
+            print(f"    ✓ Sin cambios: {len(ficheros)} fichero(s) reutilizados (huella {huella})")
+            capa = CapaDiferida(previa['niveles'], layer_name, tooltip_fields, tooltip_aliases, show=show)
+            return capa, previa['resumen']
+        # Fuera los ficheros de la versión anterior (pueden cambiar niveles o trozos)
+        for ruta in ficheros:
+            if os.path.exists(ruta):
+                os.remove(ruta)
+
+    gdf = preparar()
+    antes = set(tamanos_capas)
+    capa = crear_capa_geojson(gdf, layer_name, style_func, tooltip_fields, tooltip_aliases,
+                              show=show, slug=slug)
+    resumen = resumir(gdf)
+    if CAPAS_DIFERIDAS:
+        manifiesto[slug] = {
+            'huella': huella,
+            'niveles': capa.niveles,
+            'tamanos': {url: tamanos_capas[url] for url in tamanos_capas if url not in antes},
+            'resumen': resumen,
+        }
+    return capa, resumen
+
 # ==============================================================================
 # MAIN
 # ==============================================================================
@@ -96,49 +310,61 @@ print("=" * 60)
 print("   MAPA INTERACTIVO L-SOMA (POLÍGONOS)")
 print("=" * 60)
 
-# 1. Cargar shapefile
-gdf_base = cargar_y_preparar_shapefile()
-
-# 2. Cargar datos Original/Prime
-print("\n>>> Cargando datos Original/Prime...")
-df_original = pd.read_csv(RANKING_FASE8, sep=';')
-df_original['CUSEC_LIMPIO'] = df_original['CUSEC_LIMPIO'].astype(str)
-print(f"    ✓ {len(df_original)} secciones en ranking_fase8")
-
-# 3. Cargar datos Frontera/Competencia
-print(">>> Cargando datos Frontera/Competencia...")
-if os.path.exists(FRONTERA_COMPETENCIA):
-    df_frontera = pd.read_csv(FRONTERA_COMPETENCIA, sep=';')
-    df_frontera['CUSEC'] = df_frontera['CUSEC'].astype(str)
-    print(f"    ✓ {len(df_frontera)} secciones en frontera/competencia")
-else:
+tamanos_capas = {}
+geometrias_niveles = {}
+cargados = {}
+huellas_ficheros = {}
+manifiesto = leer_manifiesto()
+
+def base_secciones():
+    """1. Secciones con geometría (una vez, y solo si alguna capa hay que rehacerla)"""
+    if 'base' not in cargados:
+        cargados['base'] = cargar_y_preparar_shapefile()
+    return cargados['base']
+
+def datos_original():
+    """2. Merge Original/Prime (IDs del informe)"""
+    if 'original' not in cargados:
+        print("\n>>> Cargando datos Original/Prime...")
+        df_original = pd.read_csv(RANKING_FASE8, sep=';')
+        df_original['CUSEC_LIMPIO'] = cusec_a_int(df_original['CUSEC_LIMPIO'])
+        print(f"    ✓ {len(df_original)} secciones en ranking_fase8")
+
+        gdf_base, ya_simplificado = base_secciones()
+        gdf_original = gdf_base.merge(
+            df_original[['CUSEC_LIMPIO', 'Cluster_ID', 'Renta_Hogar', 'Score_Global', 
+                         'Capacidad_Teorica_Camas', 'Es_Viable', 'Seccion']],
+            left_on='CUSEC', right_on='CUSEC_LIMPIO', how='inner'
+        )
+        if not ya_simplificado:
+            gdf_original = simplificar_geometria(gdf_original)
+        print(f"    ✓ Original: {len(gdf_original)} polígonos")
+        cargados['original'] = gdf_original
+    return cargados['original']
+
+def datos_frontera():
+    """3. Merge Frontera/Competencia (IDs nuevos)"""
+    if 'frontera' not in cargados:
+        print("\n>>> Cargando datos Frontera/Competencia...")
+        df_frontera = pd.read_csv(FRONTERA_COMPETENCIA, sep=';')
+        df_frontera['CUSEC'] = cusec_a_int(df_frontera['CUSEC'])
+        print(f"    ✓ {len(df_frontera)} secciones en frontera/competencia")
+
+        gdf_base, ya_simplificado = base_secciones()
+        gdf_frontera = gdf_base.merge(
+            df_frontera[['CUSEC', 'Cluster_ID', 'Renta_Hogar', 'Score_Global',
+                         'Camas_Potenciales', 'Es_Viable', 'Tipo_Oceano', 'Indice_Saturacion']],
+            on='CUSEC', how='inner'
+        )
+        if not ya_simplificado:
+            gdf_frontera = simplificar_geometria(gdf_frontera)
+        print(f"    ✓ Frontera: {len(gdf_frontera)} polígonos")
+        cargados['frontera'] = gdf_frontera
+    return cargados['frontera']
+
+hay_frontera = os.path.exists(FRONTERA_COMPETENCIA)
+if not hay_frontera:
     print(f"    ✗ No existe {FRONTERA_COMPETENCIA}. Ejecuta primero unificar_datos_mapa.py")
-    df_frontera = None
-
-# ==============================================================================
-# MERGE CON SHAPEFILE
-# ==============================================================================
-
-print("\n>>> Preparando geometrías...")
-
-# Merge para Original/Prime
-gdf_original = gdf_base.merge(
-    df_original[['CUSEC_LIMPIO', 'Cluster_ID', 'Renta_Hogar', 'Score_Global', 
-                 'Capacidad_Teorica_Camas', 'Es_Viable', 'Seccion']],
-    left_on='CUSEC', right_on='CUSEC_LIMPIO', how='inner'
-)
-gdf_original = simplificar_geometria(gdf_original)
-print(f"    ✓ Original: {len(gdf_original)} polígonos")
-
-# Merge para Frontera/Competencia
-if df_frontera is not None:
-    gdf_frontera = gdf_base.merge(
-        df_frontera[['CUSEC', 'Cluster_ID', 'Renta_Hogar', 'Score_Global',
-                     'Camas_Potenciales', 'Es_Viable', 'Tipo_Oceano', 'Indice_Saturacion']],
-        on='CUSEC', how='inner'
-    )
-    gdf_frontera = simplificar_geometria(gdf_frontera)
-    print(f"    ✓ Frontera: {len(gdf_frontera)} polígonos")
 
 # ==============================================================================
 # CREAR MAPA
@@ -167,8 +393,8 @@ def style_original(feature):
         'fillOpacity': 0.6
     }
 
-layer1 = crear_capa_geojson(
-    gdf_original,
+layer1, _ = capa_incremental(
+    "dbscan_original", [RANKING_FASE8], datos_original,
     "🔵 DBSCAN Original (IDs informe)",
     style_original,
     ['Seccion', 'Cluster_ID', 'Renta_Hogar'],
@@ -184,8 +410,6 @@ print(f"    ✓ Añadida")
 
 print(">>> Generando capa 2: Masa Crítica Prime...")
 
-gdf_prime = gdf_original[gdf_original['Es_Viable'] == True].copy()
-
 def style_prime(feature):
     cid = feature['properties'].get('Cluster_ID', 0)
     return {
@@ -195,8 +419,9 @@ def style_prime(feature):
         'fillOpacity': 0.7
     }
 
-layer2 = crear_capa_geojson(
-    gdf_prime,
+layer2, n_prime = capa_incremental(
+    "masa_critica_prime", [RANKING_FASE8],
+    lambda: datos_original()[datos_original()['Es_Viable'] == True].copy(),
     "🟢 Masa Crítica Prime (viables)",
     style_prime,
     ['Seccion', 'Cluster_ID', 'Renta_Hogar', 'Capacidad_Teorica_Camas'],
@@ -204,17 +429,15 @@ layer2 = crear_capa_geojson(
     show=False
 )
 layer2.add_to(mapa)
-print(f"    ✓ Añadida ({len(gdf_prime)} polígonos)")
+print(f"    ✓ Añadida ({n_prime} polígonos)")
 
 # ==============================================================================
 # CAPA 3: Frontera de Rentabilidad
 # ==============================================================================
 
-if df_frontera is not None:
+if hay_frontera:
     print(">>> Generando capa 3: Frontera de Rentabilidad...")
     
-    gdf_frontera_viable = gdf_frontera[gdf_frontera['Es_Viable'] == True].copy()
-    
     def style_frontera(feature):
         cid = feature['properties'].get('Cluster_ID', 0)
         return {
@@ -224,8 +447,9 @@ if df_frontera is not None:
             'fillOpacity': 0.6
         }
     
-    layer3 = crear_capa_geojson(
-        gdf_frontera_viable,
+    layer3, n_frontera = capa_incremental(
+        "frontera_rentabilidad", [FRONTERA_COMPETENCIA],
+        lambda: datos_frontera()[datos_frontera()['Es_Viable'] == True].copy(),
         "🟠 Frontera Rentabilidad (expandido)",
         style_frontera,
         ['Cluster_ID', 'Renta_Hogar', 'Camas_Potenciales'],
@@ -233,13 +457,13 @@ if df_frontera is not None:
         show=True
     )
     layer3.add_to(mapa)
-    print(f"    ✓ Añadida ({len(gdf_frontera_viable)} polígonos)")
+    print(f"    ✓ Añadida ({n_frontera} polígonos)")
 
 # ==============================================================================
 # CAPA 4: Competencia (Blue Ocean / Batalla / Saturado)
 # ==============================================================================
 
-if df_frontera is not None:
+if hay_frontera:
     print(">>> Generando capa 4: Competencia...")
     
     def style_competencia(feature):
@@ -251,18 +475,18 @@ if df_frontera is not None:
             'fillOpacity': 0.7
         }
     
-    layer4 = crear_capa_geojson(
-        gdf_frontera,
+    layer4, counts = capa_incremental(
+        "competencia", [FRONTERA_COMPETENCIA], datos_frontera,
         "🎯 Competencia (Blue/Batalla/Saturado)",
         style_competencia,
         ['Cluster_ID', 'Tipo_Oceano', 'Indice_Saturacion', 'Camas_Potenciales'],
         ['Cluster:', 'Tipo:', 'I_sat:', 'Camas:'],
-        show=False
+        show=False,
+        # Contar por tipo
+        resumir=lambda gdf: {k: int(v) for k, v in gdf['Tipo_Oceano'].value_counts().items()}
     )
     layer4.add_to(mapa)
     
-    # Contar por tipo
-    counts = gdf_frontera['Tipo_Oceano'].value_counts()
     print(f"    ✓ Blue Ocean: {counts.get('Blue Ocean', 0)} secciones")
     print(f"    ✓ Batalla: {counts.get('Batalla', 0)} secciones")
     print(f"    ✓ Saturado: {counts.get('Saturado', 0)} secciones")
@@ -295,6 +519,8 @@ mapa.get_root().html.add_child(folium.Element(legend_html))
 
 print(f"\n>>> Guardando: {OUTPUT_FILE}")
 mapa.save(OUTPUT_FILE)
+if CAPAS_DIFERIDAS:
+    guardar_manifiesto()
 
 file_size = os.path.getsize(OUTPUT_FILE) / (1024 * 1024)
 
@@ -302,4 +528,8 @@ print("\n" + "=" * 60)
 print("✅ MAPA GENERADO EXITOSAMENTE")
 print(f"📂 {OUTPUT_FILE}")
 print(f"📦 Tamaño: {file_size:.1f} MB")
+if tamanos_capas:
+    print(f"🗂  Capas externas: {len(tamanos_capas)} ficheros, "
+          f"{sum(tamanos_capas.values()) / (1024 * 1024):.1f} MB en {DIR_CAPAS}/ (se descargan bajo demanda)")
+    print("   Servir con: cd ../reports && python -m http.server")
 print("=" * 60)
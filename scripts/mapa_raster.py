@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+MAPA_RASTER.PY - Heatmaps Nacionales Rasterizados (PNG Directo)
+================================================================================
+Los PNG estáticos pintaban cada polígono o punto con matplotlib a 300 dpi:
+lento y con mucha memoria para toda España. Aquí se rasteriza directamente:
+
+1. Marco: rejilla de ANCHO_PX en lon/lat con la relación de aspecto corregida
+   por cos(latitud). Canarias se dibuja en un recuadro al SO de la península
+2. Puntos (centroides): cada uno cae en una celda de celda_px píxeles y se
+   agrega con np.bincount (sum / mean) o np.maximum.at (max)
+3. Polígonos: se pintan con PIL en una imagen de índices (de mayor a menor
+   área, para que las secciones pequeñas queden encima)
+4. Colormap de matplotlib como tabla de 256 colores -> RGB -> PNG con PIL
+5. Opcional: contorno de provincias (disuelto una vez del GeoParquet y
+   guardado en PROVINCIAS), etiquetas, título y leyenda
+
+Uso:  python mapa_raster.py   (genera ../assets/matriz_p_heatmap.png)
+================================================================================
+"""
+
+import os
+import time
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from matplotlib import colormaps, font_manager
+from PIL import Image, ImageDraw, ImageFont
+from cache_secciones import GEOPARQUET, cargar_secciones, cusec_a_int
+from envolventes_clusters import union_cobertura
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+ARCHIVO_RESONANCIA = "../datos/ranking_fase3_resonancia.csv"
+OUTPUT_PNG = "../assets/matriz_p_heatmap.png"
+
+ANCHO_PX = 2400
+COLORMAP = 'YlOrRd'
+AGREGACIONES = ('sum', 'mean', 'max')
+PERCENTILES_ESCALA = (2, 98)     # vmin / vmax por defecto (robusto a extremos)
+MARGEN = 0.02                    # Fracción del bbox
+COMPRESION_PNG = 1               # zlib rápido: optimize=True triplicaba el tiempo total
+
+FONDO = (255, 255, 255)
+COLOR_PROVINCIAS = (110, 110, 110)
+COLOR_TEXTO = (20, 20, 20)
+
+# Contorno de provincias: disuelto desde el nivel más simplificado del GeoParquet
+PROVINCIAS = "../datos/provincias_contorno.parquet"
+NIVEL_PROVINCIAS = 'geom_s005'
+
+# Canarias (bbox lon/lat) se desplaza junto a la península
+CANARIAS = (-18.5, 27.4, -13.2, 29.6)
+DESPLAZAMIENTO_CANARIAS = (5.0, 7.0)
+
+Marco = namedtuple('Marco', 'x0 y0 x1 y1 ancho alto')
+
+# ==============================================================================
+# GEOMETRÍA -> PÍXELES
+# ==============================================================================
+
+def reubicar_canarias(lon, lat):
+    """Desplaza los puntos dentro de CANARIAS al recuadro junto a la península."""
+    lon, lat = np.array(lon, dtype=float), np.array(lat, dtype=float)
+    x0, y0, x1, y1 = CANARIAS
+    dentro = (lon >= x0) & (lon <= x1) & (lat >= y0) & (lat <= y1)
+    lon[dentro] += DESPLAZAMIENTO_CANARIAS[0]
+    lat[dentro] += DESPLAZAMIENTO_CANARIAS[1]
+    return lon, lat
+
+
+def reubicar_geometrias(geoms):
+    return shapely.transform(np.asarray(geoms),
+                             lambda c: np.column_stack(reubicar_canarias(c[:, 0], c[:, 1])))
+
+
+def crear_marco(x0, y0, x1, y1, ancho=ANCHO_PX):
+    """Marco con margen y alto según la relación de aspecto a la latitud media."""
+    mx, my = (x1 - x0) * MARGEN, (y1 - y0) * MARGEN
+    x0, y0, x1, y1 = x0 - mx, y0 - my, x1 + mx, y1 + my
+    alto = round(ancho * (y1 - y0) / ((x1 - x0) * np.cos(np.radians((y0 + y1) / 2))))
+    return Marco(x0, y0, x1, y1, ancho, max(alto, 1))
+
+
+def a_pixeles(marco, lon, lat):
+    """lon/lat -> (columna, fila) en coma flotante."""
+    col = (np.asarray(lon) - marco.x0) / (marco.x1 - marco.x0) * marco.ancho
+    fila = (marco.y1 - np.asarray(lat)) / (marco.y1 - marco.y0) * marco.alto
+    return col, fila
+
+
+# ==============================================================================
+# RASTERIZADO
+# ==============================================================================
+
+def rasterizar_puntos(marco, lon, lat, valores, agregacion='mean', celda_px=1):
+    """
+    Agrega los valores de los puntos en celdas de celda_px píxeles.
+    Retorna una rejilla (alto/celda × ancho/celda) con NaN en las celdas vacías.
+    """
+    if agregacion not in AGREGACIONES:
+        raise ValueError(f"agregacion debe ser una de {AGREGACIONES}")
+    valores = np.asarray(valores, dtype=float)
+    col, fila = a_pixeles(marco, lon, lat)
+    ancho, alto = -(-marco.ancho // celda_px), -(-marco.alto // celda_px)
+    col, fila = np.floor(col / celda_px).astype(np.int64), np.floor(fila / celda_px).astype(np.int64)
+
+    ok = (col >= 0) & (col < ancho) & (fila >= 0) & (fila < alto) & ~np.isnan(valores)
+    idx, valores = fila[ok] * ancho + col[ok], valores[ok]
+    cuenta = np.bincount(idx, minlength=ancho * alto)
+    if agregacion == 'max':
+        rejilla = np.full(ancho * alto, -np.inf)
+        np.maximum.at(rejilla, idx, valores)
+    else:
+        rejilla = np.bincount(idx, weights=valores, minlength=ancho * alto)
+        if agregacion == 'mean':
+            rejilla /= np.maximum(cuenta, 1)
+    rejilla[cuenta == 0] = np.nan
+    return rejilla.reshape(alto, ancho)
+
+
+def rasterizar_poligonos(marco, geoms, valores):
+    """
+    Valor del polígono que cubre cada píxel (NaN fuera). Se pintan de mayor a
+    menor área para que las secciones urbanas pequeñas no queden tapadas.
+    """
+    valores = np.asarray(valores, dtype=float)
+    partes, geom_de_parte = shapely.get_parts(np.asarray(geoms), return_index=True)
+    orden = np.argsort(-shapely.area(partes), kind='stable')
+    partes, geom_de_parte = partes[orden], geom_de_parte[orden]
+
+    coords, anillo = shapely.get_coordinates(shapely.get_exterior_ring(partes), return_index=True)
+    col, fila = a_pixeles(marco, coords[:, 0], coords[:, 1])
+    xy = np.column_stack([col, fila])
+    cortes = np.flatnonzero(np.diff(anillo)) + 1
+
+    indices = Image.new('I', (marco.ancho, marco.alto), -1)
+    lapiz = ImageDraw.Draw(indices)
+    for g, puntos in zip(geom_de_parte[anillo[np.r_[0, cortes]]], np.split(xy, cortes)):
+        lapiz.polygon(puntos.ravel().tolist(), fill=int(g))
+
+    ids = np.asarray(indices, dtype=np.int64)
+    return np.where(ids >= 0, valores[np.maximum(ids, 0)], np.nan)
+
+
+def colorear(rejilla, cmap=COLORMAP, vmin=None, vmax=None):
+    """Rejilla de valores -> array RGB uint8 (tabla de 256 colores); NaN = FONDO."""
+    vacio = np.isnan(rejilla)
+    if vmin is None or vmax is None:
+        p_min, p_max = np.nanpercentile(rejilla, PERCENTILES_ESCALA) if (~vacio).any() else (0, 1)
+        vmin = p_min if vmin is None else vmin
+        vmax = p_max if vmax is None else vmax
+    tabla = (colormaps[cmap](np.linspace(0, 1, 256))[:, :3] * 255).astype(np.uint8)
+    norm = np.clip((np.nan_to_num(rejilla, nan=vmin) - vmin) / ((vmax - vmin) or 1.0), 0, 1)
+    rgb = tabla[(norm * 255).astype(np.uint8)]
+    rgb[vacio] = FONDO
+    return rgb, (vmin, vmax)
+
+
+# ==============================================================================
+# CAPAS DE REFERENCIA
+# ==============================================================================
+
+def contornos_provincias(ruta=PROVINCIAS, nivel=NIVEL_PROVINCIAS):
+    """Un polígono por provincia (CPRO = CUSEC // 10**8), recalculado si cambia el GeoParquet."""
+    if os.path.exists(ruta) and os.path.getmtime(ruta) >= os.path.getmtime(GEOPARQUET):
+        return gpd.read_parquet(ruta)
+
+    secciones = cargar_secciones(columnas=[], nivel=nivel)
+    cpro = secciones['CUSEC'].to_numpy() // 10**8
+    orden = np.argsort(cpro, kind='stable')
+    ids, inicios = np.unique(cpro[orden], return_index=True)
+    geoms = [union_cobertura(g) for g in np.split(secciones.geometry.values[orden], inicios[1:])]
+    provincias = gpd.GeoDataFrame({'CPRO': ids}, geometry=geoms, crs='EPSG:4326')
+    provincias.to_parquet(ruta, index=False)
+    print(f"    ✓ Contorno de {len(provincias)} provincias guardado en {ruta}")
+    return provincias
+
+
+def _fuente(tamano):
+    """DejaVu Sans de matplotlib (la fuente por defecto de PIL no tiene tildes)."""
+    return ImageFont.truetype(font_manager.findfont('DejaVu Sans'), tamano)
+
+
+def dibujar_lineas(lapiz, marco, geoms, color, grosor=1):
+    """Contornos (todos los anillos) de un array de polígonos."""
+    lineas = shapely.get_parts(shapely.boundary(np.asarray(geoms)))
+    coords, linea = shapely.get_coordinates(lineas, return_index=True)
+    col, fila = a_pixeles(marco, coords[:, 0], coords[:, 1])
+    cortes = np.flatnonzero(np.diff(linea)) + 1
+    for puntos in np.split(np.column_stack([col, fila]), cortes):
+        lapiz.line(puntos.ravel().tolist(), fill=color, width=grosor)
+
+
+def dibujar_leyenda(lapiz, marco, cmap, vmin, vmax, texto=''):
+    """Barra de color con sus extremos en la esquina inferior derecha."""
+    ancho, alto = marco.ancho // 5, max(marco.ancho // 120, 8)
+    x, y = marco.ancho - ancho - marco.ancho // 40, marco.alto - 4 * alto
+    tabla = (colormaps[cmap](np.linspace(0, 1, ancho))[:, :3] * 255).astype(int)
+    for i, (r, g, b) in enumerate(tabla):
+        lapiz.line([(x + i, y), (x + i, y + alto)], fill=(r, g, b))
+    lapiz.rectangle([x, y, x + ancho, y + alto], outline=COLOR_PROVINCIAS)
+    fuente = _fuente(alto * 3 // 2)
+    lapiz.text((x, y + alto + 4), f"{vmin:,.3g}", fill=COLOR_TEXTO, font=fuente)
+    lapiz.text((x + ancho, y + alto + 4), f"{vmax:,.3g}", fill=COLOR_TEXTO, font=fuente, anchor='ra')
+    if texto:
+        lapiz.text((x, y - 4), texto, fill=COLOR_TEXTO, font=fuente, anchor='ld')
+
+
+# ==============================================================================
+# RENDER
+# ==============================================================================
+
+def renderizar_heatmap(ruta, valores, lon=None, lat=None, geoms=None, agregacion='mean', celda_px=1,
+                       ancho=ANCHO_PX, cmap=COLORMAP, vmin=None, vmax=None, provincias=True,
+                       titulo=None, etiquetas=None, leyenda=''):
+    """
+    Escribe un PNG con los valores rasterizados:
+    - puntos (lon, lat) agregados por celda con 'sum' / 'mean' / 'max', o
+    - polígonos (geoms, EPSG:4326) con el valor de cada uno
+    etiquetas: [(lon, lat, texto)] dibujadas sobre el mapa.
+    leyenda: texto de la barra de color (None = sin barra).
+    """
+    t0 = time.perf_counter()
+    if geoms is not None:
+        geoms = reubicar_geometrias(geoms)
+        marco = crear_marco(*shapely.total_bounds(geoms), ancho=ancho)
+        rejilla = rasterizar_poligonos(marco, geoms, valores)
+    else:
+        lon, lat = reubicar_canarias(lon, lat)
+        marco = crear_marco(np.nanmin(lon), np.nanmin(lat), np.nanmax(lon), np.nanmax(lat), ancho=ancho)
+        rejilla = rasterizar_puntos(marco, lon, lat, valores, agregacion, celda_px)
+
+    rgb, (vmin, vmax) = colorear(rejilla, cmap, vmin, vmax)
+    imagen = Image.fromarray(rgb)
+    if imagen.size != (marco.ancho, marco.alto):
+        imagen = imagen.resize((marco.ancho, marco.alto), Image.NEAREST)
+    lapiz = ImageDraw.Draw(imagen)
+
+    if provincias:
+        if os.path.exists(GEOPARQUET):
+            dibujar_lineas(lapiz, marco, reubicar_geometrias(contornos_provincias().geometry.values),
+                           COLOR_PROVINCIAS, grosor=max(1, marco.ancho // 1600))
+        else:
+            print(f"    ⚠️ Sin contorno de provincias (no existe {GEOPARQUET})")
+
+    # Recuadro de Canarias
+    x0, y0, x1, y1 = CANARIAS
+    dx, dy = DESPLAZAMIENTO_CANARIAS
+    (c0, c1), (f0, f1) = a_pixeles(marco, [x0 + dx, x1 + dx], [y1 + dy, y0 + dy])
+    if c1 > 0 and f1 > 0 and c0 < marco.ancho and f0 < marco.alto:
+        lapiz.rectangle([c0, f0, c1, f1], outline=COLOR_PROVINCIAS)
+
+    fuente = _fuente(max(12, marco.ancho // 80))
+    for lon_e, lat_e, texto in etiquetas or []:
+        (c,), (f,) = a_pixeles(marco, *reubicar_canarias([lon_e], [lat_e]))
+        caja = lapiz.textbbox((c, f), str(texto), font=fuente, anchor='mm')
+        lapiz.rectangle([caja[0] - 3, caja[1] - 2, caja[2] + 3, caja[3] + 2], fill=(255, 255, 255))
+        lapiz.text((c, f), str(texto), fill=COLOR_TEXTO, font=fuente, anchor='mm')
+    if titulo:
+        lapiz.text((marco.ancho // 40, marco.ancho // 40), titulo, fill=COLOR_TEXTO,
+                   font=_fuente(max(14, marco.ancho // 50)))
+    if leyenda is not None:
+        dibujar_leyenda(lapiz, marco, cmap, vmin, vmax, leyenda)
+
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    imagen.save(ruta, compress_level=COMPRESION_PNG)
+    print(f"    ✓ {ruta} ({marco.ancho}x{marco.alto} px) en {time.perf_counter() - t0:.2f} s")
+    return ruta
+
+
+# ==============================================================================
+# EJECUCIÓN: MATRIZ P (RESONANCIA POR SECCIÓN)
+# ==============================================================================
+
+def generar_heatmap_resonancia():
+    print("=" * 60)
+    print("   HEATMAP NACIONAL DE RESONANCIA (MATRIZ P)")
+    print("=" * 60)
+
+    if not os.path.exists(ARCHIVO_RESONANCIA):
+        print(f"❌ No existe {ARCHIVO_RESONANCIA}. Ejecuta primero 10_calculo_resonancia.py")
+        return None
+
+    df = pd.read_csv(ARCHIVO_RESONANCIA, sep=';')
+    df['CUSEC'] = cusec_a_int(df['Seccion'])
+    titulo = "Resonancia demográfica (1 - D_JS) por sección censal"
+
+    if os.path.exists(GEOPARQUET):
+        secciones = cargar_secciones(columnas=[], nivel='geom_s001').merge(
+            df[['CUSEC', 'Resonancia']], on='CUSEC')
+        print(f"    ✓ {len(secciones):,} secciones con geometría")
+        return renderizar_heatmap(OUTPUT_PNG, secciones['Resonancia'], geoms=secciones.geometry.values,
+                                  titulo=titulo, leyenda='Resonancia')
+
+    # Sin GeoParquet: centroides de ranking_fase6 agregados por celda
+    puntos = pd.read_csv("../datos/ranking_fase6_geo_ready.csv", sep=';')
+    puntos['CUSEC'] = cusec_a_int(puntos['Seccion'])
+    puntos = puntos[['CUSEC', 'LATITUD', 'LONGITUD']].merge(df[['CUSEC', 'Resonancia']], on='CUSEC')
+    return renderizar_heatmap(OUTPUT_PNG, puntos['Resonancia'], lon=puntos['LONGITUD'], lat=puntos['LATITUD'],
+                              agregacion='mean', celda_px=6, provincias=False,
+                              titulo=titulo, leyenda='Resonancia')
+
+
+if __name__ == "__main__":
+    generar_heatmap_resonancia()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+MERCADO_HUFF.PY - Cuota de Mercado por Sección (Modelo de Huff)
+================================================================================
+El Indice_Saturacion (competidores × 80 camas / camas propias en un punto) no
+dice cuánta demanda se lleva cada centro. Con el modelo de Huff cada sección i
+elige centro j con probabilidad:
+
+    P[i, j] = A_j · W[i, j] / Σ_k A_k · W[i, k]
+
+- A_j = camas_j ** alpha (atractivo: competidores con sus plazas del registro
+  cuando hay pareja, ver registro_residencias.py, y sitios nuevos)
+- W[i, j] = kernel de distancia de captacion_gravitatoria.py (0 más allá del
+  cutoff -> matrices dispersas, nunca 32k × M densas)
+- Demanda captada por un sitio nuevo s:  D_s = A_s · Σ_i W[i, s] · T_i / den_i
+
+El término de la competencia en el denominador (W_comp @ A_comp) se calcula UNA
+vez; evaluar un conjunto de sitios es un slice de columnas CSC y dos mat-vec,
+de modo que cabe dentro de los bucles de selección de sitios.
+
+Parámetros en config.yaml -> catchment (kernel) y huff.
+================================================================================
+"""
+
+import os
+import time
+import numpy as np
+import pandas as pd
+import yaml
+from scipy import sparse
+from captacion_gravitatoria import construir_matriz_pesos
+from almacen_competidores import cargar_almacen
+from registro_residencias import camas_competidores
+
+# Cargar Configuración Centralizada
+with open("../config.yaml", "r") as f:
+    config = yaml.safe_load(f)
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+ARCHIVO_INPUT_GEO = "../datos/ranking_fase6_geo_ready.csv"
+ARCHIVO_MATRIZ_P = "../datos/matriz_P_nacional_filtrada.parquet"
+ARCHIVO_SITIOS = "../datos/sitios_seleccionados.csv"
+ARCHIVO_CLUSTERS = "../datos/expansion_clusters_final.csv"
+OUTPUT_CANDIDATOS = "../datos/huff_candidatos.csv"
+OUTPUT_SECCIONES = "../datos/huff_secciones.csv"
+
+COLS_TARGET = ['M_80-84', 'M_85-89', 'M_90-94', 'M_95-99', 'M_100 y más']
+
+ALPHA = config['huff']['attractiveness_exponent']
+CAMAS_SITIO_NUEVO = config['huff']['new_site_beds']
+MARKET_SHARE = config['business']['market_share_target']
+
+# ==============================================================================
+# MODELO
+# ==============================================================================
+
+class ModeloHuff:
+    """
+    Uso:
+        huff = ModeloHuff(lat_s, lon_s, target, lat_comp, lon_comp, camas_comp, lat_cand, lon_cand)
+        captada = huff.evaluar(indices_candidatos)     # demanda captada por cada sitio
+    """
+
+    def __init__(self, lat_secc, lon_secc, target, lat_comp, lon_comp, camas_comp,
+                 lat_cand, lon_cand, alpha=ALPHA, **kwargs_kernel):
+        self.target = np.asarray(target, dtype=float)
+        self.alpha = alpha
+        # Competencia: se resume en un vector (n_secciones) que no cambia entre evaluaciones
+        W_comp = construir_matriz_pesos(lat_secc, lon_secc, lat_comp, lon_comp, **kwargs_kernel)
+        self.W_comp = W_comp
+        self.A_comp = np.asarray(camas_comp, dtype=float) ** alpha
+        self.den_comp = W_comp @ self.A_comp
+        # Candidatos en CSC: seleccionar columnas es O(nnz de esas columnas)
+        self.W_cand = construir_matriz_pesos(lat_secc, lon_secc, lat_cand, lon_cand,
+                                             **kwargs_kernel).tocsc()
+
+    def _atractivo(self, sel, camas):
+        return np.broadcast_to(np.asarray(camas, dtype=float) ** self.alpha, (len(sel),))
+
+    def denominador(self, sel, camas=CAMAS_SITIO_NUEVO):
+        """Σ_k A_k W[i, k] por sección con la competencia + los sitios 'sel'."""
+        sel = np.asarray(sel, dtype=int)
+        return self.den_comp + self.W_cand[:, sel] @ self._atractivo(sel, camas)
+
+    def evaluar(self, sel, camas=CAMAS_SITIO_NUEVO):
+        """Demanda (target) captada por cada sitio de 'sel' compitiendo entre sí y con los rivales."""
+        sel = np.asarray(sel, dtype=int)
+        W_sel = self.W_cand[:, sel]
+        A_sel = self._atractivo(sel, camas)
+        den = self.den_comp + W_sel @ A_sel
+        ratio = np.divide(self.target, den, out=np.zeros_like(den), where=den > 0)
+        return A_sel * (W_sel.T @ ratio)
+
+    def cuota_secciones(self, sel, camas=CAMAS_SITIO_NUEVO):
+        """Probabilidad de que cada sección elija alguno de NUESTROS sitios."""
+        sel = np.asarray(sel, dtype=int)
+        propio = self.W_cand[:, sel] @ self._atractivo(sel, camas)
+        den = self.den_comp + propio
+        return np.divide(propio, den, out=np.zeros_like(den), where=den > 0)
+
+    def probabilidades(self, sel, camas=CAMAS_SITIO_NUEVO):
+        """P[i, j] dispersa (n_secciones × (n_competidores + len(sel))): rivales primero."""
+        sel = np.asarray(sel, dtype=int)
+        A = np.concatenate([self.A_comp, self._atractivo(sel, camas)])
+        W = sparse.hstack([self.W_comp, self.W_cand[:, sel]], format='csr')
+        den = W @ A
+        inv = np.divide(1.0, den, out=np.zeros_like(den), where=den > 0)
+        return sparse.diags(inv) @ W @ sparse.diags(A)
+
+# ==============================================================================
+# EJECUCIÓN
+# ==============================================================================
+
+def ejecutar_huff():
+    print("=" * 70)
+    print("   CUOTA DE MERCADO - MODELO DE HUFF (MATRICES DISPERSAS)")
+    print("=" * 70)
+
+    if not os.path.exists(ARCHIVO_INPUT_GEO):
+        print("❌ Falta archivo fase 6.")
+        return
+
+    print("\n>>> Cargando secciones, competidores y sitios...")
+    df = pd.read_csv(ARCHIVO_INPUT_GEO, sep=';')
+    if os.path.exists(ARCHIVO_MATRIZ_P):
+        df_matriz = pd.read_parquet(ARCHIVO_MATRIZ_P)
+        df_matriz['Pct_Target'] = df_matriz[COLS_TARGET].sum(axis=1)
+        df = pd.merge(df, df_matriz[['Pct_Target']], left_on='Seccion', right_index=True, how='left')
+        df['Poblacion_Target_Real'] = df['Poblacion_Total'] * df['Pct_Target'].fillna(0)
+    else:
+        df['Poblacion_Target_Real'] = df['Poblacion_Total'] * 0.06
+    df = df.dropna(subset=['LATITUD', 'LONGITUD']).reset_index(drop=True)
+
+    competidores = cargar_almacen()
+    camas_comp = camas_competidores(competidores)
+
+    archivo_cand = ARCHIVO_SITIOS if os.path.exists(ARCHIVO_SITIOS) else ARCHIVO_CLUSTERS
+    df_cand = pd.read_csv(archivo_cand, sep=';')
+    print(f"    ✓ {len(df):,} secciones | {len(competidores):,} competidores | "
+          f"{len(df_cand):,} sitios ({archivo_cand})")
+
+    t0 = time.perf_counter()
+    huff = ModeloHuff(df['LATITUD'].values, df['LONGITUD'].values, df['Poblacion_Target_Real'].values,
+                      competidores['LATITUD'].values, competidores['LONGITUD'].values, camas_comp,
+                      df_cand['LATITUD'].values, df_cand['LONGITUD'].values)
+    print(f"    ✓ Matrices construidas en {time.perf_counter() - t0:.2f} s "
+          f"({huff.W_comp.nnz:,} pares rivales, {huff.W_cand.nnz:,} pares sitios)")
+
+    todos = np.arange(len(df_cand))
+    repeticiones = 10
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        captada = huff.evaluar(todos)
+    print(f"    ✓ Evaluación de {len(todos):,} sitios: "
+          f"{(time.perf_counter() - t0) / repeticiones * 1000:.1f} ms")
+
+    df_cand['Demanda_Huff'] = captada
+    df_cand['Camas_Huff'] = captada * MARKET_SHARE
+    df_cand.to_csv(OUTPUT_CANDIDATOS, sep=';', index=False)
+
+    df['Cuota_Propia'] = huff.cuota_secciones(todos)
+    df['Demanda_Propia'] = df['Cuota_Propia'] * df['Poblacion_Target_Real']
+    df[['Seccion', 'LATITUD', 'LONGITUD', 'Poblacion_Target_Real', 'Cuota_Propia',
+        'Demanda_Propia']].to_csv(OUTPUT_SECCIONES, sep=';', index=False)
+
+    print("\n--- RESULTADOS ---")
+    print(f"   🎯 Demanda captada total: {captada.sum():,.0f} personas target "
+          f"({captada.sum() / df['Poblacion_Target_Real'].sum():.1%} del mercado)")
+    print(f"   📊 Cuota media en secciones servidas: "
+          f"{df.loc[df['Cuota_Propia'] > 0, 'Cuota_Propia'].mean():.1%}")
+    print(f"\n✅ GUARDADO: {OUTPUT_CANDIDATOS} | {OUTPUT_SECCIONES}")
+
+
+if __name__ == "__main__":
+    ejecutar_huff()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+MOTOR_COMPETENCIA.PY - Motor Único de Validación de Competencia
+================================================================================
+Sustituye a validacion_competencia_google.py, validacion_competencia_audit.py
+y a la lógica de VALIDACION_COMPETENCIA_V4.py, que duplicaban consulta,
+blacklist y clasificar_oceano con umbrales distintos (0.20 vs 0.30).
+
+1. PROVEEDOR (config.yaml -> competition.provider), todos devuelven una lista
+   de lugares únicos con formato Places:
+   - google:   planificador de círculos + cliente asíncrono + caché
+   - overpass: extracción OSM masiva (extraccion_osm.py)
+   - file:     almacén Parquet, respuestas Places JSON o el JSONL crudo de V4
+2. FILTRO vectorizado sobre todo el lote (almacen_competidores.clasificar_lugares)
+3. ASIGNACIÓN columnar con geodesia.rivales_cercanos: top-k rivales,
+   conteos, distancia media y máscara en radio para todos los clusters en
+   una llamada; saturación vectorizada, sin df.at fila a fila
+4. SALIDAS de una misma ejecución: CSV de resultados (con rivales y
+   distancias) y log de auditoría con cada lugar ACEPTADO/DESCARTADO/IGNORADO
+
+Umbrales y camas por competidor: siempre desde config.yaml.
+================================================================================
+"""
+
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+import yaml
+from dotenv import load_dotenv
+from datetime import datetime
+from geodesia import rivales_cercanos
+from registro_residencias import camas_competidores
+from cache_respuestas import CacheRespuestas
+from cliente_places import PLACES_URL, buscar_centros, payload_busqueda
+from planificador_consultas import (planificar_circulos, unificar_lugares, circulos_saturados,
+                                    circulos_saturados_idx, subdividir_circulos)
+from extraccion_osm import cargar_lugares_osm
+from almacen_competidores import tabla_lugares, actualizar_almacen, clasificar_oceano
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Cargar Configuración Centralizada
+with open("../config.yaml", "r") as f:
+    config = yaml.safe_load(f)
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+INPUT_FILE = "../datos/expansion_clusters_final.csv"
+OUTPUT_FILE = "../datos/clusters_359_validado_FINAL.csv"
+OUTPUT_RESPUESTAS = "../datos/places_respuestas_V4.jsonl"  # Respuestas crudas según llegan
+LOG_TXT = "../datos/auditoria_competencia_detallada.txt"
+
+# Parámetros desde config.yaml
+RADIO_BUSQUEDA_METROS = config['competition']['search_radius_meters']
+CAMAS_POR_COMPETIDOR = config['competition']['beds_per_competitor_estimate']
+RADIO_EXTRA_PLANIFICADOR = config['competition']['query_planner']['max_extra_radius_meters']
+PROVEEDOR = config['competition']['provider']
+ARCHIVO_LOCAL = config['competition']['local_file']
+_ADAPTATIVO = config['competition']['adaptive_search']
+BUSQUEDA_ADAPTATIVA = _ADAPTATIVO['enabled']
+RADIO_MIN_ADAPTATIVO = _ADAPTATIVO['min_radius_meters']
+PROFUNDIDAD_MAX = _ADAPTATIVO['max_depth']
+
+QUERY_TEXTO = "Residencia de ancianos OR Geriátrico"
+NUM_RIVALES = 3  # Rivales más cercanos que se listan en el CSV
+
+# ==============================================================================
+# PROVEEDORES
+# ==============================================================================
+
+class ProveedorGoogle:
+    """
+    Google Places Text Search con círculos planificados y caché. Los círculos
+    que llegan al tope de 20 resultados se subdividen (quadtree) hasta que
+    ninguna hoja esté saturada (o se alcance el radio/profundidad mínimos).
+    """
+    fuente = 'google_places'
+    persistir = True
+
+    def __init__(self, api_key=GOOGLE_API_KEY, query=QUERY_TEXTO,
+                 extra_m=RADIO_EXTRA_PLANIFICADOR, ruta_respuestas=OUTPUT_RESPUESTAS,
+                 adaptativa=BUSQUEDA_ADAPTATIVA, radio_min_m=RADIO_MIN_ADAPTATIVO,
+                 profundidad_max=PROFUNDIDAD_MAX, url=PLACES_URL, cache=None):
+        self.api_key = api_key
+        self.url = url
+        self.cache = cache
+        self.query = query
+        self.extra_m = extra_m
+        self.ruta_respuestas = ruta_respuestas
+        self.adaptativa = adaptativa
+        self.radio_min_m = radio_min_m
+        self.profundidad_max = profundidad_max
+        self.consultas_por_nivel = {}
+
+    def lugares(self, lat, lon, radio_m):
+        # PLANIFICACIÓN: círculos que cubren varios clusters cercanos a la vez
+        plan = planificar_circulos(lat, lon, radio_m, self.extra_m)
+        print(f"    Plan de consultas: {len(plan)} círculos para {len(lat)} clusters")
+
+        # Cada respuesta cruda se escribe en el JSONL en cuanto llega
+        cache = self.cache if self.cache is not None else CacheRespuestas()
+        with open(self.ruta_respuestas, "w", encoding="utf-8") as f_resp:
+            def consultar(lats, lons, radios, etiqueta):
+                payloads = [payload_busqueda(a, o, r, self.query) for a, o, r in zip(lats, lons, radios)]
+
+                def guardar_respuesta(i, respuesta):
+                    f_resp.write(json.dumps({"consulta": etiqueta, "indice": i, "respuesta": respuesta},
+                                            ensure_ascii=False) + "\n")
+
+                respuestas, stats = buscar_centros(self.api_key, payloads,
+                                                   al_completar=guardar_respuesta, cache=cache,
+                                                   url=self.url)
+                print(f"    ✓ [{etiqueta}] {stats['peticiones']} peticiones ({stats['reintentos']} "
+                      f"reintentos, {stats['fallos']} fallos) en {stats['segundos']:.1f} s")
+                return respuestas
+
+            respuestas = consultar(plan['LATITUD'], plan['LONGITUD'], plan['Radio_m'], "plan")
+            self.consultas_por_nivel = {"plan": len(plan)}
+
+            if self.adaptativa:
+                # Quadtree: se subdividen las hojas que tocaron el tope de 20 (respuesta truncada)
+                lats, lons, radios = plan['LATITUD'].values, plan['LONGITUD'].values, plan['Radio_m'].values
+                nivel_resp = respuestas
+                for nivel in range(1, self.profundidad_max + 1):
+                    saturados = circulos_saturados_idx(nivel_resp, radios, self.radio_min_m)
+                    if not saturados:
+                        break
+                    lats, lons, radios = subdividir_circulos(lats[saturados], lons[saturados], radios[saturados])
+                    print(f"    ⚠ Nivel {nivel}: {len(saturados)} círculos saturados -> "
+                          f"{len(lats)} hijos de {radios[0]:.0f} m")
+                    nivel_resp = consultar(lats, lons, radios, f"nivel_{nivel}")
+                    respuestas += nivel_resp
+                    self.consultas_por_nivel[f"nivel_{nivel}"] = len(lats)
+                else:
+                    saturados = circulos_saturados_idx(nivel_resp, radios, self.radio_min_m)
+                if saturados:
+                    print(f"    ⚠ {len(saturados)} hojas siguen saturadas (profundidad máxima)")
+            else:
+                # Círculos agrupados que tocaron el tope de 20 -> sus clusters uno a uno
+                recuperar = circulos_saturados(plan, respuestas)
+                if recuperar:
+                    print(f"    ⚠ {len(recuperar)} clusters en círculos saturados: consulta individual")
+                    respuestas += consultar(lat[recuperar], lon[recuperar],
+                                            [radio_m] * len(recuperar), "individual")
+                    self.consultas_por_nivel["individual"] = len(recuperar)
+
+        print(f"    Consultas totales: {sum(self.consultas_por_nivel.values())} "
+              f"({', '.join(f'{k}: {v}' for k, v in self.consultas_por_nivel.items())})")
+        cache.imprimir_resumen()
+        if self.cache is None:
+            cache.cerrar()
+        return unificar_lugares(respuestas)
+
+
+class ProveedorOverpass:
+    """Todas las residencias OSM de España (PBF local, JSON o una consulta bbox)."""
+    fuente = 'overpass'
+    persistir = True
+
+    def lugares(self, lat, lon, radio_m):
+        return cargar_lugares_osm(cache=CacheRespuestas())
+
+
+class ProveedorArchivo:
+    """
+    Lugares desde disco, sin red:
+    - .parquet: almacén de competidores (almacen_competidores.py)
+    - .jsonl:   una respuesta por línea (p. ej. places_respuestas_V4.jsonl)
+    - .json:    una respuesta Places ({"places": [...]}) o una lista de ellas
+    """
+    fuente = 'archivo'
+    persistir = False
+
+    def __init__(self, ruta=ARCHIVO_LOCAL):
+        self.ruta = ruta
+
+    def lugares(self, lat, lon, radio_m):
+        print(f"    Fuente: {self.ruta}")
+        if self.ruta.endswith(".parquet"):
+            df = pd.read_parquet(self.ruta)
+            return [{"id": r.place_id, "displayName": {"text": r.Nombre},
+                     "location": {"latitude": r.LATITUD, "longitude": r.LONGITUD},
+                     "types": r.Tipos.split(",") if r.Tipos else []}
+                    for r in df.itertuples(index=False)]
+
+        with open(self.ruta, "r", encoding="utf-8") as f:
+            if self.ruta.endswith(".jsonl"):
+                respuestas = [json.loads(linea) for linea in f if linea.strip()]
+                respuestas = [r.get("respuesta", r) if isinstance(r, dict) else None for r in respuestas]
+            else:
+                data = json.load(f)
+                respuestas = data if isinstance(data, list) else [data]
+        return unificar_lugares(respuestas)
+
+
+PROVEEDORES = {'google': ProveedorGoogle, 'overpass': ProveedorOverpass, 'file': ProveedorArchivo}
+
+
+def crear_proveedor(nombre=PROVEEDOR, **kwargs):
+    if nombre not in PROVEEDORES:
+        raise ValueError(f"Proveedor desconocido '{nombre}'. Opciones: {', '.join(PROVEEDORES)}")
+    return PROVEEDORES[nombre](**kwargs)
+
+# ==============================================================================
+# EVALUACIÓN COLUMNAR
+# ==============================================================================
+
+def pares_en_radio(lat, lon, tabla, radio_m):
+    """
+    Pares (cluster, lugar) a <= radio_m, ordenados por cluster y distancia.
+    Retorna DataFrame con Cluster, Lugar, Distancia_m y las columnas de 'tabla'.
+    """
+    # Solo contamos si realmente cae dentro del radio (la API a veces es laxa)
+    coo = rivales_cercanos(lat, lon, tabla['LATITUD'].values, tabla['LONGITUD'].values,
+                           radio_m, k=1).en_radio.tocoo()
+    df_pares = pd.DataFrame({'Cluster': coo.row, 'Lugar': coo.col, 'Distancia_m': np.round(coo.data)})
+    df_pares = df_pares.join(tabla.reset_index(drop=True), on='Lugar')
+    return df_pares.sort_values(['Cluster', 'Distancia_m'], kind='stable').reset_index(drop=True)
+
+
+def evaluar_competencia(df, tabla, radio_m=RADIO_BUSQUEDA_METROS, camas_por_competidor=CAMAS_POR_COMPETIDOR):
+    """Añade a df (índice 0..n-1) las columnas de competencia con los lugares ACEPTADOS de 'tabla'."""
+    n = len(df)
+    resultado = df.copy()
+    acept = tabla[tabla['Estado'] == "ACEPTADO"].reset_index(drop=True)
+    r = rivales_cercanos(df['LATITUD'].values, df['LONGITUD'].values,
+                         acept['LATITUD'].values, acept['LONGITUD'].values, radio_m, k=NUM_RIVALES)
+
+    # Rivales más cercanos (ej: "Sanitas (200m) | DomusVi (500m)"), -1 -> sin rival
+    hay = r.indices >= 0
+    nombres = np.append(acept['Nombre'].values.astype(object), "")[r.indices]
+    metros = np.where(hay, np.round(r.distancias), 0).astype(int)
+    etiquetas = np.where(hay, nombres + " (" + metros.astype(str).astype(object) + "m)", "")
+
+    # Oferta: plazas del registro de residencias si hay pareja, constante si no
+    camas = camas_competidores(acept, camas_defecto=camas_por_competidor)
+    en_radio = r.en_radio.copy()
+    en_radio.data[:] = 1.0
+    oferta = en_radio @ camas
+
+    camas_pot = resultado['Camas_Potenciales'].values.astype(float)
+    i_sat = np.divide(oferta, camas_pot, out=np.zeros(n), where=camas_pot > 0)
+
+    resultado['Num_Competidores'] = r.num
+    resultado['Rivales_Cercanos'] = [" | ".join(e for e in fila if e) for fila in etiquetas]
+    resultado['Rival_Mas_Cercano'] = nombres[:, 0]
+    resultado['Distancia_Rival_Cercano'] = metros[:, 0]
+    resultado['Distancia_Media_Competencia'] = r.dist_media.astype(int)
+    resultado['Oferta_Estimada_Camas'] = oferta
+    resultado['Indice_Saturacion'] = np.round(i_sat, 4)
+    resultado['Tipo_Oceano'] = clasificar_oceano(i_sat)
+    return resultado
+
+
+def escribir_auditoria(ruta, df, pares, proveedor):
+    """Log legible con cada lugar encontrado en el radio de cada cluster y su veredicto."""
+    nombre = pares['Nombre']
+    distancia = " a " + pares['Distancia_m'].astype(int).astype(str) + " m"
+    lineas = np.select(
+        [pares['Estado'] == "DESCARTADO", pares['Estado'] == "ACEPTADO"],
+        ["   [DESCARTADO] " + nombre + " (Blacklist)\n",
+         "   [ACEPTADO] " + nombre + distancia + "\n"
+         "       -> Tipos: " + pares['Tipos'] + "\n"
+         "       -> Dir: " + pares['Direccion'] + "\n"],
+        default="   [IGNORADO] " + nombre + " (No parece residencia)\n")
+    bloques = pd.Series(lineas, index=pares.index).groupby(pares['Cluster']).agg("".join)
+
+    ids = df['Cluster_ID'].values if 'Cluster_ID' in df.columns else np.arange(len(df))
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write(f"AUDITORÍA DE COMPETENCIA - {datetime.now()} - proveedor: {proveedor}\n")
+        f.write("==================================================\n")
+        for k, (cid, lat, lon, num) in enumerate(zip(ids, df['LATITUD'], df['LONGITUD'],
+                                                     df['Num_Competidores'])):
+            f.write("\n--------------------------------------------------\n")
+            f.write(f"CLUSTER {cid} (Lat: {lat:.4f}, Lon: {lon:.4f})\n")
+            f.write(bloques.get(k, ""))
+            f.write(f"   >>> TOTAL VÁLIDOS: {num}\n")
+
+# ==============================================================================
+# MAIN
+# ==============================================================================
+
+def ejecutar_motor(proveedor=None, radio_m=RADIO_BUSQUEDA_METROS):
+    print("=" * 70)
+    print("   ANÁLISIS DE COMPETENCIA (MOTOR UNIFICADO)")
+    print("=" * 70)
+
+    df = pd.read_csv(INPUT_FILE, sep=';').reset_index(drop=True)
+    print(f"    ✓ {len(df)} clusters cargados")
+    lat, lon = df['LATITUD'].values, df['LONGITUD'].values
+
+    proveedor = proveedor or crear_proveedor()
+    print(f"\n>>> Proveedor: {proveedor.fuente}")
+    lugares = proveedor.lugares(lat, lon, radio_m)
+
+    t0 = time.perf_counter()
+    tabla = tabla_lugares(lugares).drop_duplicates('place_id').reset_index(drop=True)
+    print(f"    ✓ {len(tabla):,} lugares únicos | "
+          f"{(tabla['Estado'] == 'ACEPTADO').sum():,} aceptados, "
+          f"{(tabla['Estado'] == 'DESCARTADO').sum():,} descartados, "
+          f"{(tabla['Estado'] == 'IGNORADO').sum():,} ignorados")
+
+    # Persistimos los competidores para recalcular saturación offline (almacen_competidores.py)
+    if proveedor.persistir:
+        actualizar_almacen(lugares, proveedor.fuente)
+
+    pares = pares_en_radio(lat, lon, tabla, radio_m)
+    df = evaluar_competencia(df, tabla, radio_m)
+    print(f"    ✓ Evaluación columnar en {(time.perf_counter() - t0) * 1000:.0f} ms "
+          f"({len(pares):,} pares cluster-lugar a <= {radio_m} m)")
+
+    df.to_csv(OUTPUT_FILE, sep=';', index=False)
+    escribir_auditoria(LOG_TXT, df, pares, proveedor.fuente)
+
+    print("\n--- RIVALES MÁS CERCANOS (TOP 5 CLUSTERS MÁS SATURADOS) ---")
+    cols = ['Num_Competidores', 'Rival_Mas_Cercano', 'Distancia_Rival_Cercano', 'Indice_Saturacion', 'Tipo_Oceano']
+    print(df.sort_values('Indice_Saturacion', ascending=False)[cols].head(5).to_string(index=False))
+
+    print("\n" + "=" * 70)
+    print(f"✅ ANÁLISIS COMPLETADO")
+    print(f"📂 Archivo generado: {OUTPUT_FILE}")
+    print(f"👉 Auditoría de nombres: {LOG_TXT}")
+    print(f"🌊 BLUE OCEANS ENCONTRADOS: {(df['Tipo_Oceano'] == 'Blue Ocean').sum()}")
+    print("=" * 70)
+    return df
+
+
+if __name__ == "__main__":
+    ejecutar_motor()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+PLANIFICADOR_CONSULTAS.PY - Deduplicación de Búsquedas de Competencia Solapadas
+================================================================================
+Muchos clusters de expansión están a pocos cientos de metros unos de otros y
+cada uno lanzaba su propia búsqueda de 1500 m. El planificador:
+
+1. Indexa los centros de cluster en una rejilla (celdas de 'extra' km).
+2. Cobertura greedy (set cover geométrico, perezoso): un círculo centrado en
+   el cluster q con radio R + extra contiene ENTERO el disco de radio R de
+   todo cluster k con d(q, k) <= extra. Se elige en cada paso el círculo que
+   cubre más clusters aún no cubiertos.
+3. Tras las consultas, cada lugar devuelto (deduplicado por place id) se
+   asigna a TODOS los clusters cuyo radio R lo contiene.
+
+Límite de 20 resultados: con locationBias, Places ordena por relevancia y
+corta en maxResultCount, así que una respuesta con 20 lugares está truncada
+aunque parte de ellos caiga fuera del círculo (los de dentro por debajo del
+corte se pierden). Un círculo es saturado si devuelve el máximo, cuente o no
+lo de fuera; el modo adaptativo lo subdivide en 4 círculos hijos (quadtree)
+hasta que ninguna hoja llegue al tope. Sin modo adaptativo, los clusters de
+un círculo agrupado saturado se consultan individualmente como antes.
+================================================================================
+"""
+
+import heapq
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+from scipy.spatial import cKDTree
+from geodesia import RADIO_TIERRA_KM, coords_a_xyz
+
+LIMITE_RESULTADOS = 20
+
+
+def _vecinos_rejilla(xyz, radio_km):
+    """Para cada punto, índices de los puntos a <= radio_km (rejilla 3D de celdas radio_km)."""
+    celdas = np.floor(xyz / radio_km).astype(np.int64)
+    rejilla = defaultdict(list)
+    for i, c in enumerate(map(tuple, celdas)):
+        rejilla[c].append(i)
+
+    desplazamientos = [(a, b, c) for a in (-1, 0, 1) for b in (-1, 0, 1) for c in (-1, 0, 1)]
+    vecinos = []
+    for i, (cx, cy, cz) in enumerate(map(tuple, celdas)):
+        candidatos = [j for dx, dy, dz in desplazamientos
+                      for j in rejilla.get((cx + dx, cy + dy, cz + dz), ())]
+        candidatos = np.array(candidatos)
+        d = np.linalg.norm(xyz[candidatos] - xyz[i], axis=1)
+        vecinos.append(candidatos[d <= radio_km])
+    return vecinos
+
+
+def planificar_circulos(lat, lon, radio_m, extra_m):
+    """
+    Calcula un conjunto pequeño de círculos de búsqueda que cubren los discos
+    de radio 'radio_m' de todos los centros.
+
+    Retorna DataFrame con LATITUD, LONGITUD, Radio_m y Miembros (lista de
+    índices de los centros cubiertos, cada centro aparece en un único círculo).
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    n = len(lat)
+    if n == 0:
+        return pd.DataFrame(columns=['LATITUD', 'LONGITUD', 'Radio_m', 'Miembros'])
+    if extra_m <= 0:
+        return pd.DataFrame({'LATITUD': lat, 'LONGITUD': lon, 'Radio_m': float(radio_m),
+                             'Miembros': [[i] for i in range(n)]})
+
+    cubre = _vecinos_rejilla(coords_a_xyz(lat, lon), extra_m / 1000.0)
+
+    # Greedy perezoso: la cobertura de un círculo solo puede bajar
+    cubierto = np.zeros(n, dtype=bool)
+    heap = [(-len(c), i) for i, c in enumerate(cubre)]
+    heapq.heapify(heap)
+    circulos = []
+    while heap and not cubierto.all():
+        neg, i = heapq.heappop(heap)
+        nuevos = cubre[i][~cubierto[cubre[i]]]
+        if len(nuevos) == 0:
+            continue
+        if len(nuevos) < -neg:
+            heapq.heappush(heap, (-len(nuevos), i))
+            continue
+        cubierto[nuevos] = True
+        # Radio mínimo que contiene los discos de los miembros realmente asignados
+        d_max = np.linalg.norm(coords_a_xyz(lat[nuevos], lon[nuevos]) -
+                               coords_a_xyz(lat[i], lon[i]), axis=1).max() * 1000.0
+        circulos.append({'LATITUD': lat[i], 'LONGITUD': lon[i],
+                         'Radio_m': float(radio_m + np.ceil(d_max)),
+                         'Miembros': sorted(nuevos.tolist())})
+
+    return pd.DataFrame(circulos)
+
+
+def unificar_lugares(respuestas):
+    """Une las listas 'places' de varias respuestas, sin duplicados (por place id)."""
+    unicos = {}
+    for respuesta in respuestas:
+        for lugar in (respuesta or {}).get("places", []):
+            loc = lugar.get("location", {})
+            clave = lugar.get("id") or (lugar.get("displayName", {}).get("text"),
+                                        loc.get("latitude"), loc.get("longitude"))
+            unicos.setdefault(clave, lugar)
+    return list(unicos.values())
+
+
+def asignar_lugares(lugares, lat_centros, lon_centros, radio_m):
+    """
+    Asigna cada lugar a todos los centros a distancia <= radio_m.
+    Retorna lista (una por centro) con los lugares que le corresponden.
+    """
+    asignados = [[] for _ in range(len(lat_centros))]
+    con_coords = [l for l in lugares
+                  if l.get("location", {}).get("latitude") is not None]
+    if not con_coords or len(lat_centros) == 0:
+        return asignados
+
+    xyz_lugares = coords_a_xyz([l["location"]["latitude"] for l in con_coords],
+                               [l["location"]["longitude"] for l in con_coords])
+    arbol = cKDTree(coords_a_xyz(lat_centros, lon_centros))
+    for lugar, centros in zip(con_coords, arbol.query_ball_point(xyz_lugares, radio_m / 1000.0)):
+        for k in centros:
+            asignados[k].append(lugar)
+    return asignados
+
+
+def circulos_saturados(plan, respuestas, limite=LIMITE_RESULTADOS):
+    """Índices de centros cuyos círculos agrupados devolvieron el máximo de resultados."""
+    recuperar = []
+    for miembros, respuesta in zip(plan['Miembros'], respuestas):
+        if len(miembros) > 1 and len((respuesta or {}).get("places", [])) >= limite:
+            recuperar.extend(miembros)
+    return sorted(recuperar)
+
+
+def circulos_saturados_idx(respuestas, radios, radio_min_m, limite=LIMITE_RESULTADOS):
+    """
+    Índices de círculos que llegaron al tope (respuesta truncada, estén sus
+    lugares dentro o fuera del radio) y aún pueden subdividirse.
+    """
+    return [k for k, (respuesta, r) in enumerate(zip(respuestas, radios))
+            if len((respuesta or {}).get("places", [])) >= limite and r / np.sqrt(2) >= radio_min_m]
+
+
+def subdividir_circulos(lat, lon, radio_m):
+    """
+    Quadtree: cada círculo -> 4 círculos que cubren los cuadrantes de su
+    cuadrado circunscrito (centros a ±r/2 en N-S y E-O, radio r/√2).
+    Retorna arrays (lat, lon, radio) con 4 hijos consecutivos por padre.
+    """
+    lat = np.repeat(np.asarray(lat, dtype=float), 4)
+    lon = np.repeat(np.asarray(lon, dtype=float), 4)
+    radio = np.repeat(np.asarray(radio_m, dtype=float), 4)
+    signo_n = np.tile([1, 1, -1, -1], len(lat) // 4)
+    signo_e = np.tile([1, -1, 1, -1], len(lat) // 4)
+    # Desplazamiento de r/2 metros expresado en grados
+    d_lat = np.degrees(radio / 2 / 1000.0 / RADIO_TIERRA_KM)
+    d_lon = d_lat / np.cos(np.radians(lat))
+    return lat + signo_n * d_lat, lon + signo_e * d_lon, radio / np.sqrt(2)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+REGISTRO_RESIDENCIAS.PY - Camas Reales por Competidor (Emparejamiento Difuso)
+================================================================================
+CAMAS_POR_COMPETIDOR trata igual una vivienda tutelada de 20 plazas y una
+DomusVi de 300. Aquí cada competidor descubierto (Places / OSM) se empareja
+con un registro local de residencias con plazas (p. ej. export del IMSERSO):
+
+    Nombre;LATITUD;LONGITUD;Plazas
+
+Bloqueo espacial (evita comparar todos contra todos, coste casi lineal):
+solo se puntúan las filas del registro a <= max_distance_meters (KD-tree).
+No hay bloqueo por nombre: los trigramas solo puntúan esos pares.
+
+Puntuación: Jaccard de trigramas del nombre normalizado (sin tildes ni
+palabras genéricas: "residencia", "mayores"...), calculado para todos los
+pares del bloqueo a la vez con matrices dispersas. Gana el candidato más
+parecido (y, a igualdad, el más cercano) si supera min_name_similarity
+(sin ningún trigrama común no hay pareja). El emparejamiento es
+uno a uno: una fila del registro solo se asigna a su mejor competidor (así
+sus plazas no se cuentan dos veces) y el resto prueba su siguiente candidato.
+Los competidores sin pareja conservan la estimación constante de config.yaml.
+Las filas del registro sin coordenadas no pueden emparejarse.
+================================================================================
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import yaml
+from scipy import sparse
+from geodesia import rivales_cercanos
+
+# Cargar Configuración Centralizada
+with open("../config.yaml", "r") as f:
+    config = yaml.safe_load(f)
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+_REGISTRO = config['competition']['registry']
+ARCHIVO_REGISTRO = _REGISTRO['path']
+DISTANCIA_MAX_M = _REGISTRO['max_distance_meters']
+SIMILITUD_MIN = _REGISTRO['min_name_similarity']
+CAMAS_POR_COMPETIDOR = config['competition']['beds_per_competitor_estimate']
+OUTPUT_ENRIQUECIDOS = "../datos/competidores_enriquecidos.csv"
+
+COL_NOMBRE = 'Nombre'
+COL_PLAZAS = 'Plazas'
+
+# Palabras que no distinguen una residencia de otra
+PALABRAS_GENERICAS = [
+    "residencia", "residencial", "geriatrico", "geriatrica", "centro", "mayores", "personas",
+    "tercera", "edad", "vivienda", "viviendas", "tutelada", "tuteladas", "sociosanitario",
+    "asistida", "de", "del", "la", "las", "los", "el", "y", "para", "sl", "sa", "slu",
+]
+
+# ==============================================================================
+# NOMBRES Y TRIGRAMAS
+# ==============================================================================
+
+def normalizar_nombres(nombres):
+    """Minúsculas, sin tildes ni signos y sin palabras genéricas (vectorizado)."""
+    texto = (pd.Series(nombres, dtype=object).fillna("").astype(str).str.lower()
+             .str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+             .str.replace(r"[^a-z0-9]+", " ", regex=True))
+    genericas = r"\b(?:" + "|".join(PALABRAS_GENERICAS) + r")\b"
+    return (texto.str.replace(genericas, " ", regex=True)
+            .str.replace(r"\b[a-z]\b", " ", regex=True)   # restos de "S.L.", "S.A."
+            .str.replace(r"\s+", " ", regex=True).str.strip()).values
+
+
+def _trigramas(texto):
+    relleno = f"  {texto} "
+    return {relleno[k:k + 3] for k in range(len(relleno) - 2)} if texto else set()
+
+
+def matrices_trigramas(*listas_textos):
+    """Matrices CSR binarias (textos × trigramas) sobre un vocabulario común."""
+    vocabulario = {}
+    matrices = []
+    for textos in listas_textos:
+        filas, cols = [], []
+        for i, texto in enumerate(textos):
+            for t in _trigramas(texto):
+                filas.append(i)
+                cols.append(vocabulario.setdefault(t, len(vocabulario)))
+        matrices.append((filas, cols, len(textos)))
+    return [sparse.csr_matrix((np.ones(len(f)), (f, c)), shape=(n, max(len(vocabulario), 1)))
+            for f, c, n in matrices]
+
+# ==============================================================================
+# EMPAREJAMIENTO
+# ==============================================================================
+
+def cargar_registro(ruta=ARCHIVO_REGISTRO):
+    if not os.path.exists(ruta):
+        return None
+    registro = pd.read_csv(ruta, sep=';')
+    return registro.dropna(subset=['LATITUD', 'LONGITUD', COL_PLAZAS]).reset_index(drop=True)
+
+
+def emparejar(competidores, registro, distancia_max_m=DISTANCIA_MAX_M, similitud_min=SIMILITUD_MIN):
+    """
+    Empareja cada competidor con su mejor fila del registro, uno a uno: greedy
+    por (similitud desc, distancia asc) saltando competidores y filas ya usados.
+    Retorna DataFrame alineado con 'competidores': Idx_Registro (-1 si no hay),
+    Similitud, Distancia_Registro_m y Plazas_Registro.
+    """
+    n = len(competidores)
+    resultado = pd.DataFrame({'Idx_Registro': np.full(n, -1), 'Similitud': np.zeros(n),
+                              'Distancia_Registro_m': np.full(n, np.nan),
+                              'Plazas_Registro': np.full(n, np.nan)})
+    if n == 0 or registro is None or len(registro) == 0:
+        return resultado
+
+    # 1. Bloqueo espacial
+    pares = rivales_cercanos(competidores['LATITUD'].values, competidores['LONGITUD'].values,
+                             registro['LATITUD'].values, registro['LONGITUD'].values,
+                             distancia_max_m, k=1).en_radio.tocoo()
+    i, j, dist = pares.row, pares.col, pares.data
+
+    # 2. Puntuación: Jaccard de trigramas de cada par del bloqueo espacial
+    T_comp, T_reg = matrices_trigramas(normalizar_nombres(competidores['Nombre']),
+                                       normalizar_nombres(registro[COL_NOMBRE]))
+    comunes = np.asarray(T_comp[i].multiply(T_reg[j]).sum(axis=1)).ravel()
+    n_comp = np.asarray(T_comp.sum(axis=1)).ravel()[i]
+    n_reg = np.asarray(T_reg.sum(axis=1)).ravel()[j]
+    union = n_comp + n_reg - comunes
+    similitud = np.divide(comunes, union, out=np.zeros_like(comunes), where=union > 0)
+
+    candidatos = pd.DataFrame({'i': i, 'j': j, 'dist': dist, 'sim': similitud})
+    candidatos = candidatos[(comunes > 0) & (similitud >= similitud_min)]
+    candidatos = candidatos.sort_values(['sim', 'dist', 'i'], ascending=[False, True, True])
+    usados_i, usados_j, elegidos = set(), set(), []
+    for k, ci, cj in zip(candidatos.index, candidatos['i'].values, candidatos['j'].values):
+        if ci not in usados_i and cj not in usados_j:
+            usados_i.add(ci)
+            usados_j.add(cj)
+            elegidos.append(k)
+    mejores = candidatos.loc[elegidos]
+
+    resultado.loc[mejores['i'], 'Idx_Registro'] = mejores['j'].values
+    resultado.loc[mejores['i'], 'Similitud'] = mejores['sim'].values
+    resultado.loc[mejores['i'], 'Distancia_Registro_m'] = np.round(mejores['dist'].values)
+    resultado.loc[mejores['i'], 'Plazas_Registro'] = registro[COL_PLAZAS].values[mejores['j'].values]
+    return resultado
+
+
+def camas_competidores(competidores, registro=None, camas_defecto=CAMAS_POR_COMPETIDOR):
+    """
+    Vector de camas por competidor: plazas del registro si hay pareja, si no la
+    constante. Informa de cuántos se quedan con la constante.
+    """
+    if registro is None:
+        registro = cargar_registro()
+    plazas = emparejar(competidores, registro)['Plazas_Registro'].values
+    sin_pareja = int(np.isnan(plazas).sum())
+    origen = "sin registro" if registro is None else "sin pareja en el registro"
+    print(f"    Camas: {len(plazas) - sin_pareja:,} competidores con plazas reales, "
+          f"{sin_pareja:,} con la constante de {camas_defecto} ({origen})")
+    return np.where(np.isnan(plazas), float(camas_defecto), plazas)
+
+# ==============================================================================
+# EJECUCIÓN
+# ==============================================================================
+
+def ejecutar_enriquecimiento():
+    from almacen_competidores import cargar_almacen
+
+    print("=" * 70)
+    print("   ENRIQUECIMIENTO DE COMPETIDORES CON EL REGISTRO DE PLAZAS")
+    print("=" * 70)
+
+    registro = cargar_registro()
+    if registro is None:
+        print(f"❌ Falta el registro de residencias: {ARCHIVO_REGISTRO}")
+        return
+    competidores = cargar_almacen()
+    print(f"    ✓ {len(competidores):,} competidores | {len(registro):,} residencias en el registro")
+
+    emparejados = emparejar(competidores, registro)
+    df = pd.concat([competidores.reset_index(drop=True), emparejados], axis=1)
+    df['Nombre_Registro'] = np.where(df['Idx_Registro'] >= 0,
+                                     registro[COL_NOMBRE].values[df['Idx_Registro'].clip(lower=0)], "")
+    df['Camas'] = df['Plazas_Registro'].fillna(CAMAS_POR_COMPETIDOR)
+    df.to_csv(OUTPUT_ENRIQUECIDOS, sep=';', index=False)
+
+    con_pareja = df['Idx_Registro'] >= 0
+    print(f"\n    Emparejados: {con_pareja.sum():,} ({con_pareja.mean():.1%}) | "
+          f"con la constante de {CAMAS_POR_COMPETIDOR} camas: {(~con_pareja).sum():,}")
+    if con_pareja.any():
+        print(f"    Plazas reales (mediana): {df.loc[con_pareja, 'Camas'].median():.0f} "
+              f"vs constante {CAMAS_POR_COMPETIDOR}")
+    print(f"\n✅ GUARDADO: {OUTPUT_ENRIQUECIDOS}")
+
+
+if __name__ == "__main__":
+    ejecutar_enriquecimiento()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+SELECCION_SITIOS.PY - Selección Capacitada de Sitios con Canibalización
+================================================================================
+El algoritmo de expansión convierte camas en int(camas_totales / 100)
+residencias sin decir DÓNDE van ni tener en cuenta que dos sitios cercanos se
+reparten la misma población. Aquí elegimos hasta N sitios de 100 camas entre
+candidatos concretos:
+
+    max  F(S) = Σ_i  Target_i · max_{s ∈ S} W[i, s]        (|S| <= N)
+
+- W es la matriz de captación gravitatoria (captacion_gravitatoria.py).
+- Con el max, una sección compartida por dos sitios cuenta UNA vez y se
+  asigna al sitio que mejor la sirve (canibalización explícita).
+- F es submodular y monótona -> greedy perezoso (lazy greedy) con cola de
+  prioridad: solo se recalcula la ganancia del candidato en la cima.
+- Capacidad: un sitio no sirve más de 100 camas / market_share de demanda,
+  ni en la ganancia marginal ni en la asignación; lo que no cabe se desborda
+  al siguiente mejor sitio.
+- Un sitio solo entra si su ganancia marginal × market_share >= min_operational_beds;
+  al ser submodular, en cuanto la cima no llega, ninguno llegará.
+- Poda: si la canibalización deja algún sitio bajo el mínimo, se excluye el
+  peor y se repite el greedy sin él.
+
+Salida: lista de sitios con demanda asignada y capacidad (camas) por sitio.
+================================================================================
+"""
+
+import os
+import time
+import heapq
+import numpy as np
+import pandas as pd
+import yaml
+from scipy import sparse
+from captacion_gravitatoria import construir_matriz_pesos
+
+# Cargar Configuración Centralizada
+with open("../config.yaml", "r") as f:
+    config = yaml.safe_load(f)
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+ARCHIVO_INPUT_GEO = "../datos/ranking_fase6_geo_ready.csv"
+ARCHIVO_MATRIZ_P = "../datos/matriz_P_nacional_filtrada.parquet"
+OUTPUT_SITIOS = "../datos/sitios_seleccionados.csv"
+
+COLS_TARGET = ['M_80-84', 'M_85-89', 'M_90-94', 'M_95-99', 'M_100 y más']
+
+MARKET_SHARE = config['business']['market_share_target']
+CAMAS_MINIMAS = config['business']['min_operational_beds']
+CAMAS_POR_RESIDENCIA = 100
+N_MAX_SITIOS = 1000
+PERCENTIL_CANDIDATOS = 60   # Candidatos = secciones sobre este percentil de Score_Global
+
+# ==============================================================================
+# FUNCIONES
+# ==============================================================================
+
+def asignar_demanda(W_sel, target, capacidad=np.inf):
+    """
+    Asigna la demanda de cada sección a los sitios seleccionados, primero al
+    que mejor la sirve. Un sitio no absorbe más de 'capacidad' (target
+    ponderado): si lo pedido lo supera, toma la parte proporcional de cada
+    sección y el resto se desborda al siguiente mejor sitio abierto.
+    Retorna la demanda asignada a cada sitio.
+    """
+    W_sel = W_sel.tocsr()
+    n_sitios = W_sel.shape[1]
+    demanda = np.zeros(n_sitios)
+    if n_sitios == 0:
+        return demanda
+    nivel = np.zeros(W_sel.shape[0])      # Peso ya servido de cada sección
+    abierto = np.ones(n_sitios, dtype=bool)
+
+    while abierto.any():
+        W_abiertos = W_sel @ sparse.diags(abierto.astype(float))
+        mejor_peso = W_abiertos.max(axis=1).toarray().ravel()
+        mejor_sitio = np.asarray(W_abiertos.argmax(axis=1)).ravel()
+        pendiente = target * np.maximum(mejor_peso - nivel, 0.0)
+        con_demanda = pendiente > 0
+        pedido = np.bincount(mejor_sitio[con_demanda], weights=pendiente[con_demanda],
+                             minlength=n_sitios)
+
+        # Los sitios que no llegan a su capacidad aceptan todo lo pedido
+        hueco = capacidad - demanda
+        llenos = abierto & (pedido > hueco)
+        fraccion = np.ones(n_sitios)
+        fraccion[llenos] = hueco[llenos] / pedido[llenos]
+        f = fraccion[mejor_sitio]
+        demanda += pedido * fraccion
+        nivel = np.where(con_demanda, nivel + f * (mejor_peso - nivel), nivel)
+        if not llenos.any():
+            break
+        abierto &= ~llenos
+
+    return demanda
+
+
+def seleccionar_sitios(W, target, n_max=N_MAX_SITIOS, market_share=MARKET_SHARE,
+                       camas_minimas=CAMAS_MINIMAS, camas_residencia=CAMAS_POR_RESIDENCIA,
+                       excluidos=()):
+    """
+    Greedy perezoso sobre F(S) = Σ_i target_i · max_{s∈S} W[i, s], con la
+    ganancia de cada sitio limitada a su capacidad (camas_residencia / share).
+    Si un sitio se llena, solo sirve la parte proporcional de sus secciones y
+    el resto queda disponible para los siguientes.
+
+    W: matriz dispersa (secciones × candidatos). target: demanda por sección.
+    excluidos: candidatos que no pueden elegirse (p. ej. podados).
+    Retorna (indices_seleccionados, ganancias_marginales, num_evaluaciones).
+    """
+    W = W.tocsc()
+    target = np.asarray(target, dtype=float)
+    demanda_minima = camas_minimas / market_share
+    capacidad = camas_residencia / market_share
+    cubierto = np.zeros(W.shape[0])
+    prohibido = np.zeros(W.shape[1], dtype=bool)
+    prohibido[np.asarray(excluidos, dtype=int)] = True
+
+    # Ganancias iniciales de todos los candidatos en un solo mat-vec
+    ganancia_inicial = np.minimum(W.T @ target, capacidad)
+    heap = [(-g, s, 0) for s, g in enumerate(ganancia_inicial)
+            if g >= demanda_minima and not prohibido[s]]
+    heapq.heapify(heap)
+
+    seleccionados, ganancias = [], []
+    evaluaciones = W.shape[1]
+
+    while heap and len(seleccionados) < n_max:
+        neg_ganancia, s, ronda = heapq.heappop(heap)
+        filas = W.indices[W.indptr[s]:W.indptr[s + 1]]
+        pesos = W.data[W.indptr[s]:W.indptr[s + 1]]
+        mejora = np.maximum(pesos - cubierto[filas], 0.0)
+
+        if ronda == len(seleccionados):
+            # Ganancia actualizada en esta ronda -> es la mejor (submodularidad)
+            seleccionados.append(s)
+            ganancias.append(-neg_ganancia)
+            libre = np.dot(target[filas], mejora)
+            fraccion = min(1.0, capacidad / libre) if libre > 0 else 1.0
+            cubierto[filas] += fraccion * mejora
+            continue
+
+        ganancia = min(np.dot(target[filas], mejora), capacidad)
+        evaluaciones += 1
+        if ganancia >= demanda_minima:
+            heapq.heappush(heap, (-ganancia, s, len(seleccionados)))
+        # Si no llega al mínimo ya no llegará nunca (las ganancias solo bajan)
+
+    return np.array(seleccionados, dtype=int), np.array(ganancias), evaluaciones
+
+
+def podar_canibalizados(W, target, n_max=N_MAX_SITIOS, market_share=MARKET_SHARE,
+                        camas_minimas=CAMAS_MINIMAS, camas_residencia=CAMAS_POR_RESIDENCIA):
+    """
+    Greedy + poda: si la asignación capacitada deja algún sitio bajo el
+    mínimo, se excluye el peor y se repite el greedy sin él (la demanda que
+    liberaba puede hacer entrar a otros candidatos).
+    Retorna (seleccionados, ganancias, demanda_asignada, excluidos, evaluaciones).
+    """
+    W = W.tocsc()
+    target = np.asarray(target, dtype=float)
+    capacidad = camas_residencia / market_share
+    excluidos, evaluaciones = [], 0
+    while True:
+        seleccionados, ganancias, n_eval = seleccionar_sitios(W, target, n_max, market_share,
+                                                              camas_minimas, camas_residencia, excluidos)
+        evaluaciones += n_eval
+        demanda = asignar_demanda(W[:, seleccionados], target, capacidad)
+        if len(seleccionados) == 0 or (demanda * market_share).min() >= camas_minimas:
+            return seleccionados, ganancias, demanda, excluidos, evaluaciones
+        excluidos.append(seleccionados[np.argmin(demanda)])
+
+
+# ==============================================================================
+# EJECUCIÓN
+# ==============================================================================
+
+def ejecutar_seleccion():
+    print("=" * 70)
+    print("   SELECCIÓN CAPACITADA DE SITIOS (LAZY GREEDY + CANIBALIZACIÓN)")
+    print("=" * 70)
+
+    if not os.path.exists(ARCHIVO_INPUT_GEO):
+        print("❌ Falta archivo fase 6.")
+        return
+
+    print("\n>>> Cargando secciones...")
+    df = pd.read_csv(ARCHIVO_INPUT_GEO, sep=';')
+    if os.path.exists(ARCHIVO_MATRIZ_P):
+        df_matriz = pd.read_parquet(ARCHIVO_MATRIZ_P)
+        df_matriz['Pct_Target'] = df_matriz[COLS_TARGET].sum(axis=1)
+        df = pd.merge(df, df_matriz[['Pct_Target']], left_on='Seccion', right_index=True, how='left')
+        df['Poblacion_Target_Real'] = df['Poblacion_Total'] * df['Pct_Target'].fillna(0)
+    else:
+        df['Poblacion_Target_Real'] = df['Poblacion_Total'] * 0.06
+    df = df.dropna(subset=['LATITUD', 'LONGITUD']).reset_index(drop=True)
+
+    umbral = df['Score_Global'].quantile(PERCENTIL_CANDIDATOS / 100)
+    df_cand = df[df['Score_Global'] > umbral].reset_index(drop=True)
+    print(f"    ✓ {len(df):,} secciones de demanda | {len(df_cand):,} candidatos (P{PERCENTIL_CANDIDATOS})")
+
+    print("\n>>> Construyendo matriz de captación...")
+    t0 = time.perf_counter()
+    W = construir_matriz_pesos(df['LATITUD'].values, df['LONGITUD'].values,
+                               df_cand['LATITUD'].values, df_cand['LONGITUD'].values)
+    target = df['Poblacion_Target_Real'].values
+    print(f"    ✓ {W.nnz:,} pares ({time.perf_counter() - t0:.2f} s)")
+
+    print(f"\n>>> Lazy greedy (N máx={N_MAX_SITIOS}, mínimo={CAMAS_MINIMAS} camas, share={MARKET_SHARE:.1%})...")
+    t0 = time.perf_counter()
+    seleccion_final, ganancias, demanda, excluidos, evaluaciones = podar_canibalizados(W, target)
+    print(f"    ✓ {len(seleccion_final)} sitios | {evaluaciones:,} evaluaciones "
+          f"({time.perf_counter() - t0:.2f} s)")
+    if excluidos:
+        print(f"    ⚠ {len(excluidos)} sitios retirados por canibalización (< {CAMAS_MINIMAS} camas), "
+              f"greedy repetido sin ellos")
+
+    df_sitios = df_cand.loc[seleccion_final, ['Seccion', 'LATITUD', 'LONGITUD',
+                                              'Renta_Hogar', 'Score_Global']].copy()
+    df_sitios.insert(0, 'Orden', np.arange(1, len(df_sitios) + 1))
+    df_sitios['Ganancia_Marginal_Target'] = ganancias
+    df_sitios['Demanda_Asignada'] = demanda
+    df_sitios['Camas_Asignadas'] = demanda * MARKET_SHARE     # Ya limitada a la capacidad
+    df_sitios['Ocupacion'] = df_sitios['Camas_Asignadas'] / CAMAS_POR_RESIDENCIA
+
+    df_sitios.to_csv(OUTPUT_SITIOS, sep=';', index=False)
+
+    print("\n--- RESULTADOS ---")
+    print(f"   🏭 Residencias ubicadas: {len(df_sitios)}")
+    print(f"   🛏  Camas asignadas: {df_sitios['Camas_Asignadas'].sum():,.0f}")
+    print(f"   📊 Ocupación media: {df_sitios['Ocupacion'].mean():.1%}")
+    if len(df_sitios) < N_MAX_SITIOS:
+        print(f"   📉 Gap a {N_MAX_SITIOS}: {N_MAX_SITIOS - len(df_sitios)} residencias")
+    print(f"\n✅ SITIOS GUARDADOS: {OUTPUT_SITIOS}")
+
+
+if __name__ == "__main__":
+    ejecutar_seleccion()
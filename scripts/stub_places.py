@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+STUB_PLACES.PY - Servidor Local que Imita places:searchText
+================================================================================
+Permite probar cliente_places.py y las validaciones de competencia sin
+gastar cuota ni red:
+
+    python stub_places.py &
+    PLACES_URL=http://127.0.0.1:8765/v1/places:searchText python VALIDACION_COMPETENCIA_V4.py
+
+Sirve un conjunto FIJO de lugares sintéticos (núcleos densos + fondo disperso
+sobre España, misma semilla -> mismos lugares), con id propio de cada lugar:
+el mismo lugar devuelto por dos círculos solapados trae el mismo id.
+
+Como locationBias real, no recorta al círculo: los candidatos llegan hasta
+FACTOR_SESGO radios del centro, se ordenan por relevancia (fija por lugar) y
+se corta en maxResultCount. Una respuesta con el máximo está truncada.
+
+STUB_TASA_FALLOS (0-1) inyecta errores 503 para ejercitar reintentos (con
+cabecera Retry-After si se da STUB_RETRY_AFTER_S); STUB_LATENCIA_S simula la
+latencia de la API real.
+================================================================================
+"""
+
+import os
+import asyncio
+import random
+import numpy as np
+from aiohttp import web
+from geodesia import RADIO_TIERRA_KM, haversine_m
+
+HOST = "127.0.0.1"
+PUERTO = int(os.getenv("STUB_PUERTO", "8765"))
+TASA_FALLOS = float(os.getenv("STUB_TASA_FALLOS", "0"))
+LATENCIA_S = float(os.getenv("STUB_LATENCIA_S", "0.2"))
+RETRY_AFTER_S = os.getenv("STUB_RETRY_AFTER_S")
+
+FACTOR_SESGO = 1.5          # locationBias: también salen lugares hasta 1.5 radios
+SEMILLA = 7
+N_NUCLEOS = 300             # Núcleos urbanos (lugares concentrados)
+LUGARES_POR_NUCLEO = 40
+N_FONDO = 5000              # Lugares dispersos
+SIGMA_NUCLEO_KM = 1.0
+BBOX_ESPANA = (36.0, -9.3, 43.7, 3.3)   # (sur, oeste, norte, este)
+
+NOMBRES = ["Residencia Los Olivos", "Geriátrico San José", "DomusVi Centro",
+           "Vivienda Tutelada El Pilar", "Farmacia Central", "Centro de Mayores Municipal"]
+TIPOS = [["nursing_home"], ["health"], ["pharmacy"], ["point_of_interest"]]
+CLAVE_LUGARES = web.AppKey("lugares", dict)
+
+
+def generar_lugares(semilla=SEMILLA, n_nucleos=N_NUCLEOS, por_nucleo=LUGARES_POR_NUCLEO,
+                    n_fondo=N_FONDO, bbox=BBOX_ESPANA):
+    """Lugares sintéticos deterministas con formato Places (id derivado del propio lugar)."""
+    rng = np.random.default_rng(semilla)
+    sur, oeste, norte, este = bbox
+    nucleos = rng.uniform([sur, oeste], [norte, este], size=(n_nucleos, 2))
+    desvio = rng.normal(0, SIGMA_NUCLEO_KM, size=(n_nucleos * por_nucleo, 2))
+    centros = np.repeat(nucleos, por_nucleo, axis=0)
+    lat = np.r_[centros[:, 0] + np.degrees(desvio[:, 0] / RADIO_TIERRA_KM),
+                rng.uniform(sur, norte, n_fondo)]
+    lon = np.r_[centros[:, 1] + np.degrees(desvio[:, 1] / RADIO_TIERRA_KM) / np.cos(np.radians(centros[:, 0])),
+                rng.uniform(oeste, este, n_fondo)]
+    return lugares_sinteticos(lat, lon, semilla)
+
+
+def lugares_sinteticos(lat, lon, semilla=SEMILLA):
+    """Lista de lugares Places en las coordenadas dadas (nombre y tipo deterministas)."""
+    rng = random.Random(semilla)
+    return [{
+        "id": f"stub_{k:06d}",
+        "displayName": {"text": f"{rng.choice(NOMBRES)} {k}"},
+        "location": {"latitude": float(a), "longitude": float(o)},
+        "types": rng.choice(TIPOS),
+        "formattedAddress": "Calle Falsa 123",
+    } for k, (a, o) in enumerate(zip(lat, lon))]
+
+
+async def search_text(request):
+    await asyncio.sleep(LATENCIA_S)
+    if random.random() < TASA_FALLOS:
+        cabeceras = {"Retry-After": RETRY_AFTER_S} if RETRY_AFTER_S else None
+        return web.json_response({"error": {"code": 503}}, status=503, headers=cabeceras)
+
+    cuerpo = await request.json()
+    circulo = cuerpo["locationBias"]["circle"]
+    lat, lon = circulo["center"]["latitude"], circulo["center"]["longitude"]
+    radio_m = circulo.get("radius", 1500.0)
+    maximo = cuerpo.get("maxResultCount", 20)
+
+    datos = request.app[CLAVE_LUGARES]
+    distancia = haversine_m(lat, lon, datos["lat"], datos["lon"])
+    candidatos = np.flatnonzero(distancia <= FACTOR_SESGO * radio_m)
+    # Orden por relevancia (fija por lugar), no por distancia: el corte deja fuera lugares cercanos
+    elegidos = candidatos[np.argsort(-datos["relevancia"][candidatos], kind='stable')][:maximo]
+    return web.json_response({"places": [datos["lista"][k] for k in elegidos]})
+
+
+def crear_app(lugares=None):
+    """lugares: lista con formato Places; por defecto el conjunto sintético de generar_lugares()."""
+    lugares = generar_lugares() if lugares is None else lugares
+    app = web.Application()
+    app[CLAVE_LUGARES] = {
+        "lista": lugares,
+        "lat": np.array([l["location"]["latitude"] for l in lugares], dtype=float),
+        "lon": np.array([l["location"]["longitude"] for l in lugares], dtype=float),
+        "relevancia": np.random.default_rng(SEMILLA).random(len(lugares)),
+    }
+    app.router.add_post("/v1/places:searchText", search_text)
+    return app
+
+
+if __name__ == "__main__":
+    print(f">>> Stub Places en http://{HOST}:{PUERTO}/v1/places:searchText "
+          f"(fallos={TASA_FALLOS:.0%}, latencia={LATENCIA_S}s)")
+    web.run_app(crear_app(), host=HOST, port=PUERTO, print=None)
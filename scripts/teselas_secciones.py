@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+TESELAS_SECCIONES.PY - Pirámide de Teselas Vectoriales (z5-z14) de Secciones
+================================================================================
+Las 32.910 secciones coloreadas por Resonancia / Score a escala nacional no
+caben en un GeoJSON dentro de un HTML. Aquí se generan teselas vectoriales
+(Mapbox Vector Tile) en un único archivo PMTiles:
+
+1. Geometrías del GeoParquet de cache_secciones.py + salidas del pipeline
+   (ranking_fase6_geo_ready, ranking_fase3_resonancia, clusters) unidas por CUSEC
+2. Por zoom: simplificación a 1 unidad de tesela (EXTENT=4096). Los polígonos
+   de menos de un píxel (TAMANO_MIN) se emiten como un cuadrado de un píxel en
+   su punto interior: a z5 son la mitad de las secciones y de la población
+3. Reparto polígono -> teselas por bbox (vectorizado) y bloques de 8×8
+   teselas repartidos entre procesos: recorte (clip_by_rect con margen),
+   codificación MVT y gzip en cada proceso
+4. Escritura del PMTiles (directorio + teselas deduplicadas) y del visor
+
+El visor (MapLibre GL + pmtiles.js) lee el archivo con peticiones HTTP Range:
+basta cualquier hosting estático. Sobre z14 MapLibre sobre-amplía z14.
+
+Uso:  cd ../reports && python -m http.server  ->  /visor_secciones.html
+================================================================================
+"""
+
+import os
+import gzip
+import json
+import time
+import numpy as np
+import pandas as pd
+import shapely
+import mapbox_vector_tile
+from mapbox_vector_tile.encoder import on_invalid_geometry_make_valid
+from pmtiles.tile import Compression, TileType, zxy_to_tileid
+from pmtiles.writer import Writer
+from multiprocessing import Pool
+from cache_secciones import cargar_secciones, cusec_a_int
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+ARCHIVO_GEO = "../datos/ranking_fase6_geo_ready.csv"
+ARCHIVO_RESONANCIA = "../datos/ranking_fase3_resonancia.csv"
+ARCHIVO_CLUSTERS = "../datos/ranking_fase8_puntos_con_cluster.csv"
+
+OUTPUT_PMTILES = "../reports/teselas/secciones.pmtiles"
+OUTPUT_VISOR = "../reports/visor_secciones.html"
+
+CAPA = "secciones"
+ZOOM_MIN = 5
+ZOOM_MAX = 14
+EXTENT = 4096          # Unidades por tesela (estándar MVT)
+MARGEN = 64            # Unidades de margen alrededor de la tesela (evita costuras)
+TAMANO_MIN = 8         # Huella mínima de un polígono (~1 px con teselas de 512 px)
+BLOQUE = 3             # Bloques de 2**BLOQUE × 2**BLOQUE teselas por tarea
+PROCESOS = os.cpu_count()
+
+# Campos numéricos que viajan en las teselas (los que existan) y decimales
+CAMPOS = {
+    'Resonancia': 4,
+    'Score_Global': 4,
+    'Renta_Hogar': 0,
+    'Poblacion_Total': 0,
+    'Cluster_ID': 0,
+}
+CAMPO_DEFECTO = 'Score_Global'
+
+MUNDO = 2 * np.pi * 6378137.0   # Ancho del mundo en EPSG:3857 (m)
+ORIGEN = MUNDO / 2
+
+# ==============================================================================
+# DATOS
+# ==============================================================================
+
+def cargar_datos():
+    """Secciones en EPSG:3857 con los campos del pipeline unidos por CUSEC."""
+    gdf = cargar_secciones(columnas=['NMUN'], nivel='geometry')
+    gdf['CUSEC'] = gdf['CUSEC'].astype('int64')
+
+    for archivo in (ARCHIVO_GEO, ARCHIVO_RESONANCIA, ARCHIVO_CLUSTERS):
+        if not os.path.exists(archivo):
+            print(f"    ⚠️ Sin {archivo}")
+            continue
+        df = pd.read_csv(archivo, sep=';')
+        cols = [c for c in CAMPOS if c in df.columns and c not in gdf.columns]
+        if 'Seccion' not in df.columns or not cols:
+            continue
+        df['CUSEC'] = cusec_a_int(df['Seccion'])
+        df = df.dropna(subset=['CUSEC']).drop_duplicates('CUSEC')
+        gdf = gdf.merge(df[['CUSEC'] + cols].astype({'CUSEC': 'int64'}), on='CUSEC', how='left')
+        print(f"    ✓ {', '.join(cols)} <- {archivo}")
+
+    gdf = gdf[~gdf.geometry.is_empty & gdf.geometry.notna()].to_crs(epsg=3857)
+    return gdf.reset_index(drop=True)
+
+
+def propiedades(gdf):
+    """Lista de dicts por sección (sin NaN, con los decimales de CAMPOS)."""
+    cols = {'CUSEC': gdf['CUSEC'].astype(str).str.zfill(10), 'NMUN': gdf['NMUN'].astype(str)}
+    for campo, dec in CAMPOS.items():
+        if campo in gdf.columns:
+            cols[campo] = gdf[campo].round(dec).astype('Int64' if dec == 0 else 'Float64')
+    return [{k: v for k, v in r.items() if pd.notna(v)}
+            for r in pd.DataFrame(cols).to_dict('records')]
+
+
+def rangos(gdf):
+    """Percentiles 5-95 de cada campo para la rampa de color del visor."""
+    return {c: [float(gdf[c].quantile(0.05)), float(gdf[c].quantile(0.95))]
+            for c in CAMPOS if c in gdf.columns and gdf[c].notna().any()}
+
+# ==============================================================================
+# TESELADO
+# ==============================================================================
+
+def limites_tesela(z, x, y):
+    """(minx, miny, maxx, maxy) en EPSG:3857 de la tesela XYZ."""
+    lado = MUNDO / 2 ** z
+    minx = -ORIGEN + x * lado
+    maxy = ORIGEN - y * lado
+    return minx, maxy - lado, minx + lado, maxy
+
+
+def pares_teselas(limites, z):
+    """
+    Expande cada bbox (n × 4, EPSG:3857) a las teselas de zoom z que toca
+    (con margen). Retorna (idx_geometria, x, y) vectorizado.
+    """
+    n_teselas = 2 ** z
+    lado = MUNDO / n_teselas
+    m = MARGEN / EXTENT * lado
+    x0 = np.clip(np.floor((limites[:, 0] - m + ORIGEN) / lado), 0, n_teselas - 1).astype(np.int64)
+    x1 = np.clip(np.floor((limites[:, 2] + m + ORIGEN) / lado), 0, n_teselas - 1).astype(np.int64)
+    y0 = np.clip(np.floor((ORIGEN - limites[:, 3] - m) / lado), 0, n_teselas - 1).astype(np.int64)
+    y1 = np.clip(np.floor((ORIGEN - limites[:, 1] + m) / lado), 0, n_teselas - 1).astype(np.int64)
+
+    nx, ny = x1 - x0 + 1, y1 - y0 + 1
+    cuenta = nx * ny
+    idx = np.repeat(np.arange(len(limites)), cuenta)
+    desplazamiento = np.arange(cuenta.sum()) - np.repeat(np.cumsum(cuenta) - cuenta, cuenta)
+    return idx, x0[idx] + desplazamiento % nx[idx], y0[idx] + desplazamiento // nx[idx]
+
+
+def tareas_zoom(geoms, props, z):
+    """Simplifica para el zoom z y agrupa los pares en bloques de teselas (una tarea por bloque)."""
+    unidad = MUNDO / 2 ** z / EXTENT
+    simples = shapely.simplify(geoms, unidad, preserve_topology=True)
+    limites = shapely.bounds(simples)
+    diminutos = np.flatnonzero(shapely.is_empty(simples) |
+                               (np.maximum(limites[:, 2] - limites[:, 0],
+                                           limites[:, 3] - limites[:, 1]) < TAMANO_MIN * unidad))
+    if len(diminutos):
+        # Sin descartarlos: huella mínima de un píxel para que sigan pintando su valor
+        centro = shapely.get_coordinates(shapely.point_on_surface(geoms[diminutos]))
+        medio = TAMANO_MIN * unidad / 2
+        simples = simples.copy()
+        simples[diminutos] = shapely.box(centro[:, 0] - medio, centro[:, 1] - medio,
+                                         centro[:, 0] + medio, centro[:, 1] + medio)
+        limites[diminutos] = shapely.bounds(simples[diminutos])
+
+    idx, x, y = pares_teselas(limites, z)
+    bloque = ((x >> BLOQUE) << 32) | (y >> BLOQUE)
+    orden = np.lexsort((idx, y, x, bloque))
+    idx, x, y, bloque = idx[orden], x[orden], y[orden], bloque[orden]
+    cortes = np.flatnonzero(np.diff(bloque)) + 1
+
+    for b_idx, b_x, b_y in zip(np.split(idx, cortes), np.split(x, cortes), np.split(y, cortes)):
+        locales, inverso = np.unique(b_idx, return_inverse=True)
+        tesela = (b_x << 32) | b_y
+        limites_t = np.flatnonzero(np.diff(tesela)) + 1
+        teselas = [(int(t_x[0]), int(t_y[0]), t_i)
+                   for t_x, t_y, t_i in zip(np.split(b_x, limites_t), np.split(b_y, limites_t),
+                                            np.split(inverso, limites_t))]
+        yield z, teselas, simples[locales], [props[i] for i in locales]
+
+
+def codificar_bloque(tarea):
+    """Recorta, codifica (MVT) y comprime las teselas de un bloque. Se ejecuta en los procesos."""
+    z, teselas, geoms, props = tarea
+    salida = []
+    for x, y, idx in teselas:
+        minx, miny, maxx, maxy = limites_tesela(z, x, y)
+        m = MARGEN / EXTENT * (maxx - minx)
+        recortes = shapely.clip_by_rect(geoms[idx], minx - m, miny - m, maxx + m, maxy + m)
+        poligonos = np.isin(shapely.get_type_id(recortes), (3, 6)) & ~shapely.is_empty(recortes)
+        if not poligonos.any():
+            continue
+        # Coordenadas de tesela (0..EXTENT, y hacia abajo) en bloque, no punto a punto
+        escala = EXTENT / (maxx - minx)
+        locales = shapely.transform(recortes[poligonos],
+                                    lambda c: (c - (minx, maxy)) * (escala, -escala))
+        # De mayor a menor área: las huellas de un píxel quedan encima de sus vecinas
+        orden = np.argsort(-shapely.area(locales), kind='stable')
+        features = [{'geometry': g, 'properties': props[i]}
+                    for g, i in zip(locales[orden], idx[poligonos][orden])]
+        pbf = mapbox_vector_tile.encode(
+            [{'name': CAPA, 'features': features}],
+            default_options={'extents': EXTENT, 'y_coord_down': True,
+                             'on_invalid_geometry': on_invalid_geometry_make_valid})
+        salida.append((zxy_to_tileid(z, x, y), gzip.compress(pbf, compresslevel=6, mtime=0)))
+    return salida
+
+
+def generar_pmtiles(gdf, ruta=OUTPUT_PMTILES, zooms=range(ZOOM_MIN, ZOOM_MAX + 1), procesos=PROCESOS):
+    """Escribe la pirámide completa en un PMTiles. Retorna estadísticas por zoom."""
+    geoms = np.asarray(gdf.geometry.values)
+    props = propiedades(gdf)
+    lon_min, lat_min, lon_max, lat_max = gdf.to_crs(epsg=4326).total_bounds
+    zooms = list(zooms)
+
+    stats = {z: [0, 0] for z in zooms}   # teselas, bytes
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    with open(ruta, 'wb') as f:
+        writer = Writer(f)
+        with Pool(procesos) as pool:
+            # Zoom a zoom: solo las tareas de un nivel esperan en la cola a la vez
+            for z in zooms:
+                for resultado in pool.imap_unordered(codificar_bloque, tareas_zoom(geoms, props, z)):
+                    for tile_id, datos in resultado:
+                        writer.write_tile(tile_id, datos)
+                        stats[z][0] += 1
+                        stats[z][1] += len(datos)
+
+        e7 = lambda v: int(round(v * 1e7))
+        writer.finalize({
+            'tile_type': TileType.MVT,
+            'tile_compression': Compression.GZIP,
+            'min_lon_e7': e7(lon_min), 'min_lat_e7': e7(lat_min),
+            'max_lon_e7': e7(lon_max), 'max_lat_e7': e7(lat_max),
+            'center_zoom': ZOOM_MIN + 1,
+            'center_lon_e7': e7((lon_min + lon_max) / 2), 'center_lat_e7': e7((lat_min + lat_max) / 2),
+        }, {
+            'name': 'Secciones censales L-SOMA',
+            'vector_layers': [{
+                'id': CAPA, 'minzoom': zooms[0], 'maxzoom': zooms[-1],
+                'fields': {k: ('String' if k in ('CUSEC', 'NMUN') else 'Number')
+                           for k in ['CUSEC', 'NMUN'] + [c for c in CAMPOS if c in gdf.columns]},
+            }],
+            'rangos': rangos(gdf),
+        })
+    return stats
+
+# ==============================================================================
+# VISOR
+# ==============================================================================
+
+PLANTILLA_VISOR = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>Secciones censales L-SOMA</title>
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<link rel="stylesheet" href="https://unpkg.com/maplibre-gl@4.7.1/dist/maplibre-gl.css">
+<script src="https://unpkg.com/maplibre-gl@4.7.1/dist/maplibre-gl.js"></script>
+<script src="https://unpkg.com/pmtiles@3.2.1/dist/pmtiles.js"></script>
+<style>
+  body { margin: 0; } #mapa { position: absolute; inset: 0; }
+  #panel { position: absolute; top: 10px; left: 10px; z-index: 1; background: white;
+           padding: 8px 12px; font: 13px sans-serif; border-radius: 4px; box-shadow: 0 1px 4px #0004; }
+</style>
+</head>
+<body>
+<div id="mapa"></div>
+<div id="panel"><b>Colorear por</b> <select id="campo"></select><div id="leyenda"></div></div>
+<script>
+var ARCHIVO = __ARCHIVO__, CAPA = __CAPA__, RANGOS = __RANGOS__, DEFECTO = __DEFECTO__;
+var RAMPA = ['#ffffb2', '#fecc5c', '#fd8d3c', '#f03b20', '#bd0026'];
+
+var protocolo = new pmtiles.Protocol();
+maplibregl.addProtocol('pmtiles', protocolo.tile);
+var url = new URL(ARCHIVO, location.href).href;
+
+function color(campo) {
+  var r = RANGOS[campo], paso = (r[1] - r[0]) / (RAMPA.length - 1) || 1, expr = ['interpolate', ['linear'], ['get', campo]];
+  RAMPA.forEach(function(c, i) { expr.push(r[0] + i * paso, c); });
+  return ['case', ['has', campo], expr, '#d9d9d9'];
+}
+
+var mapa = new maplibregl.Map({
+  container: 'mapa', center: [-3.7, 40.4], zoom: __ZOOM_MIN__ + 1, minZoom: __ZOOM_MIN__ - 1,
+  style: {
+    version: 8,
+    sources: {
+      base: { type: 'raster', tileSize: 256, attribution: '&copy; OpenStreetMap &copy; CARTO',
+              tiles: ['https://a.basemaps.cartocdn.com/light_all/{z}/{x}/{y}.png'] },
+      secciones: { type: 'vector', url: 'pmtiles://' + url }
+    },
+    layers: [
+      { id: 'base', type: 'raster', source: 'base' },
+      { id: 'relleno', type: 'fill', source: 'secciones', 'source-layer': CAPA,
+        paint: { 'fill-color': color(DEFECTO), 'fill-opacity': 0.7 } },
+      { id: 'borde', type: 'line', source: 'secciones', 'source-layer': CAPA, minzoom: 10,
+        paint: { 'line-color': '#555', 'line-width': 0.3 } }
+    ]
+  }
+});
+
+var selector = document.getElementById('campo');
+Object.keys(RANGOS).forEach(function(c) { selector.add(new Option(c, c, c === DEFECTO, c === DEFECTO)); });
+function leyenda(campo) {
+  var r = RANGOS[campo];
+  document.getElementById('leyenda').innerHTML = RAMPA.map(function(c, i) {
+    var v = r[0] + i * (r[1] - r[0]) / (RAMPA.length - 1);
+    return '<span style="background:' + c + ';padding:0 8px"></span> ' + v.toLocaleString(undefined, {maximumFractionDigits: 3});
+  }).join('<br>');
+}
+selector.onchange = function() { mapa.setPaintProperty('relleno', 'fill-color', color(selector.value)); leyenda(selector.value); };
+leyenda(DEFECTO);
+
+mapa.on('click', 'relleno', function(e) {
+  var p = e.features[0].properties;
+  var html = Object.keys(p).map(function(k) {
+    var v = typeof p[k] === 'number' ? p[k].toLocaleString() : p[k];
+    return '<b>' + k + ':</b> ' + v;
+  }).join('<br>');
+  new maplibregl.Popup().setLngLat(e.lngLat).setHTML(html).addTo(mapa);
+});
+mapa.on('mouseenter', 'relleno', function() { mapa.getCanvas().style.cursor = 'pointer'; });
+mapa.on('mouseleave', 'relleno', function() { mapa.getCanvas().style.cursor = ''; });
+</script>
+</body>
+</html>
+"""
+
+
+def escribir_visor(gdf, ruta=OUTPUT_VISOR, archivo=OUTPUT_PMTILES):
+    """Página estática que pinta el PMTiles con MapLibre (ruta relativa al HTML)."""
+    r = rangos(gdf)
+    defecto = CAMPO_DEFECTO if CAMPO_DEFECTO in r else next(iter(r), CAMPO_DEFECTO)
+    relativa = os.path.relpath(archivo, os.path.dirname(ruta) or ".").replace(os.sep, '/')
+    html = (PLANTILLA_VISOR
+            .replace('__ARCHIVO__', json.dumps(relativa))
+            .replace('__CAPA__', json.dumps(CAPA))
+            .replace('__RANGOS__', json.dumps(r))
+            .replace('__DEFECTO__', json.dumps(defecto))
+            .replace('__ZOOM_MIN__', str(ZOOM_MIN)))
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write(html)
+
+# ==============================================================================
+# EJECUCIÓN
+# ==============================================================================
+
+def ejecutar_teselado():
+    print("=" * 70)
+    print(f"   TESELAS VECTORIALES DE SECCIONES (z{ZOOM_MIN}-z{ZOOM_MAX}, PMTiles)")
+    print("=" * 70)
+
+    print("\n>>> Cargando secciones y resultados del pipeline...")
+    gdf = cargar_datos()
+    print(f"    ✓ {len(gdf):,} secciones")
+
+    print(f"\n>>> Generando teselas ({PROCESOS} procesos)...")
+    t0 = time.perf_counter()
+    stats = generar_pmtiles(gdf)
+    for z, (n, peso) in stats.items():
+        print(f"    z{z:<2} {n:>7,} teselas  {peso / (1024 * 1024):7.1f} MB")
+    print(f"    ✓ {sum(n for n, _ in stats.values()):,} teselas en {time.perf_counter() - t0:.1f} s")
+
+    escribir_visor(gdf)
+    print(f"\n✅ GUARDADO: {OUTPUT_PMTILES} ({os.path.getsize(OUTPUT_PMTILES) / (1024 * 1024):.1f} MB)")
+    print(f"   Visor: {OUTPUT_VISOR}  (cd ../reports && python -m http.server)")
+
+
+if __name__ == "__main__":
+    ejecutar_teselado()
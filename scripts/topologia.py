@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+================================================================================
+TOPOLOGIA.PY - Codificador TopoJSON (Arcos Compartidos + Cuantización)
+================================================================================
+Secciones vecinas comparten casi todo su borde: en GeoJSON cada borde se
+escribe dos veces y con doble precisión completa. TopoJSON lo evita:
+
+1. Cuantización: coordenadas -> enteros en una rejilla de CUANTIZACION
+   pasos sobre el bbox de la capa (transform.scale / transform.translate)
+2. Uniones: un vértice es unión si aparece con vecinos distintos en anillos
+   distintos (comparación vectorizada de triples punto/vecino/vecino)
+3. Arcos: cada anillo se corta en sus uniones; un arco que ya existe (en
+   cualquier sentido) se referencia por índice (i, o ~i si va al revés)
+4. Delta: cada arco guarda su primer punto y después diferencias
+
+Se decodifica en el navegador con topojson.feature() (topojson-client).
+
+simplificar_topologia() reutiliza los mismos arcos para generar niveles de
+detalle (cache_secciones.py): cada arco se simplifica y se ajusta a la rejilla
+del nivel una vez, y las dos secciones que lo comparten lo usan igual, sin
+huecos ni solapes entre vecinas.
+================================================================================
+"""
+
+import json
+import numpy as np
+import shapely
+
+# ==============================================================================
+# CONFIGURACIÓN
+# ==============================================================================
+CUANTIZACION = 100_000   # Pasos de la rejilla por eje (1e5 sobre España ~ 13 m)
+CUANTIZACION_ALMACEN = 10_000_000   # Para niveles de detalle guardados (~0,2 m)
+
+# ==============================================================================
+# CODIFICADOR
+# ==============================================================================
+
+def _uniones(claves, inicio, fin):
+    """Marca como unión cada punto cuyo par de vecinos no es el mismo en todas sus apariciones."""
+    i = np.arange(len(claves))
+    anterior = np.where(i == inicio, fin - 1, i - 1)
+    siguiente = np.where(i == fin - 1, inicio, i + 1)
+    a = np.minimum(claves[anterior], claves[siguiente])
+    b = np.maximum(claves[anterior], claves[siguiente])
+
+    orden = np.lexsort((b, a, claves))
+    c, a, b = claves[orden], a[orden], b[orden]
+    nuevo_triple = np.r_[True, (c[1:] != c[:-1]) | (a[1:] != a[:-1]) | (b[1:] != b[:-1])]
+    nueva_clave = np.r_[True, c[1:] != c[:-1]]
+    # Nº de pares de vecinos distintos por clave
+    distintos = np.add.reduceat(nuevo_triple.astype(np.int64), np.flatnonzero(nueva_clave))
+    es_union = np.repeat(distintos > 1, np.diff(np.r_[np.flatnonzero(nueva_clave), len(c)]))
+
+    resultado = np.empty(len(claves), dtype=bool)
+    resultado[orden] = es_union
+    return resultado
+
+
+def simplificar_arcos(arcos, escala, tolerancia):
+    """
+    Douglas-Peucker sobre cada arco (en grados) conservando sus extremos: los
+    vecinos comparten el arco simplificado, así que no aparecen huecos ni solapes.
+    """
+    if not arcos:
+        return arcos
+    largos = np.array([len(a) for a in arcos])
+    lineas = shapely.linestrings(np.vstack(arcos) * escala, indices=np.repeat(np.arange(len(arcos)), largos))
+    coords, idx = shapely.get_coordinates(shapely.simplify(lineas, tolerancia, preserve_topology=False),
+                                          return_index=True)
+    simples = np.split(np.round(coords / escala).astype(np.int64),
+                       np.cumsum(np.bincount(idx, minlength=len(arcos)))[:-1])
+    # Arcos cerrados (anillos sin uniones) que se quedarían sin área: se conservan
+    return [s if len(s) >= 4 or not np.array_equal(a[0], a[-1]) else a
+            for a, s in zip(arcos, simples)]
+
+
+def extraer_topologia(geoms, cuantizacion=CUANTIZACION):
+    """
+    Array de polígonos (EPSG:4326) -> (arcos, pols_de_geom, transform).
+    arcos: arrays enteros (n × 2) en la rejilla; pols_de_geom: por geometría,
+    lista de polígonos y cada polígono lista de anillos (índices de arco,
+    ~i = recorrido inverso); transform: (x0, y0, kx, ky).
+    """
+    x0, y0, x1, y1 = shapely.total_bounds(geoms)
+    kx = (x1 - x0) / (cuantizacion - 1) or 1.0
+    ky = (y1 - y0) / (cuantizacion - 1) or 1.0
+
+    # Geometría -> polígonos -> anillos -> puntos (con índices de pertenencia)
+    poligonos, geom_de_pol = shapely.get_parts(geoms, return_index=True)
+    poligonos = np.asarray(poligonos)
+    anillos, pol_de_anillo = shapely.get_rings(poligonos, return_index=True)
+    coords, anillo_de_punto = shapely.get_coordinates(anillos, return_index=True)
+    q = np.column_stack([np.round((coords[:, 0] - x0) / kx),
+                         np.round((coords[:, 1] - y0) / ky)]).astype(np.int64)
+
+    # Fuera el punto de cierre y los duplicados consecutivos que deja la cuantización
+    ultimo = np.r_[anillo_de_punto[1:] != anillo_de_punto[:-1], True]
+    repetido = np.r_[False, (anillo_de_punto[1:] == anillo_de_punto[:-1]) &
+                     np.all(q[1:] == q[:-1], axis=1)]
+    q, anillo_de_punto = q[~ultimo & ~repetido], anillo_de_punto[~ultimo & ~repetido]
+    # ...y el último punto si coincide con el primero del anillo
+    n_anillos = len(anillos)
+    inicio = np.searchsorted(anillo_de_punto, np.arange(n_anillos))
+    fin = np.searchsorted(anillo_de_punto, np.arange(n_anillos), side='right')
+    cierra = (fin - inicio > 1) & np.all(q[np.maximum(fin - 1, 0)] == q[np.minimum(inicio, len(q) - 1)], axis=1)
+    if cierra.any():
+        quitar = np.zeros(len(q), dtype=bool)
+        quitar[fin[cierra] - 1] = True
+        q, anillo_de_punto = q[~quitar], anillo_de_punto[~quitar]
+        inicio = np.searchsorted(anillo_de_punto, np.arange(n_anillos))
+        fin = np.searchsorted(anillo_de_punto, np.arange(n_anillos), side='right')
+
+    claves = q[:, 0] * (1 << 32) + q[:, 1]
+    union = _uniones(claves, inicio[anillo_de_punto], fin[anillo_de_punto])
+
+    # Anillos -> arcos deduplicados
+    arcos, indice_arco = [], {}
+
+    def registrar(tramo):
+        clave = tuple((tramo[:, 0] * (1 << 32) + tramo[:, 1]).tolist())
+        if clave in indice_arco:
+            return indice_arco[clave]
+        if clave[::-1] in indice_arco:
+            return ~indice_arco[clave[::-1]]
+        indice_arco[clave] = len(arcos)
+        arcos.append(tramo)
+        return len(arcos) - 1
+
+    arcos_anillo = []
+    for r in range(n_anillos):
+        s, e = inicio[r], fin[r]
+        if e - s < 3:
+            arcos_anillo.append(None)
+            continue
+        puntos, cortes = q[s:e], np.flatnonzero(union[s:e])
+        if len(cortes) == 0:
+            # Anillo sin uniones: rotación canónica (menor clave primero)
+            puntos = np.roll(puntos, -int(np.argmin(claves[s:e])), axis=0)
+            arcos_anillo.append([registrar(np.vstack([puntos, puntos[:1]]))])
+            continue
+        puntos = np.vstack([np.roll(puntos, -cortes[0], axis=0), puntos[cortes[0]:cortes[0] + 1]])
+        limites = np.r_[cortes - cortes[0], e - s]
+        arcos_anillo.append([registrar(puntos[a:b + 1]) for a, b in zip(limites[:-1], limites[1:])])
+
+    # Polígonos -> objetos geométricos
+    anillos_de_pol = [[] for _ in range(len(poligonos))]
+    for r, p in enumerate(pol_de_anillo):
+        anillos_de_pol[p].append(arcos_anillo[r])
+    pols_de_geom = [[] for _ in range(len(geoms))]
+    for p, g in enumerate(geom_de_pol):
+        if anillos_de_pol[p] and anillos_de_pol[p][0] is not None:
+            pols_de_geom[g].append([a for a in anillos_de_pol[p] if a is not None])
+
+    return arcos, pols_de_geom, (x0, y0, kx, ky)
+
+
+def codificar_topojson(gdf, campos=None, objeto='capa', cuantizacion=CUANTIZACION, tolerancia=None):
+    """
+    GeoDataFrame de polígonos (EPSG:4326) -> dict TopoJSON con un objeto
+    GeometryCollection 'objeto'. campos: propiedades a conservar (None = ninguna).
+    tolerancia: simplificación (grados) aplicada a los arcos ya compartidos.
+    """
+    arcos, pols_de_geom, (x0, y0, kx, ky) = extraer_topologia(np.asarray(gdf.geometry.values), cuantizacion)
+
+    registros = (gdf[campos].astype(object).where(gdf[campos].notna(), None).to_dict('records')
+                 if campos else [{} for _ in range(len(gdf))])
+    geometrias = []
+    for pols, props in zip(pols_de_geom, registros):
+        if not pols:
+            geometria = {'type': None}
+        elif len(pols) == 1:
+            geometria = {'type': 'Polygon', 'arcs': pols[0]}
+        else:
+            geometria = {'type': 'MultiPolygon', 'arcs': pols}
+        if campos:
+            geometria['properties'] = props
+        geometrias.append(geometria)
+
+    if tolerancia:
+        arcos = simplificar_arcos(arcos, np.array([kx, ky]), tolerancia)
+
+    return {
+        'type': 'Topology',
+        'bbox': [float(v) for v in gdf.total_bounds],
+        'transform': {'scale': [kx, ky], 'translate': [float(x0), float(y0)]},
+        'objects': {objeto: {'type': 'GeometryCollection', 'geometries': geometrias}},
+        'arcs': [np.vstack([a[:1], np.diff(a, axis=0)]).tolist() for a in arcos],
+    }
+
+
+def cuantizacion_tolerancia(limites, tolerancia, maximo=CUANTIZACION):
+    """
+    Pasos de rejilla para un bbox (minx, miny, maxx, maxy) tales que un paso
+    sea media tolerancia: en un nivel simplificado a un píxel, más precisión
+    solo alarga los deltas de los arcos. Nunca más de 'maximo'.
+    """
+    ancho = max(limites[2] - limites[0], limites[3] - limites[1])
+    return int(min(maximo, max(2, np.ceil(2 * ancho / tolerancia) + 1)))
+
+
+def _anillo(arcos, ids, origen, escala):
+    """Coordenadas (grados) de un anillo a partir de sus arcos."""
+    tramos = [arcos[i] if i >= 0 else arcos[~i][::-1] for i in ids]
+    return np.vstack([tramos[0]] + [t[1:] for t in tramos[1:]]) * escala + origen
+
+
+def ajustar_rejilla(arcos, origen, escala, rejilla):
+    """
+    Snap de los vértices de cada arco a una rejilla de 'rejilla' grados (sin
+    repetidos consecutivos). Las uniones también se mueven: las que caen en el
+    mismo nodo se funden y los arcos más cortos que la rejilla se reducen a un
+    punto. Como el arco es compartido, las vecinas siguen encajando.
+    """
+    if not arcos:
+        return arcos
+    largos = np.array([len(a) for a in arcos])
+    puntos = np.vstack(arcos) * escala + origen
+    q = np.round((np.round(puntos / rejilla) * rejilla - origen) / escala).astype(np.int64)
+    primero = np.zeros(len(q), dtype=bool)
+    primero[np.r_[0, np.cumsum(largos)[:-1]]] = True
+    conservar = primero | np.r_[True, np.any(q[1:] != q[:-1], axis=1)]
+    arco_de_punto = np.repeat(np.arange(len(arcos)), largos)
+    ajustados = np.split(q[conservar], np.cumsum(np.bincount(arco_de_punto[conservar], minlength=len(arcos)))[:-1])
+    # Un arco reducido a un punto se guarda como segmento degenerado (2 puntos iguales)
+    return [a if len(a) > 1 else np.repeat(a, 2, axis=0) for a in ajustados]
+
+
+def _poligonal(geom):
+    """Parte poligonal de una geometría reparada con make_valid (vacía si no queda área)."""
+    partes = [p for p in shapely.get_parts(shapely.make_valid(geom))
+              if shapely.get_type_id(p) in (3, 6) and not p.is_empty]
+    if not partes:
+        return shapely.Polygon()
+    return shapely.union_all(partes) if len(partes) > 1 else partes[0]
+
+
+def simplificar_topologia(geoms, tolerancias, cuantizacion=CUANTIZACION_ALMACEN):
+    """
+    Un array de polígonos por tolerancia (grados), generalizados sobre arcos
+    compartidos:
+
+    1. Douglas-Peucker por arco, conservando sus extremos
+    2. Snap de los arcos a una rejilla del tamaño de la tolerancia: las uniones
+       a menos de una tolerancia se funden (sin esto se conservan todas las
+       uniones y los niveles gruesos pesan casi lo mismo que el fino)
+
+    Las secciones menores que la rejilla colapsan a polígono vacío: sus vecinas
+    se tocan donde estaban (sin huecos). Si un polígono queda inválido se
+    repara con make_valid; si una sección mayor que la rejilla desaparece, se
+    simplifica por separado con preserve_topology.
+    """
+    geoms = np.asarray(geoms)
+    arcos, pols_de_geom, (x0, y0, kx, ky) = extraer_topologia(geoms, cuantizacion)
+    origen, escala = np.array([x0, y0]), np.array([kx, ky])
+    xmin, ymin, xmax, ymax = shapely.bounds(geoms).T
+    extension = np.maximum(xmax - xmin, ymax - ymin)
+
+    niveles = []
+    for tolerancia in tolerancias:
+        simples = ajustar_rejilla(simplificar_arcos(arcos, escala, tolerancia), origen, escala, tolerancia)
+        resultado = np.empty(len(geoms), dtype=object)
+        for g, pols in enumerate(pols_de_geom):
+            partes = []
+            for anillos in pols:
+                coords = [_anillo(simples, ids, origen, escala) for ids in anillos]
+                if len(coords[0]) >= 4:
+                    partes.append(shapely.Polygon(coords[0], [c for c in coords[1:] if len(c) >= 4]))
+            resultado[g] = (shapely.Polygon() if not partes else partes[0] if len(partes) == 1
+                            else shapely.MultiPolygon(partes))
+
+        invalidos = np.flatnonzero(~shapely.is_valid(resultado.astype(object)))
+        resultado[invalidos] = [_poligonal(resultado[g]) for g in invalidos]
+        perdidos = shapely.is_empty(resultado.astype(object)) & (extension > 2 * tolerancia)
+        resultado[perdidos] = shapely.simplify(geoms[perdidos], tolerancia, preserve_topology=True)
+        niveles.append(resultado)
+    return niveles
+
+
+def bytes_json(obj):
+    """Tamaño en bytes del JSON compacto (para medir la carga útil de una capa)."""
+    return len(json.dumps(obj, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8'))
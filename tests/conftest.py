@@ -0,0 +1,11 @@
+"""
+Los scripts se ejecutan desde scripts/ (leen "../config.yaml" y se importan
+entre sí por nombre): las pruebas hacen lo mismo.
+"""
+
+import os
+import sys
+
+DIR_SCRIPTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+os.chdir(DIR_SCRIPTS)
+sys.path.insert(0, DIR_SCRIPTS)
@@ -0,0 +1,82 @@
+"""Quadtree de motor_competencia.ProveedorGoogle contra stub_places.py."""
+
+import asyncio
+import json
+import threading
+
+import numpy as np
+import pytest
+from aiohttp import web
+
+import stub_places
+from cache_respuestas import CacheRespuestas
+from geodesia import RADIO_TIERRA_KM, haversine_m
+from motor_competencia import ProveedorGoogle
+
+CENTRO = (40.4168, -3.7038)
+RADIO_M = 1500
+
+
+def zona_densa(n_nucleo=45, sigma_m=400, n_fondo=30, semilla=3):
+    """Núcleo denso (muy por encima de 20 lugares) en el centro + fondo disperso a <= 4 km."""
+    rng = np.random.default_rng(semilla)
+    desvio_km = np.r_[rng.normal(0, sigma_m / 1000, (n_nucleo, 2)),
+                      rng.uniform(-4, 4, (n_fondo, 2))]
+    lat = CENTRO[0] + np.degrees(desvio_km[:, 0] / RADIO_TIERRA_KM)
+    lon = CENTRO[1] + np.degrees(desvio_km[:, 1] / RADIO_TIERRA_KM) / np.cos(np.radians(CENTRO[0]))
+    return stub_places.lugares_sinteticos(lat, lon)
+
+
+@pytest.fixture
+def url_stub(monkeypatch):
+    """Stub en un hilo con su propio bucle (buscar_centros usa asyncio.run)."""
+    monkeypatch.setattr(stub_places, "LATENCIA_S", 0.0)
+    lugares = zona_densa()
+    bucle = asyncio.new_event_loop()
+    runner = web.AppRunner(stub_places.crear_app(lugares))
+    bucle.run_until_complete(runner.setup())
+    sitio = web.TCPSite(runner, "127.0.0.1", 0)
+    bucle.run_until_complete(sitio.start())
+    puerto = sitio._server.sockets[0].getsockname()[1]
+    hilo = threading.Thread(target=bucle.run_forever, daemon=True)
+    hilo.start()
+    yield f"http://127.0.0.1:{puerto}/v1/places:searchText", lugares
+    bucle.call_soon_threadsafe(bucle.stop)
+    hilo.join()
+    bucle.run_until_complete(runner.cleanup())
+    bucle.close()
+
+
+def test_zona_densa_subdivide_y_recupera_todos(url_stub, tmp_path):
+    url, lugares = url_stub
+    ruta_respuestas = tmp_path / "respuestas.jsonl"
+    cache = CacheRespuestas(ruta=str(tmp_path / "cache.sqlite"), offline=False)
+    proveedor = ProveedorGoogle(api_key="test", extra_m=0, ruta_respuestas=str(ruta_respuestas),
+                                adaptativa=True, radio_min_m=50, profundidad_max=10,
+                                url=url, cache=cache)
+
+    encontrados = proveedor.lugares(np.array([CENTRO[0]]), np.array([CENTRO[1]]), RADIO_M)
+    cache.cerrar()
+
+    # El círculo inicial vuelve truncado: tiene que haber subdividido
+    assert "nivel_1" in proveedor.consultas_por_nivel
+
+    # Los círculos solapados devuelven el mismo lugar con el mismo id: se deduplica
+    crudos = [l["id"] for linea in ruta_respuestas.read_text(encoding="utf-8").splitlines()
+              for l in (json.loads(linea)["respuesta"] or {}).get("places", [])]
+    assert len(crudos) > len(set(crudos)) == len(encontrados)
+
+    def en_radio(ls):
+        lat = np.array([l["location"]["latitude"] for l in ls])
+        lon = np.array([l["location"]["longitude"] for l in ls])
+        return {l["id"] for l, d in zip(ls, haversine_m(*CENTRO, lat, lon)) if d <= RADIO_M}
+
+    reales = en_radio(lugares)
+    assert len(reales) > 20
+    assert en_radio(encontrados) == reales
+
+
+def test_conjunto_sintetico_determinista():
+    a, b = stub_places.generar_lugares(), stub_places.generar_lugares()
+    assert [l["id"] for l in a] == [l["id"] for l in b]
+    assert a[123]["location"] == b[123]["location"]
@@ -0,0 +1,52 @@
+"""Reintentos de cliente_places.ClientePlaces: Retry-After antes que el backoff."""
+
+import asyncio
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+from aiohttp import web
+
+import cliente_places
+from cliente_places import ClientePlaces, espera_retry_after, payload_busqueda
+
+
+def test_espera_retry_after():
+    assert espera_retry_after("2") == 2.0
+    assert espera_retry_after("600") == cliente_places.ESPERA_MAX_S
+    futuro = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= espera_retry_after(futuro) <= 30
+    assert espera_retry_after(None) is None
+    assert espera_retry_after("pronto") is None
+
+
+def test_reintento_respeta_retry_after(monkeypatch):
+    # Sin Retry-After el backoff esperaría como mucho BACKOFF_BASE_S: casi nada
+    monkeypatch.setattr(cliente_places, "BACKOFF_BASE_S", 0.0)
+    llamadas = []
+
+    async def search_text(request):
+        llamadas.append(time.monotonic())
+        if len(llamadas) == 1:
+            return web.json_response({"error": {"code": 429}}, status=429, headers={"Retry-After": "1"})
+        return web.json_response({"places": []})
+
+    async def probar():
+        app = web.Application()
+        app.router.add_post("/v1/places:searchText", search_text)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        sitio = web.TCPSite(runner, "127.0.0.1", 0)
+        await sitio.start()
+        url = f"http://127.0.0.1:{sitio._server.sockets[0].getsockname()[1]}/v1/places:searchText"
+        try:
+            async with ClientePlaces("clave", url=url, tasa=100, rafaga=10, reintentos=2) as cliente:
+                data = await cliente.buscar_texto(payload_busqueda(40.4, -3.7, 500, "residencia"))
+                return data, cliente.reintentos_usados
+        finally:
+            await runner.cleanup()
+
+    data, reintentos = asyncio.run(probar())
+    assert data == {"places": []}
+    assert reintentos == 1
+    assert llamadas[1] - llamadas[0] >= 1.0
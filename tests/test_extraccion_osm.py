@@ -0,0 +1,39 @@
+"""extraccion_osm.indice_osm sobre un JSON Overpass de prueba (sin red ni PBF)."""
+
+import os
+
+import numpy as np
+import pytest
+
+import extraccion_osm
+from registro_residencias import CAMAS_POR_COMPETIDOR, cargar_registro
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+OVERPASS_JSON = os.path.join(FIXTURES, "overpass_residencias.json")
+REGISTRO = os.path.join(FIXTURES, "registro_residencias.csv")
+
+MADRID = (40.4168, -3.7038)
+BARCELONA = (41.3874, 2.1686)
+RADIO_M = 1000
+
+
+@pytest.fixture
+def indice(tmp_path, monkeypatch):
+    monkeypatch.setattr(extraccion_osm, "OUTPUT_COMPETIDORES_OSM", str(tmp_path / "competidores_osm.parquet"))
+    return extraccion_osm.indice_osm(registro=cargar_registro(REGISTRO), ruta_pbf=None, ruta_json=OVERPASS_JSON)
+
+
+def test_residencias_deduplicadas_y_filtradas(indice):
+    # node/101 viene dos veces; way/505 no tiene centro; node/404 no es residencia
+    # y está vetado; node/303 está vetado por nombre pero clasificado por etiqueta
+    assert sorted(indice.almacen['place_id']) == [
+        "osm:node/101", "osm:node/303", "osm:node/606", "osm:way/202"]
+    assert (indice.almacen['Fuente'] == "overpass").all()
+
+
+def test_contar_y_oferta_camas(indice):
+    lat, lon = np.array([MADRID[0], BARCELONA[0]]), np.array([MADRID[1], BARCELONA[1]])
+    assert indice.contar(lat, lon, RADIO_M).tolist() == [3, 1]
+    # "Residencia Los Olivos" se empareja con el registro (120 plazas); el resto, la constante
+    assert indice.oferta_camas(lat, lon, RADIO_M).tolist() == [
+        120 + 2 * CAMAS_POR_COMPETIDOR, CAMAS_POR_COMPETIDOR]